@@ -0,0 +1,206 @@
+"""
+Cache of generated query args keyed by normalized prompt text.
+
+Operators ask the same questions every shift. A rewritten prompt that was
+already turned into args today gets those args back without another
+prompt_to_args LLM call.
+
+Lookup order:
+1. Exact: same normalized text (case, punctuation, accents and spacing folded)
+2. Near duplicate: same content words in the same order once filler words
+   ("show me", "please", "the", "orders") are dropped, e.g.
+   "Show me the pending orders" and "pending orders please"
+3. Typo tolerant: same number of content words, identical numbers, and every
+   other word at least `fuzzy_threshold` similar ("pendng" / "pending")
+
+Every key includes the date, because prompt_to_args resolves "last week" and
+similar phrases against today's date ({TODAY} in its system prompt).
+"""
+
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import date
+from difflib import SequenceMatcher
+from typing import Dict, Optional, Tuple
+
+# Words that don't change which orders a prompt asks for
+_FILLER_WORDS = {
+    "a", "an", "the", "me", "us", "my", "our", "i", "we", "you", "please", "pls",
+    "show", "list", "give", "get", "display", "find", "see", "view", "fetch", "return",
+    "can", "could", "would", "will", "do", "does", "is", "are", "there", "what", "which",
+    "all", "any", "some", "of", "for", "from", "in", "that", "with", "have", "has",
+    "order", "orders", "now", "just", "also", "kindly",
+}
+
+_WORD = re.compile(r"[a-z0-9]+(?:[-'][a-z0-9]+)*")
+_NUMBER = re.compile(r"^\d")
+
+def _fold(text: str) -> str:
+    """Lowercase and strip accents."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+def normalize_prompt(prompt: str) -> str:
+    """Canonical text of a prompt for exact lookup."""
+    return " ".join(_WORD.findall(_fold(prompt)))
+
+def content_words(prompt: str) -> Tuple[str, ...]:
+    """Words that carry the meaning of a prompt, in order."""
+    return tuple(word for word in _WORD.findall(_fold(prompt)) if word not in _FILLER_WORDS)
+
+def _similar(left: Tuple[str, ...], right: Tuple[str, ...], threshold: float) -> bool:
+    """Word-by-word typo tolerance; numbers must match exactly."""
+    if len(left) != len(right) or not left:
+        return False
+    for a, b in zip(left, right):
+        if a == b:
+            continue
+        if _NUMBER.match(a) or _NUMBER.match(b):
+            return False
+        if SequenceMatcher(None, a, b).ratio() < threshold:
+            return False
+    return True
+
+
+class ArgsCache:
+    """
+    TTL + LRU cache from rewritten prompt to prompt_to_args output.
+
+    Usage:
+        cache = ArgsCache(max_entries=512, ttl_seconds=3600)
+        hit = cache.get(rewritten_prompt)
+        if hit is None:
+            args = await prompt_to_args(rewritten_prompt)
+            cache.put(rewritten_prompt, args)
+        else:
+            args, match = hit
+    """
+
+    def __init__(self, max_entries: int = 512, ttl_seconds: float = 3600.0, fuzzy_threshold: float = 0.92):
+        """
+        Args:
+            max_entries: Entries kept before the least recently used is evicted
+            ttl_seconds: Maximum entry age
+            fuzzy_threshold: Minimum per-word similarity for typo-tolerant
+                matches (1.0 turns them off)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.fuzzy_threshold = fuzzy_threshold
+        # (day, normalized prompt) -> (args, content words, created)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        # (day, content words) -> exact key, for near-duplicate lookups
+        self._by_content: Dict[tuple, tuple] = {}
+        self.hits = {"exact": 0, "near_duplicate": 0, "fuzzy": 0}
+        self.misses = 0
+        self.evictions = 0
+        self.llm_ms_total = 0.0
+        self.llm_calls = 0
+
+    def _remove(self, key):
+        """Drop an entry and its content index."""
+        _, words, _ = self._entries.pop(key)
+        if self._by_content.get((key[0], words)) == key:
+            del self._by_content[(key[0], words)]
+
+    def _fresh(self, key) -> bool:
+        """True if the entry exists and is within its TTL; expired entries are dropped."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        if time.monotonic() - entry[2] > self.ttl_seconds:
+            self._remove(key)
+            return False
+        return True
+
+    def get(self, prompt: str, today: Optional[str] = None) -> Optional[Tuple[dict, str]]:
+        """
+        Look up args for a prompt.
+
+        Args:
+            prompt: Rewritten prompt
+            today: Date the args must be valid for (default: today)
+
+        Returns:
+            (args, match) with match "exact", "near_duplicate" or "fuzzy",
+            or None on a miss
+        """
+        day = today or date.today().isoformat()
+        key = (day, normalize_prompt(prompt))
+        words = content_words(prompt)
+
+        match = None
+        if self._fresh(key):
+            match = "exact"
+        else:
+            candidate = self._by_content.get((day, words))
+            if candidate is not None and self._fresh(candidate):
+                key, match = candidate, "near_duplicate"
+            elif self.fuzzy_threshold < 1.0:
+                for candidate, (_, cached_words, _) in list(self._entries.items()):
+                    if candidate[0] == day and _similar(words, cached_words, self.fuzzy_threshold) \
+                            and self._fresh(candidate):
+                        key, match = candidate, "fuzzy"
+                        break
+
+        if match is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits[match] += 1
+        return dict(self._entries[key][0]), match
+
+    def put(self, prompt: str, args: dict, today: Optional[str] = None):
+        """
+        Store args generated for a prompt.
+
+        Args:
+            prompt: Rewritten prompt
+            args: Args that the backend accepted
+            today: Date the args were generated for (default: today)
+        """
+        day = today or date.today().isoformat()
+        key = (day, normalize_prompt(prompt))
+        words = content_words(prompt)
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (dict(args), words, time.monotonic())
+        self._by_content[(day, words)] = key
+        while len(self._entries) > self.max_entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def record_llm_latency(self, ms: float):
+        """Record how long a prompt_to_args call took on a miss."""
+        self.llm_ms_total += ms
+        self.llm_calls += 1
+
+    def clear(self):
+        """Drop all entries (counters are kept)."""
+        self._entries.clear()
+        self._by_content.clear()
+
+    def stats(self) -> dict:
+        """
+        Cache statistics.
+
+        Returns:
+            dict: Entry count, hits by match kind, hit ratio and the LLM
+                time saved, estimated from the average prompt_to_args latency
+        """
+        hits = sum(self.hits.values())
+        lookups = hits + self.misses
+        avg_llm_ms = self.llm_ms_total / self.llm_calls if self.llm_calls else 0.0
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": dict(self.hits),
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "avg_llm_ms": round(avg_llm_ms, 2),
+            "llm_ms_saved": round(hits * avg_llm_ms, 2),
+        }
@@ -0,0 +1,80 @@
+"""
+Connection reuse benchmark for the agent's outbound HTTP calls.
+
+Sends the same request N times two ways: with a new httpx.AsyncClient per
+call (what the agent used to do for every backend and LLM call) and with
+one shared keep-alive client. It reports per-call latency for both. Point
+it at an https:// URL to include the TLS handshake, which is what the
+LLM calls pay.
+
+Usage:
+    python benchmarks/client_reuse.py --url http://localhost:8000/query --calls 200
+    python benchmarks/client_reuse.py --url https://api.openai.com/v1/models --method GET
+
+Requires httpx (pip install httpx).
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+DEFAULT_PAYLOAD = {
+    "select": ["o.order_id", "o.status"],
+    "where": ["o.status = 'Pending'"],
+    "limit": 10,
+}
+
+async def send(client, method, url, payload):
+    """Send one request and return its latency in milliseconds."""
+    start = time.perf_counter()
+    if method == "GET":
+        await client.get(url)
+    else:
+        await client.post(url, json=payload)
+    return (time.perf_counter() - start) * 1000
+
+async def per_call_clients(method, url, payload, calls):
+    """Open a fresh client (and connection) for every call."""
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        async with httpx.AsyncClient(timeout=30) as client:
+            await send(client, method, url, payload)
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+async def shared_client(method, url, payload, calls):
+    """Reuse one client and its keep-alive connection for every call."""
+    async with httpx.AsyncClient(timeout=30) as client:
+        await send(client, method, url, payload)  # Warm the connection
+        return [await send(client, method, url, payload) for _ in range(calls)]
+
+def summarize(samples):
+    """Mean and median of a list of latencies."""
+    return {
+        "mean_ms": round(statistics.mean(samples), 3),
+        "p50_ms": round(statistics.median(samples), 3),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://localhost:8000/query")
+    parser.add_argument("--method", choices=["GET", "POST"], default="POST")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--payload", help="JSON payload for POST (default: a small /query)")
+    args = parser.parse_args()
+
+    payload = json.loads(args.payload) if args.payload else DEFAULT_PAYLOAD
+    fresh = summarize(await per_call_clients(args.method, args.url, payload, args.calls))
+    shared = summarize(await shared_client(args.method, args.url, payload, args.calls))
+    print(f"{'mode':<14}{'mean ms':>10}{'p50 ms':>10}")
+    print(f"{'per-call':<14}{fresh['mean_ms']:>10.3f}{fresh['p50_ms']:>10.3f}")
+    print(f"{'shared':<14}{shared['mean_ms']:>10.3f}{shared['p50_ms']:>10.3f}")
+    print(f"saved per call: {fresh['mean_ms'] - shared['mean_ms']:.3f} ms (mean)")
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,107 @@
+"""
+Coverage of the rule-based fast path over a recorded prompt set.
+
+Runs every prompt in benchmarks/prompts.txt through FastPathParser (no LLM,
+no network unless --backend is given) and reports which prompts the fast
+path answers, why the others go to the LLM, the share of traffic it takes
+and how long parsing takes. Duplicate prompts count once per occurrence,
+since the corpus stands for traffic.
+
+Usage:
+    python benchmarks/fast_path_coverage.py --prompts benchmarks/prompts.txt
+    python benchmarks/fast_path_coverage.py --backend http://localhost:8000/query --output coverage.json
+
+--backend loads customer names and tags from the backend, like the agent
+does on startup; otherwise the parser's built-in vocabulary is used.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from fast_path import FastPathParser  # noqa: E402
+from pipeline_latency import DEFAULT_PROMPTS, load_prompts  # noqa: E402
+
+def load_vocabulary(parser, url):
+    """Load customers and tags from the backend, as the agent does."""
+    import httpx
+
+    vocabulary = {}
+    for name, column, group, key in (
+        ("customers", "c.customer_name", "c.customer_name", "customer_name"),
+        ("tags", "unnest(o.tags) as tag", "unnest(o.tags)", "tag"),
+    ):
+        response = httpx.post(url, json={"select": [column, "COUNT(*) as count"], "group_by": [group], "limit": 1000}, timeout=30)
+        response.raise_for_status()
+        vocabulary[name] = [row[key] for row in response.json().get("data", []) if row.get(key)]
+    parser.set_vocabulary(**vocabulary)
+
+def time_parse(parser, prompt, repeat):
+    """Median parse time of a prompt in microseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parser.match(prompt)
+        samples.append((time.perf_counter() - start) * 1_000_000)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--prompts", default=DEFAULT_PROMPTS)
+    parser.add_argument("--backend", help="Backend /query URL to load customers and tags from")
+    parser.add_argument("--repeat", type=int, default=200, help="Parses per prompt for timing")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    fast_path = FastPathParser()
+    if args.backend:
+        load_vocabulary(fast_path, args.backend)
+
+    prompts = load_prompts(args.prompts)
+    rows = []
+    for prompt in prompts:
+        result, reason = fast_path.match(prompt)
+        rows.append({
+            "prompt": prompt,
+            "fast_path": result is not None,
+            "intent": result.intent if result else None,
+            "reason": reason,
+            "parse_us": round(time_parse(fast_path, prompt, args.repeat), 2),
+            "args": result.args if result else None,
+        })
+
+    hits = [row for row in rows if row["fast_path"]]
+    reasons = Counter(row["reason"].split(":")[0] for row in rows if not row["fast_path"])
+    report = {
+        "prompts": len(rows),
+        "fast_path": len(hits),
+        "coverage": round(len(hits) / len(rows), 4) if rows else 0.0,
+        "by_intent": dict(Counter(row["intent"] for row in hits)),
+        "misses_by_reason": dict(reasons),
+        "parse_us_p50": round(statistics.median(row["parse_us"] for row in rows), 2) if rows else 0.0,
+        "parse_us_max": max((row["parse_us"] for row in rows), default=0.0),
+        "customers": len(fast_path.customers),
+        "tags": len(fast_path.tags),
+        "results": rows,
+    }
+
+    for row in rows:
+        outcome = "fast" if row["fast_path"] else "llm "
+        print(f"{outcome} {row['parse_us']:>8.1f} us  {row['prompt']:<45}  {row['reason']}")
+    print(f"\nfast path: {report['fast_path']}/{report['prompts']} prompts ({report['coverage']:.1%})")
+    print(f"misses by reason: {report['misses_by_reason']}")
+    print(f"parse time: p50 {report['parse_us_p50']} us, max {report['parse_us_max']} us")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+        print(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Microbenchmark and determinism check of prompt language detection.
+
+Compares, per prompt of benchmarks/prompts.txt plus a few multilingual
+prompts:
+- langdetect: langdetect.detect() plus the locale lookup, as the agent did
+  on every call before LanguageDetector
+- cold: LanguageDetector with its memo cleared before every call
+- cached: LanguageDetector answering from its memo
+
+The determinism check runs every prompt --runs times through unseeded
+langdetect and through fresh LanguageDetector instances (memo cleared each
+time) and counts prompts that did not always get the same answer. Exits
+with status 1 if LanguageDetector gave any prompt two answers.
+
+Usage:
+    python benchmarks/language_detection.py
+    python benchmarks/language_detection.py --repeat 200 --runs 20 --output language.json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from language_detection import LANGUAGE_LOCALES, LanguageDetector  # noqa: E402
+from pipeline_latency import DEFAULT_PROMPTS, load_prompts  # noqa: E402
+
+EXTRA_PROMPTS = [
+    "Zeige mir alle dringenden Bestellungen",
+    "Toon mij alle bestellingen van deze week",
+    "Mostre-me as encomendas enviadas",
+    "Quels sont les commandes expédiées cette semaine pour Etsy ?",
+    "Quiero ver cuántos pedidos quedan sin enviar este mes",
+    "Покажи заказы за эту неделю",
+    "注文を表示",
+    "显示所有订单",
+    "ok",
+    "Zazzle",
+]
+
+def legacy_detect(text):
+    """The agent's previous detect_language: langdetect plus a rebuilt locale map."""
+    from langdetect import detect
+
+    try:
+        code = detect(text)
+        return dict(LANGUAGE_LOCALES).get(code, "English")
+    except Exception:
+        return "English"
+
+def median_us(function, prompt, repeat, before=None):
+    """Median microseconds per call."""
+    samples = []
+    for _ in range(repeat):
+        if before:
+            before()
+        start = time.perf_counter()
+        function(prompt)
+        samples.append((time.perf_counter() - start) * 1_000_000)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--prompts", default=DEFAULT_PROMPTS)
+    parser.add_argument("--repeat", type=int, default=100, help="Timed calls per prompt and method")
+    parser.add_argument("--runs", type=int, default=20, help="Detections per prompt for the determinism check")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    prompts = load_prompts(args.prompts) + EXTRA_PROMPTS
+    detector = LanguageDetector()
+
+    start = time.perf_counter()
+    detector.load()
+    load_ms = (time.perf_counter() - start) * 1000
+    legacy_detect("warm up langdetect's own profiles")
+
+    rows = []
+    for prompt in prompts:
+        legacy_answers = {legacy_detect(prompt) for _ in range(args.runs)}
+        answers = set()
+        for _ in range(args.runs):
+            fresh = LanguageDetector()
+            fresh._factory = detector._factory  # Share the loaded profiles
+            answers.add(fresh.detect(prompt))
+        detector.clear()
+        rows.append({
+            "prompt": prompt,
+            "detected": detector.detect(prompt),
+            "langdetect": sorted(legacy_answers),
+            "langdetect_us": round(median_us(legacy_detect, prompt, args.repeat), 2),
+            "cold_us": round(median_us(detector.detect, prompt, args.repeat, before=detector.clear), 2),
+            "cached_us": round(median_us(detector.detect, prompt, args.repeat), 2),
+            "deterministic": len(answers) == 1,
+        })
+
+    report = {
+        "prompts": len(rows),
+        "profile_load_ms": round(load_ms, 1),
+        "langdetect_us_p50": round(statistics.median(row["langdetect_us"] for row in rows), 2),
+        "cold_us_p50": round(statistics.median(row["cold_us"] for row in rows), 2),
+        "cached_us_p50": round(statistics.median(row["cached_us"] for row in rows), 2),
+        "langdetect_unstable": sum(len(row["langdetect"]) > 1 for row in rows),
+        "detector_unstable": sum(not row["deterministic"] for row in rows),
+        "runs": args.runs,
+        "results": rows,
+    }
+
+    for row in rows:
+        flag = "" if row["deterministic"] else "  NOT DETERMINISTIC"
+        print(f"{row['prompt'][:42]:<42} {str(row['detected']):>8}  {'/'.join(row['langdetect']):<14}"
+              f" {row['langdetect_us']:>9.1f} {row['cold_us']:>8.1f} {row['cached_us']:>6.2f} us{flag}")
+    print(f"\nprofiles loaded in {report['profile_load_ms']} ms")
+    print(f"p50 per call: langdetect {report['langdetect_us_p50']} us, "
+          f"cold {report['cold_us_p50']} us, cached {report['cached_us_p50']} us")
+    print(f"prompts with varying answers over {args.runs} runs: langdetect {report['langdetect_unstable']}, "
+          f"LanguageDetector {report['detector_unstable']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2, ensure_ascii=False)
+        print(f"Report written to {args.output}")
+
+    sys.exit(1 if report["detector_unstable"] else 0)
+
+if __name__ == "__main__":
+    main()
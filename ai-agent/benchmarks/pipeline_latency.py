@@ -0,0 +1,87 @@
+"""
+End-to-end latency of the agent's POST /query over a recorded prompt set.
+
+Replays each prompt in benchmarks/prompts.txt (in order, one at a time, so
+follow-ups see the previous turns) and reports end-to-end latency plus the
+per-stage timings the agent returns. Run it against the agent started with
+SPECULATIVE_REWRITE=false and again with SPECULATIVE_REWRITE=true to compare.
+
+Usage:
+    python benchmarks/pipeline_latency.py --url http://localhost:8001/query \
+        --prompts benchmarks/prompts.txt --rounds 3 --output run.json
+
+Requires httpx (pip install httpx).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+
+import httpx
+
+DEFAULT_PROMPTS = os.path.join(os.path.dirname(__file__), "prompts.txt")
+
+def load_prompts(path):
+    """Read prompts, skipping blank lines and # comments."""
+    with open(path, encoding="utf-8") as file:
+        return [line.strip() for line in file if line.strip() and not line.startswith("#")]
+
+def percentile(samples, pct):
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize(samples):
+    """Mean and percentiles of a list of latencies in milliseconds."""
+    return {
+        "count": len(samples),
+        "mean_ms": round(statistics.mean(samples), 2) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50), 2),
+        "p95_ms": round(percentile(samples, 95), 2),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://localhost:8001/query")
+    parser.add_argument("--prompts", default=DEFAULT_PROMPTS)
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--output", help="Write the summary as JSON to this file")
+    args = parser.parse_args()
+
+    prompts = load_prompts(args.prompts)
+    end_to_end = []
+    stages = {}
+    errors = 0
+    async with httpx.AsyncClient(timeout=120) as client:
+        for _ in range(args.rounds):
+            await client.post(args.url.rsplit("/", 1)[0] + "/clear-memory")
+            for prompt in prompts:
+                start = time.perf_counter()
+                response = await client.post(args.url, json={"prompt": prompt})
+                end_to_end.append((time.perf_counter() - start) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+                    continue
+                for stage, ms in response.json().get("timings", {}).items():
+                    stages.setdefault(stage, []).append(ms)
+
+    summary = {
+        "prompts": len(prompts),
+        "rounds": args.rounds,
+        "errors": errors,
+        "end_to_end": summarize(end_to_end),
+        "stages": {stage: summarize(samples) for stage, samples in stages.items()},
+    }
+    print(json.dumps(summary, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(summary, file, indent=2)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,290 @@
+"""
+Background conversation log writer.
+
+Requests hand their record to ConversationLog.write, which only puts it on
+an asyncio queue and never waits: if the queue is full the record is dropped
+and counted. One task per worker drains the queue and writes a batch when it
+holds `batch_size` records or `flush_interval` seconds have passed, with the
+file I/O done in a thread so the event loop never blocks on disk.
+
+Formats (CONVERSATION_LOG_FORMAT):
+- csv: one row per exchange under a header row; an existing file with a
+  different header (such as the two-column conversation_history.csv of
+  earlier versions) is rotated out before the first write
+- jsonl: one compact JSON object per line
+- sqlite: rows in a conversation_log table
+
+Several uvicorn workers can share one csv/jsonl file: each batch is written
+with a single write() on an O_APPEND descriptor while holding an exclusive
+flock, so lines from different workers never interleave, and the size check
+and rotation (file -> file.1 -> ... -> file.N) happen under the same lock.
+SQLite serializes writers itself; its file is not rotated.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, a single worker is assumed
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("csv", "jsonl", "sqlite")
+
+# Columns of a record, in CSV and SQLite order
+FIELDS = ("timestamp", "session_id", "intent", "user_message", "assistant_message", "latency_ms")
+
+_CSV_HEADER = ["Timestamp", "Session ID", "Intent", "User Message", "Assistant Message", "Latency (ms)"]
+
+def default_path(log_format: str) -> str:
+    """Log file name for a format."""
+    return {"csv": "conversation_history.csv", "jsonl": "conversation_history.jsonl"}.get(
+        log_format, "conversation_history.db"
+    )
+
+
+class ConversationLog:
+    """
+    Queue-fed, batched writer of conversation records.
+
+    Usage:
+        log = ConversationLog("conversation_history.jsonl", "jsonl")
+        log.start()                      # on startup, inside the event loop
+        log.write(session_id=..., intent=..., user_message=..., assistant_message=...)
+        await log.close()                # on shutdown, flushes what is queued
+    """
+
+    def __init__(self, path: str, log_format: str = "csv", batch_size: int = 100,
+                 flush_interval: float = 1.0, max_bytes: int = 10 * 1024 * 1024,
+                 backup_count: int = 5, queue_size: int = 10000):
+        """
+        Args:
+            path: Log file (or SQLite database) path
+            log_format: csv, jsonl or sqlite
+            batch_size: Records that trigger a flush
+            flush_interval: Maximum seconds a record waits in the queue
+            max_bytes: Size at which csv/jsonl files are rotated (0 disables rotation)
+            backup_count: Rotated files kept
+            queue_size: Records held before new ones are dropped
+
+        Raises:
+            ValueError: If log_format is not csv, jsonl or sqlite
+        """
+        if log_format not in FORMATS:
+            raise ValueError(f"Unsupported conversation log format: {log_format!r}")
+        self.path = path
+        self.log_format = log_format
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.queue_size = queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._db: Optional[sqlite3.Connection] = None
+        self._header_checked: Optional[int] = None  # Inode of the csv file known to have our header
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.rotations = 0
+        self.errors = 0
+        self.flush_ms_max = 0.0
+
+    def start(self):
+        """Start the writer task; must be called from the running event loop."""
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._task = asyncio.create_task(self._run(self._queue))
+
+    def write(self, **fields):
+        """
+        Queue one record without blocking. Unknown fields are ignored and
+        the timestamp is filled in. Dropped (and counted) when the queue is
+        full or the writer is not running.
+        """
+        record = {field: fields.get(field) for field in FIELDS}
+        record["timestamp"] = record["timestamp"] or time.strftime("%Y-%m-%dT%H:%M:%S")
+        if self._queue is None:
+            self.dropped += 1
+            return
+        try:
+            self._queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    async def _run(self, queue: asyncio.Queue):
+        """Drain the queue in batches until the None sentinel from close()."""
+        while True:
+            record = await queue.get()
+            if record is None:
+                return
+            batch = [record]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    record = await asyncio.wait_for(queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if record is None:
+                    await self._flush(batch)
+                    return
+                batch.append(record)
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[dict]):
+        """Write a batch in a worker thread; errors are counted, never raised."""
+        start = time.perf_counter()
+        try:
+            await asyncio.to_thread(self._write_batch, batch)
+            self.written += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.errors += 1
+            logger.error("Conversation log write failed (%d records lost): %s", len(batch), e)
+        self.flush_ms_max = max(self.flush_ms_max, (time.perf_counter() - start) * 1000)
+
+    def _write_batch(self, batch: List[dict]):
+        if self.log_format == "sqlite":
+            self._write_sqlite(batch)
+        else:
+            self._append_file(batch)
+
+    def _encode(self, batch: List[dict], with_header: bool) -> bytes:
+        """A batch as the bytes of whole csv rows or jsonl lines."""
+        if self.log_format == "jsonl":
+            return "".join(
+                json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str) + "\n"
+                for record in batch
+            ).encode("utf-8")
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        if with_header:
+            writer.writerow(_CSV_HEADER)
+        writer.writerows([record[field] for field in FIELDS] for record in batch)
+        return buffer.getvalue().encode("utf-8")
+
+    def _open_locked(self) -> int:
+        """
+        Open the log for appending and lock it. Another worker may have
+        rotated the file between open and lock, so retry until the locked
+        descriptor is the file currently at `path`.
+        """
+        while True:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            if fcntl is None:
+                return fd
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                if os.stat(self.path).st_ino == os.fstat(fd).st_ino:
+                    return fd
+            except FileNotFoundError:
+                pass
+            os.close(fd)  # Also releases the lock
+
+    def _rotate(self, keep: bool = False):
+        """
+        file.N-1 -> file.N, ..., file -> file.1 (caller holds the lock).
+        With keep, the file is moved to file.1 even if backup_count is 0.
+        """
+        for index in range(self.backup_count - 1, 0, -1):
+            source = f"{self.path}.{index}"
+            if os.path.exists(source):
+                os.replace(source, f"{self.path}.{index + 1}")
+        if self.backup_count > 0 or keep:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self.rotations += 1
+
+    def _has_header(self, fd: int) -> bool:
+        """Whether the csv file behind fd starts with our header (caller holds the lock)."""
+        inode = os.fstat(fd).st_ino
+        if self._header_checked == inode:
+            return True
+        header = self._encode([], with_header=True)
+        with open(self.path, "rb") as f:
+            if f.read(len(header)) != header:
+                return False
+        self._header_checked = inode
+        return True
+
+    def _append_file(self, batch: List[dict]):
+        fd = self._open_locked()
+        try:
+            size = os.fstat(fd).st_size
+            if size and self.log_format == "csv" and not self._has_header(fd):
+                logger.warning("Conversation log %s has another header; rotating it out", self.path)
+                self._rotate(keep=True)
+                os.close(fd)
+                fd = self._open_locked()
+                size = 0
+            elif self.max_bytes and size >= self.max_bytes:
+                self._rotate()
+                os.close(fd)
+                fd = self._open_locked()
+                size = 0
+            data = self._encode(batch, with_header=size == 0 and self.log_format == "csv")
+            # One write per batch: the lock keeps other workers out, O_APPEND puts it at the end
+            while data:
+                data = data[os.write(fd, data):]
+        finally:
+            os.close(fd)  # Releases the lock
+
+    def _write_sqlite(self, batch: List[dict]):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS conversation_log ("
+                " timestamp TEXT, session_id TEXT, intent TEXT,"
+                " user_message TEXT, assistant_message TEXT, latency_ms REAL)"
+            )
+        with self._db:
+            self._db.executemany(
+                f"INSERT INTO conversation_log ({', '.join(FIELDS)}) VALUES ({', '.join('?' * len(FIELDS))})",
+                [tuple(record[field] for field in FIELDS) for record in batch],
+            )
+
+    async def close(self):
+        """Flush everything still queued and stop the writer."""
+        if self._task is not None:
+            queue, self._queue = self._queue, None  # New records are dropped from here on
+            await queue.put(None)
+            await self._task
+            self._task = None
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def stats(self) -> Dict[str, object]:
+        """
+        Writer statistics for this worker process.
+
+        Returns:
+            dict: Format, path, queued, written, dropped, batches, rotations,
+                errors and the slowest flush in milliseconds
+        """
+        return {
+            "format": self.log_format,
+            "path": self.path,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "rotations": self.rotations,
+            "errors": self.errors,
+            "flush_ms_max": round(self.flush_ms_max, 2),
+            "pid": os.getpid(),
+        }
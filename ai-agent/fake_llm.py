@@ -0,0 +1,159 @@
+"""
+Deterministic stand-in for the LLM client, for benchmarks and offline runs.
+
+With LLM_PROVIDER=fake the agent uses FakeLLMClient instead of OpenAI, so
+the whole pipeline (intent, rewrite, args, backend, insights) runs without
+a model or an API key. Each call sleeps for a configurable latency and then
+answers from rules, the same way for the same prompt:
+- intent: small_talk for greetings and thanks, visual_insight for charts,
+  graphs and "per"/"by" breakdowns, otherwise table_insights
+- rewrite: the prompt unchanged, in English
+- args: what the fast path parser makes of the prompt, or else the most
+  recent orders (order counts by status for charts)
+- small talk and insights: a fixed sentence
+- transcription: the prompt as text
+
+Latency is a base per call (or per stage) plus a jitter derived from a
+hash of the stage and prompt, so a replayed corpus has the same latency
+profile on every run.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+from typing import Dict, List, Optional
+
+from fast_path import FastPathParser
+
+# Stages told apart by a phrase of their system prompt; anything else is insights
+_STAGE_MARKERS = (
+    ("expert classifier", "intent"),
+    ("rewrites user prompts", "rewrite"),
+    ("transforming natural language", "args"),
+    ("transcription assistant", "transcription"),
+    ("friendly AI assistant", "small_talk"),
+)
+
+_SMALL_TALK = re.compile(r"\b(hello|hi|hey|hola|bonjour|ciao|thanks?|thank you|gracias|merci|bye|goodbye)\b", re.I)
+_CHART = re.compile(r"\b(chart|graph|plot|per|by)\b", re.I)
+
+_ARGS_PREFIX = "The user question is:"
+
+_TABLE_ARGS = {
+    "select": ["o.order_id", "o.status", "c.customer_name", "o.due_date", "o.tags", "o.items", "o.action_json"],
+    "from": ["orders"],
+    "where": [],
+    "group_by": [],
+    "order_by": ["o.last_updated DESC"],
+    "limit": 50,
+}
+
+_CHART_ARGS = {
+    "select": ["o.status", "COUNT(*) as count"],
+    "from": ["orders"],
+    "where": [],
+    "group_by": ["o.status"],
+    "order_by": [],
+    "limit": 0,
+}
+
+def parse_stage_latency(spec: str) -> Dict[str, float]:
+    """Per-stage latencies from "args=600,insights=800" (milliseconds)."""
+    latencies = {}
+    for item in spec.split(","):
+        stage, sep, value = item.partition("=")
+        if sep and stage.strip():
+            latencies[stage.strip()] = float(value)
+    return latencies
+
+
+class FakeCompletion:
+    """One completion, shaped like the real client's (only .content is used)."""
+
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeLLMClient:
+    """
+    Rule-based chat_completion with simulated latency.
+
+    Usage:
+        client = FakeLLMClient(latency_ms=300, jitter_ms=100, stage_latency_ms={"args": 600})
+        response = await client.chat_completion(messages, options)
+        response[0].content
+    """
+
+    def __init__(self, latency_ms: float = 300.0, jitter_ms: float = 0.0,
+                 stage_latency_ms: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            latency_ms: Base latency of every call
+            jitter_ms: Up to this much is added per call, fixed per stage and prompt
+            stage_latency_ms: Base latency overrides by stage (intent, rewrite,
+                args, insights, small_talk, transcription)
+        """
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.stage_latency_ms = dict(stage_latency_ms or {})
+        self.parser = FastPathParser()
+        self.calls: Dict[str, int] = {}
+
+    async def chat_completion(self, messages: List, options=None) -> List[FakeCompletion]:
+        system = messages[0].content if messages else ""
+        prompt = messages[-1].content.strip() if messages else ""
+        stage = next((name for marker, name in _STAGE_MARKERS if marker in system), "insights")
+        if stage == "args" and prompt.startswith(_ARGS_PREFIX):
+            prompt = prompt[len(_ARGS_PREFIX):].strip()
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+
+        await asyncio.sleep(self.delay_ms(stage, prompt) / 1000)
+        return [FakeCompletion(self.answer(stage, prompt))]
+
+    def delay_ms(self, stage: str, prompt: str) -> float:
+        """Latency of a call: the stage's base plus a jitter fixed by stage and prompt."""
+        base = self.stage_latency_ms.get(stage, self.latency_ms)
+        if not self.jitter_ms:
+            return base
+        digest = hashlib.blake2b(f"{stage}\0{prompt}".encode("utf-8"), digest_size=8).digest()
+        return base + self.jitter_ms * int.from_bytes(digest, "big") / 2**64
+
+    def answer(self, stage: str, prompt: str) -> str:
+        """The completion text for a stage."""
+        if stage == "intent":
+            return json.dumps({"intent": self.intent(prompt), "reason": "fake LLM rules"})
+        if stage == "rewrite":
+            return json.dumps({"rewritten_question": prompt, "language": "English"})
+        if stage == "args":
+            return json.dumps(self.args(prompt))
+        if stage == "transcription":
+            return json.dumps({"text": prompt})
+        if stage == "small_talk":
+            return "Hello! I can help you with your print orders."
+        return "Most orders are on track; prioritize the urgent ones due in the next few days."
+
+    def intent(self, prompt: str) -> str:
+        match, _reason = self.parser.match(prompt)
+        if match is not None:
+            return match.intent
+        if _CHART.search(prompt):
+            return "visual_insight"
+        if _SMALL_TALK.search(prompt):
+            return "small_talk"
+        return "table_insights"
+
+    def args(self, prompt: str) -> dict:
+        match, _reason = self.parser.match(prompt)
+        if match is not None:
+            return {**_TABLE_ARGS, "where": [], "group_by": [], "order_by": [], **match.args}
+        return dict(_CHART_ARGS if _CHART.search(prompt) else _TABLE_ARGS)
+
+    def stats(self) -> Dict[str, object]:
+        """Calls per stage and the configured latencies."""
+        return {
+            "calls": dict(self.calls),
+            "latency_ms": self.latency_ms,
+            "jitter_ms": self.jitter_ms,
+            "stage_latency_ms": self.stage_latency_ms,
+        }
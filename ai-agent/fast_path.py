@@ -0,0 +1,418 @@
+"""
+Rule-based parser for the common, unambiguous order prompts.
+
+Most operator prompts are templates: a status, a customer, a tag, a relative
+date, maybe a count or a sort ("the 5 most recent urgent orders from Zazzle",
+"orders shipped last week", "bar chart of orders by status"). This module
+turns those straight into prompt_to_args-shaped args without any LLM call.
+
+The grammar is deliberately strict. Every word of the prompt has to be
+accounted for by the lexicon, the prompt has to mention orders, and the
+pieces have to combine in one obvious way. Anything else (typos, other
+languages, follow-ups like "now only printed", "overdue", small talk) is
+rejected with a reason and the prompt takes the LLM path unchanged.
+
+Customer names and tags come from the live data (see set_vocabulary); the
+defaults are the known values listed in the prompt_to_args system prompt.
+"""
+
+import calendar
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from args_cache import normalize_prompt
+
+DEFAULT_CUSTOMERS = ("Canva", "Zazzle", "Etsy", "Minted")
+DEFAULT_TAGS = ("urgent", "logo", "photo", "luxury", "eco-friendly", "poster", "text", "bulk", "business")
+
+# Same default page size prompt_to_args uses in its examples
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 1000
+
+# Lexicon item kinds
+FILLER = "filler"        # Words that don't change the query
+NOUN = "noun"            # "orders" / "jobs"; required, so fragments stay with the LLM
+CONJ = "conj"            # "and" / "or"
+STATUS = "status"
+CUSTOMER = "customer"
+TAG = "tag"
+NEGATE = "negate"        # "not from", "excluding", ...; applies to the customers after it
+DUE = "due"
+DATE = "date"
+LAST = "last"            # "last 5 orders"; "last week" is a DATE
+SORT = "sort"
+GROUP = "group"
+CHART = "chart"
+AMBIGUOUS = "ambiguous"  # Phrase claimed by two vocabulary entries
+
+_FILLER_WORDS = (
+    "show", "me", "us", "list", "give", "get", "display", "find", "see", "view", "fetch", "return",
+    "all", "the", "a", "an", "please", "pls", "can", "could", "would", "you", "i", "we", "want",
+    "need", "to", "what", "which", "are", "is", "were", "was", "have", "has", "been", "that",
+    "my", "our", "any", "there", "of", "with", "tagged", "tag", "tags", "as", "customer", "client",
+    "for", "from", "in", "on", "during", "status", "top", "first", "every",
+)
+
+_STATUS_PHRASES = {
+    ("pending",): "Pending",
+    ("printed",): "Printed",
+    ("shipped",): "Shipped",
+    ("print", "ready"): "Print Ready",
+    ("print-ready",): "Print Ready",
+    ("ready", "to", "print"): "Print Ready",
+    ("ready", "for", "printing"): "Print Ready",
+    ("printing", "ready"): "Print Ready",
+}
+
+# Statuses that are also action_json events ("orders shipped last week")
+_EVENTS = {"Printed": "printed", "Shipped": "shipped"}
+
+_NEGATE_PHRASES = (
+    ("not", "from"), ("not", "for"), ("excluding",), ("except",), ("except", "for"),
+    ("without",), ("other", "than"),
+)
+
+_SORT_PHRASES = {
+    ("recent",): "o.last_updated DESC",
+    ("most", "recent"): "o.last_updated DESC",
+    ("latest",): "o.last_updated DESC",
+    ("newest",): "o.last_updated DESC",
+    ("oldest",): "o.due_date ASC",
+    ("most", "items"): "o.items DESC",
+    ("highest", "item", "count"): "o.items DESC",
+    ("largest",): "o.items DESC",
+    ("biggest",): "o.items DESC",
+    ("fewest", "items"): "o.items ASC",
+    ("smallest",): "o.items ASC",
+}
+
+# Grouped chart args, as in the prompt_to_args examples
+_GROUPS = {
+    "status": (["o.status", "COUNT(*) as count"], ["o.status"]),
+    "tag": (["unnest(o.tags) as tag", "COUNT(*) as count"], ["unnest(o.tags)"]),
+    "customer": (["c.customer_name", "COUNT(*) as count"], ["c.customer_name"]),
+}
+_GROUP_WORDS = {"status": "status", "tag": "tag", "tags": "tag", "customer": "customer", "customers": "customer"}
+
+_CHART_WORDS = ("chart", "graph", "plot", "bar", "pie", "diagram", "visualize", "visualise")
+
+_RELATIVE_DATES = (
+    ("today",), ("yesterday",), ("tomorrow",),
+    ("this", "week"), ("last", "week"), ("next", "week"),
+    ("this", "month"), ("last", "month"), ("next", "month"),
+)
+
+_MONTHS = {calendar.month_name[number].lower(): number for number in range(1, 13)}
+
+# Longest lexicon phrase, in words
+_MAX_PHRASE = 3
+
+
+class FastPathMatch(NamedTuple):
+    """Args for a prompt the fast path understood, and its intent."""
+    args: dict
+    intent: str  # "table_insights" or "visual_insight"
+
+
+def _quote(value: str) -> str:
+    """SQL string literal."""
+    return "'" + value.replace("'", "''") + "'"
+
+def _month_range(year: int, month: int) -> Tuple[date, date]:
+    """First day of a month and of the month after."""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+def _relative_range(phrase: Tuple[str, ...], today: date) -> Tuple[date, date]:
+    """[start, end) of a relative date phrase; weeks start on Monday."""
+    if phrase == ("today",):
+        return today, today + timedelta(days=1)
+    if phrase == ("yesterday",):
+        return today - timedelta(days=1), today
+    if phrase == ("tomorrow",):
+        return today + timedelta(days=1), today + timedelta(days=2)
+    offset = {"last": -1, "this": 0, "next": 1}[phrase[0]]
+    if phrase[1] == "week":
+        start = today - timedelta(days=today.weekday()) + timedelta(weeks=offset)
+        return start, start + timedelta(weeks=1)
+    month = today.month + offset
+    year = today.year + (month - 1) // 12
+    return _month_range(year, (month - 1) % 12 + 1)
+
+
+class FastPathParser:
+    """
+    Deterministic prompt → args parser for template prompts.
+
+    Usage:
+        parser = FastPathParser()
+        parser.set_vocabulary(customers=["Canva", "Etsy"], tags=["urgent"])
+        result = parser.parse("Show me urgent orders from Etsy")
+        if result is None:
+            ...  # LLM path
+        else:
+            args, intent = result
+    """
+
+    def __init__(self, customers: Iterable[str] = DEFAULT_CUSTOMERS, tags: Iterable[str] = DEFAULT_TAGS):
+        """
+        Args:
+            customers: Known customer names
+            tags: Known tags
+        """
+        self.hits = 0
+        self.misses: Dict[str, int] = {}
+        self.set_vocabulary(customers, tags)
+
+    def set_vocabulary(self, customers: Optional[Iterable[str]] = None, tags: Optional[Iterable[str]] = None):
+        """
+        Replace the customer names and/or tags the parser recognizes.
+
+        A word claimed by two entries (a customer also used as a tag, a tag
+        named like a status) is marked ambiguous, and prompts using it go to
+        the LLM.
+        """
+        if customers is not None:
+            self.customers = tuple(sorted({name for name in customers if name}))
+        if tags is not None:
+            self.tags = tuple(sorted({tag for tag in tags if tag}))
+
+        lexicon: Dict[Tuple[str, ...], tuple] = {}
+
+        def add(phrase, item):
+            if not phrase or len(phrase) > _MAX_PHRASE:
+                return
+            if phrase in lexicon and lexicon[phrase] != item:
+                item = (AMBIGUOUS, " ".join(phrase))
+            lexicon[phrase] = item
+
+        for word in _FILLER_WORDS:
+            add((word,), (FILLER, None))
+        for word in ("orders", "order", "jobs", "job"):
+            add((word,), (NOUN, None))
+        add(("and",), (CONJ, "and"))
+        add(("or",), (CONJ, "or"))
+        for phrase, status in _STATUS_PHRASES.items():
+            add(phrase, (STATUS, status))
+        for phrase in _NEGATE_PHRASES:
+            add(phrase, (NEGATE, None))
+        add(("due",), (DUE, None))
+        add(("last",), (LAST, None))
+        for phrase in _RELATIVE_DATES:
+            add(phrase, (DATE, phrase))
+        for phrase, order in _SORT_PHRASES.items():
+            add(phrase, (SORT, order))
+        for word, group in _GROUP_WORDS.items():
+            add(("by", word), (GROUP, group))
+            add(("per", word), (GROUP, group))
+        for word in _CHART_WORDS:
+            add((word,), (CHART, None))
+
+        for name in self.customers:
+            words = tuple(normalize_prompt(name).split())
+            add(words, (CUSTOMER, name))
+            if words:
+                add(words[:-1] + (words[-1] + "'s",), (CUSTOMER, name))
+        for tag in self.tags:
+            words = tuple(normalize_prompt(tag).split())
+            add(words, (TAG, tag))
+            if words and not words[-1].endswith("s"):
+                plural = words[:-1] + (words[-1] + "s",)
+                if plural not in lexicon:
+                    add(plural, (TAG, tag))
+
+        self._lexicon = lexicon
+
+    def _tokenize(self, words: List[str], today: date) -> Tuple[Optional[list], str]:
+        """Longest-match words into lexicon items; returns (items, reason)."""
+        items = []
+        i = 0
+        while i < len(words):
+            word = words[i]
+            if word.isdigit():
+                items.append(("number", int(word)))
+                i += 1
+                continue
+            if word in _MONTHS:
+                # "June" or "June 2025": the whole month
+                year = today.year
+                i += 1
+                if i < len(words) and len(words[i]) == 4 and words[i].isdigit():
+                    year = int(words[i])
+                    i += 1
+                items.append((DATE, _month_range(year, _MONTHS[word])))
+                continue
+            for size in range(min(_MAX_PHRASE, len(words) - i), 0, -1):
+                item = self._lexicon.get(tuple(words[i:i + size]))
+                if item is not None:
+                    break
+            else:
+                return None, f"unknown word: {word}"
+            if item[0] == AMBIGUOUS:
+                return None, f"ambiguous word: {item[1]}"
+            if item[0] == DATE:
+                item = (DATE, _relative_range(item[1], today))
+            if item[0] != FILLER:
+                items.append(item)
+            i += size
+        return items, ""
+
+    def match(self, prompt: str, today: Optional[date] = None) -> Tuple[Optional[FastPathMatch], str]:
+        """
+        Parse a prompt without touching the hit/miss counters.
+
+        Args:
+            prompt: User prompt
+            today: Date relative expressions resolve against (default: today)
+
+        Returns:
+            (match, "") when the prompt is understood, else (None, reason)
+        """
+        today = today or date.today()
+        items, reason = self._tokenize(normalize_prompt(prompt).split(), today)
+        if items is None:
+            return None, reason
+        if not any(kind == NOUN for kind, _ in items):
+            return None, "no orders noun"
+
+        statuses: List[str] = []
+        included: List[str] = []
+        excluded: List[str] = []
+        tags: List[str] = []
+        ranges: List[Tuple[str, date, date]] = []
+        sorts: List[str] = []
+        groups: List[str] = []
+        limits: List[int] = []
+        chart = False
+        has_or = False
+
+        i = 0
+        while i < len(items):
+            kind, value = items[i]
+            following = items[i + 1] if i + 1 < len(items) else (None, None)
+            if kind == STATUS:
+                if value in _EVENTS and following[0] == DATE:
+                    # "shipped last week" filters on the event, not the status
+                    ranges.append((f"o.action_json->>{_quote(_EVENTS[value])}", *following[1]))
+                    i += 1
+                else:
+                    statuses.append(value)
+            elif kind == CUSTOMER:
+                included.append(value)
+            elif kind == NEGATE:
+                if following[0] != CUSTOMER:
+                    return None, "negation without a customer"
+                while i + 1 < len(items) and items[i + 1][0] in (CUSTOMER, CONJ):
+                    i += 1
+                    if items[i][0] == CUSTOMER:
+                        excluded.append(items[i][1])
+            elif kind == TAG:
+                tags.append(value)
+            elif kind == DUE:
+                if following[0] != DATE:
+                    return None, "due without a date"
+                ranges.append(("o.due_date", *following[1]))
+                i += 1
+            elif kind == DATE:
+                return None, "date without due or an event"
+            elif kind == LAST:
+                if following[0] != "number":
+                    return None, "last without a count"
+                sorts.append("o.last_updated DESC")
+            elif kind == "number":
+                limits.append(value)
+            elif kind == SORT:
+                sorts.append(value)
+            elif kind == GROUP:
+                groups.append(value)
+            elif kind == CHART:
+                chart = True
+            elif kind == CONJ:
+                has_or = has_or or value == "or"
+            i += 1
+
+        if len(limits) > 1 or len(set(sorts)) > 1 or len(groups) > 1 or len(ranges) > 1:
+            return None, "conflicting modifiers"
+        if limits and not 0 < limits[0] <= MAX_LIMIT:
+            return None, "limit out of range"
+        if included and excluded:
+            return None, "customers both included and excluded"
+        if has_or and len(tags) > 1:
+            return None, "tags joined by or"
+        if len(set(statuses)) < len(statuses):
+            return None, "repeated status"
+
+        where = []
+        for names, op, many in ((included, "=", "IN"), (excluded, "<>", "NOT IN")):
+            names = list(dict.fromkeys(names))
+            if len(names) == 1:
+                where.append(f"o.customer_id {op} (SELECT customer_id FROM customers WHERE customer_name = {_quote(names[0])})")
+            elif names:
+                listed = ", ".join(_quote(name) for name in names)
+                where.append(f"o.customer_id {many} (SELECT customer_id FROM customers WHERE customer_name IN ({listed}))")
+        if len(statuses) == 1:
+            where.append(f"o.status = {_quote(statuses[0])}")
+        elif statuses:
+            where.append(f"o.status IN ({', '.join(_quote(status) for status in statuses)})")
+        for tag in dict.fromkeys(tags):
+            where.append(f"{_quote(tag)} = ANY(o.tags)")
+        for column, start, end in ranges:
+            where.append(f"{column} >= {_quote(start.isoformat())}")
+            where.append(f"{column} < {_quote(end.isoformat())}")
+
+        if groups or chart:
+            if not (groups and chart):
+                return None, "grouping without a chart" if groups else "chart without a grouping"
+            if limits or sorts:
+                return None, "count or sort on a chart"
+            select, group_by = _GROUPS[groups[0]]
+            args = {
+                "select": list(select),
+                "from": ["orders"],
+                "where": where,
+                "group_by": list(group_by),
+                "order_by": ["count DESC"],
+            }
+            return FastPathMatch(args, "visual_insight"), ""
+
+        args = {
+            "select": ["*"],
+            "from": ["orders"],
+            "where": where,
+            "group_by": [],
+            "order_by": sorts[:1],
+            "limit": limits[0] if limits else DEFAULT_LIMIT,
+        }
+        return FastPathMatch(args, "table_insights"), ""
+
+    def parse(self, prompt: str, today: Optional[date] = None) -> Optional[FastPathMatch]:
+        """
+        Parse a prompt and count the outcome.
+
+        Returns:
+            FastPathMatch, or None if the prompt needs the LLM
+        """
+        result, reason = self.match(prompt, today)
+        if result is None:
+            kind = reason.split(":")[0]
+            self.misses[kind] = self.misses.get(kind, 0) + 1
+        else:
+            self.hits += 1
+        return result
+
+    def stats(self) -> dict:
+        """
+        Parser statistics.
+
+        Returns:
+            dict: Hits, misses by reason, hit ratio and vocabulary sizes
+        """
+        lookups = self.hits + sum(self.misses.values())
+        return {
+            "hits": self.hits,
+            "misses": dict(self.misses),
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "customers": len(self.customers),
+            "tags": len(self.tags),
+        }
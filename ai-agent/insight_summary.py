@@ -0,0 +1,237 @@
+"""
+Compact, token-budgeted input for generate_llm_insights.
+
+Sending every returned order to the model costs tokens proportional to the
+page size (and overflows the context at the 1000-row limit). The insight
+prompts only need aggregates, so this module computes them in one pass over
+the rows:
+- counts by status, customer, tag and order type
+- due-date buckets relative to today, overdue counts by status
+- urgent orders that are overdue or due within 3 days
+- printed / shipped counts derived from action_json
+- missing customer names and due dates
+- the most pressing open orders (earliest due first)
+
+Grouped chart rows ({"tag": "urgent", "count": 12}) are kept as they are,
+apart from folding the long tail into an "other" entry.
+
+The rendered payload is shrunk (fewer top entries, fewer sample orders)
+until it fits the token budget. Tokens are counted with tiktoken when it is
+installed and estimated at 4 characters per token otherwise.
+"""
+
+import heapq
+import json
+from collections import Counter
+from datetime import date, timedelta
+from typing import List, Optional, Tuple
+
+# (top entries per breakdown, sample orders), from most to least detailed
+_DETAIL_LEVELS = ((10, 10), (10, 5), (5, 3), (5, 0), (3, 0), (1, 0))
+
+_encoding = None
+
+def count_tokens(text: str) -> int:
+    """Tokens in a text: exact with tiktoken, otherwise ~4 characters per token."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("o200k_base")
+        except Exception:  # Not installed, or the encoding can't be loaded
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+def token_counter() -> str:
+    """Name of the method count_tokens uses."""
+    count_tokens("")
+    return "tiktoken" if _encoding else "estimate"
+
+def is_grouped(rows: List[dict]) -> bool:
+    """True for chart data: every row is a label plus a count."""
+    return bool(rows) and all("count" in row and len(row) == 2 for row in rows)
+
+def _day(value) -> Optional[str]:
+    """YYYY-MM-DD prefix of a date or timestamp value."""
+    if not value:
+        return None
+    return str(value)[:10]
+
+def _aggregate(orders: List[dict], today: date) -> dict:
+    """All aggregates in one pass over the rows."""
+    today_s = today.isoformat()
+    in_3_days = (today + timedelta(days=3)).isoformat()
+    in_7_days = (today + timedelta(days=7)).isoformat()
+    week_ago = (today - timedelta(days=7)).isoformat()
+
+    status, customers, tags, order_types = Counter(), Counter(), Counter(), Counter()
+    due, overdue_by_status, urgent, events, missing = Counter(), Counter(), Counter(), Counter(), Counter()
+    items_total = items_max = items_rows = 0
+    open_orders = []
+
+    for index, order in enumerate(orders):
+        order_status = order.get("status")
+        if order_status:
+            status[order_status] += 1
+        if "customer_name" in order:
+            if order["customer_name"]:
+                customers[order["customer_name"]] += 1
+            else:
+                missing["customer_name"] += 1
+        order_tags = order.get("tags") or []
+        tags.update(order_tags)
+        if order.get("order_type"):
+            order_types[order["order_type"]] += 1
+        items = order.get("items")
+        if isinstance(items, (int, float)):
+            items_total += items
+            items_max = max(items_max, items)
+            items_rows += 1
+
+        actions = order.get("action_json") or {}
+        printed, shipped = _day(actions.get("printed")), _day(actions.get("shipped"))
+        if printed:
+            events["printed"] += 1
+            events["printed_last_7_days"] += printed >= week_ago
+            events["printed_not_shipped"] += not shipped
+        if shipped:
+            events["shipped"] += 1
+            events["shipped_last_7_days"] += shipped >= week_ago
+
+        if "due_date" not in order:
+            continue
+        due_day = _day(order["due_date"])
+        if due_day is None:
+            missing["due_date"] += 1
+            due["missing"] += 1
+            continue
+        is_open = order_status != "Shipped" and not shipped
+        is_urgent = "urgent" in order_tags
+        urgent["total"] += is_urgent
+        if due_day < today_s:
+            due["past"] += 1
+            if is_open:
+                due["overdue"] += 1
+                overdue_by_status[order_status or "unknown"] += 1
+                urgent["overdue"] += is_urgent
+        elif due_day == today_s:
+            due["today"] += 1
+        elif due_day <= in_3_days:
+            due["next_3_days"] += 1
+        elif due_day <= in_7_days:
+            due["next_7_days"] += 1
+        else:
+            due["later"] += 1
+        if is_open and today_s <= due_day <= in_3_days:
+            urgent["due_next_3_days"] += is_urgent
+        if is_open:
+            # Index breaks ties so rows themselves are never compared
+            open_orders.append((due_day, index))
+
+    return {
+        "rows": len(orders),
+        "status": status,
+        "customers": customers,
+        "tags": tags,
+        "order_types": order_types,
+        "items": (items_total, items_max, items_rows),
+        "due": due,
+        "overdue_by_status": overdue_by_status,
+        "urgent": urgent,
+        "events": events,
+        "missing": missing,
+        "open_orders": open_orders,
+    }
+
+def _top(counter: Counter, top: int) -> dict:
+    """The `top` most common entries, with the remainder folded into "other"."""
+    result = dict(counter.most_common(top))
+    rest = len(counter) - len(result)
+    if rest > 0:
+        result[f"other ({rest})"] = sum(counter.values()) - sum(result.values())
+    return result
+
+def _render(orders: List[dict], aggregates: dict, top: int, sample: int) -> dict:
+    """JSON-ready summary at one level of detail; empty sections are left out."""
+    items_total, items_max, items_rows = aggregates["items"]
+    summary = {
+        "orders": aggregates["rows"],
+        "by_status": dict(aggregates["status"]),
+        "by_customer": _top(aggregates["customers"], top),
+        "by_tag": _top(aggregates["tags"], top),
+        "by_order_type": dict(aggregates["order_types"]),
+        "items": {
+            "total": items_total,
+            "average": round(items_total / items_rows, 1),
+            "max": items_max,
+        } if items_rows else {},
+        "due_dates": dict(aggregates["due"]),
+        "overdue_by_status": dict(aggregates["overdue_by_status"]),
+        "urgent": dict(aggregates["urgent"]),
+        "events": dict(aggregates["events"]),
+        "missing": dict(aggregates["missing"]),
+    }
+    if sample:
+        pressing = heapq.nsmallest(sample, aggregates["open_orders"])
+        summary["most_pressing"] = [
+            {
+                key: orders[index][key]
+                for key in ("order_id", "due_date", "status", "customer_name", "tags", "items")
+                if key in orders[index]
+            }
+            for _, index in pressing
+        ]
+    return {key: value for key, value in summary.items() if value not in ({}, [], None)}
+
+def _render_groups(rows: List[dict], top: int) -> dict:
+    """Chart rows with the long tail folded; top is scaled up since rows are tiny."""
+    label = next(key for key in rows[0] if key != "count")
+    ordered = sorted(rows, key=lambda row: row.get("count") or 0, reverse=True)
+    keep = ordered[:top * 3]
+    summary = {
+        "grouped_by": label,
+        "groups": len(rows),
+        "total": sum(row.get("count") or 0 for row in rows),
+        "rows": keep,
+    }
+    if len(ordered) > len(keep):
+        summary["other"] = {
+            "groups": len(ordered) - len(keep),
+            "count": sum(row.get("count") or 0 for row in ordered[len(keep):]),
+        }
+    return summary
+
+def build_insight_payload(rows: List[dict], budget_tokens: int, today: Optional[date] = None) -> Tuple[str, dict]:
+    """
+    Summarize query rows into a JSON payload that fits a token budget.
+
+    Args:
+        rows: Rows returned by the backend (orders or grouped chart rows)
+        budget_tokens: Maximum tokens for the payload
+        today: Date due dates are bucketed against (default: today)
+
+    Returns:
+        (payload, info): Compact JSON text and a dict with the row count,
+            payload tokens, level of detail and whether the budget was met
+    """
+    grouped = is_grouped(rows)
+    aggregates = None if grouped else _aggregate(rows, today or date.today())
+
+    for top, sample in _DETAIL_LEVELS:
+        summary = _render_groups(rows, top) if grouped else _render(rows, aggregates, top, sample)
+        payload = json.dumps(summary, separators=(",", ":"), ensure_ascii=False, default=str)
+        tokens = count_tokens(payload)
+        if tokens <= budget_tokens:
+            break
+
+    return payload, {
+        "rows": len(rows),
+        "grouped": grouped,
+        "payload_tokens": tokens,
+        "budget_tokens": budget_tokens,
+        "within_budget": tokens <= budget_tokens,
+        "top": top,
+        "sample_orders": 0 if grouped else sample,
+    }
@@ -0,0 +1,266 @@
+"""
+Language detection for prompts.
+
+langdetect is slow (it builds an n-gram model of the text on every call),
+loads its 55 profiles lazily on the first call, and is random by design:
+the same short prompt can come back as different languages on different
+calls. Operator prompts are short and repetitive, so LanguageDetector:
+- answers from a memo of normalized prompts
+- recognizes non-Latin scripts (Cyrillic, Arabic, CJK, ...) by character
+- scores Latin-script prompts against stopword and domain word lists
+  ("muéstrame los pedidos" is Spanish without asking langdetect)
+- runs langdetect, with a fixed seed, only on longer prompts the word lists
+  can't settle, and only trusts confident results
+Anything still undecided returns None, and resolve() falls back to the
+language the rewrite LLM reported.
+"""
+
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+ENGLISH = "English"
+ENGLISH_LOCALE = "en-US"
+
+# langdetect codes to the locales reported to the pipeline
+LANGUAGE_LOCALES: Dict[str, str] = {
+    "af": "af-ZA", "am": "am-ET", "ar": "ar-SA", "az": "az-AZ", "bg": "bg-BG",
+    "bn": "bn-BD", "ca": "ca-ES", "cs": "cs-CZ", "cy": "cy-GB", "da": "da-DK",
+    "de": "de-DE", "el": "el-GR", "en": "en-US", "es": "es-ES", "et": "et-EE",
+    "fa": "fa-IR", "fi": "fi-FI", "fr": "fr-FR", "gu": "gu-IN", "he": "he-IL",
+    "hi": "hi-IN", "hr": "hr-HR", "hu": "hu-HU", "id": "id-ID", "is": "is-IS",
+    "it": "it-IT", "ja": "ja-JP", "jv": "jv-ID", "km": "km-KH", "kn": "kn-IN",
+    "ko": "ko-KR", "lt": "lt-LT", "lv": "lv-LV", "ml": "ml-IN", "mr": "mr-IN",
+    "ms": "ms-MY", "nb": "no-NO", "ne": "ne-NP", "nl": "nl-NL", "pa": "pa-IN",
+    "pl": "pl-PL", "pt": "pt-PT", "ro": "ro-RO", "ru": "ru-RU", "si": "si-LK",
+    "sk": "sk-SK", "sl": "sl-SI", "sq": "sq-AL", "sr": "sr-RS", "sv": "sv-SE",
+    "sw": "sw-KE", "ta": "ta-IN", "te": "te-IN", "th": "th-TH", "tr": "tr-TR",
+    "uk": "uk-UA", "ur": "ur-PK", "vi": "vi-VN", "zh-cn": "zh-CN", "zh-tw": "zh-TW",
+}
+
+# (first code point, last code point, language) of scripts used by one
+# language, or by one language in practice; Han is handled separately
+_SCRIPTS: Tuple[Tuple[int, int, str], ...] = (
+    (0x0370, 0x03FF, "el"),   # Greek
+    (0x0400, 0x04FF, "ru"),   # Cyrillic (Ukrainian is told apart below)
+    (0x0590, 0x05FF, "he"),   # Hebrew
+    (0x0600, 0x06FF, "ar"),   # Arabic
+    (0x0900, 0x097F, "hi"),   # Devanagari
+    (0x0980, 0x09FF, "bn"),   # Bengali
+    (0x0A00, 0x0A7F, "pa"),   # Gurmukhi
+    (0x0A80, 0x0AFF, "gu"),   # Gujarati
+    (0x0B80, 0x0BFF, "ta"),   # Tamil
+    (0x0C00, 0x0C7F, "te"),   # Telugu
+    (0x0C80, 0x0CFF, "kn"),   # Kannada
+    (0x0D00, 0x0D7F, "ml"),   # Malayalam
+    (0x0D80, 0x0DFF, "si"),   # Sinhala
+    (0x0E00, 0x0E7F, "th"),   # Thai
+    (0x1200, 0x137F, "am"),   # Ethiopic
+    (0x1780, 0x17FF, "km"),   # Khmer
+    (0x3040, 0x30FF, "ja"),   # Hiragana and Katakana
+    (0xAC00, 0xD7AF, "ko"),   # Hangul syllables
+)
+
+_UKRAINIAN_LETTERS = set("іїєґ")
+
+# Common words per Latin-script language, accent-folded and lowercase,
+# including the words operators use for orders, statuses and greetings.
+# A word listed for several languages counts for each, split between them.
+_STOPWORDS: Dict[str, str] = {
+    "en": "the me show orders order of for from all and with that are which were by only now "
+          "what how many give list a an to is this week last next due pending shipped printed "
+          "urgent overdue recent tagged hello hi thanks thank bye please my our chart graph",
+    "es": "los las el la de del pedidos pedido ordenes orden muestrame mostrar muestra dame con "
+          "para que cuales por y en una un pendientes enviados impresos urgentes semana hola "
+          "gracias adios solo todos todas esta este",
+    "fr": "les le la des du de commandes commande montre moi montrez affiche pour avec qui sont "
+          "et en une un urgentes expediees imprimees semaine bonjour merci salut cette toutes",
+    "de": "die der das den dem und mit fur von zeige zeig mir alle bestellungen bestellung "
+          "auftrage welche sind nur diese woche dringende versendet gedruckt hallo danke tschuss",
+    "it": "gli il lo i le degli delle dei ordini ordine mostrami mostra dammi con che sono e "
+          "spediti stampati urgenti settimana ciao grazie questa tutti solo",
+    "pt": "os as o a do da dos das pedidos encomendas mostre mostra me com para que sao e "
+          "enviados impressos urgentes semana ola obrigado obrigada tchau esta todos",
+    "nl": "de het een en van voor met bestellingen bestelling toon laat zien mij alle welke "
+          "zijn alleen deze week dringende verzonden hallo bedankt dank",
+}
+
+# Letters that only some of the listed languages use
+_LETTER_HINTS: Dict[str, Tuple[str, ...]] = {
+    "ñ": ("es",), "¿": ("es",), "¡": ("es",),
+    "ß": ("de",), "ä": ("de",), "ö": ("de",), "ü": ("de",),
+    "ã": ("pt",), "õ": ("pt",),
+    "ç": ("fr", "pt"), "è": ("fr", "it"), "ù": ("fr", "it"), "ê": ("fr", "pt"),
+}
+
+_WORD = re.compile(r"[^\W\d_]+")
+
+def _fold(text: str) -> str:
+    """Lowercase and strip accents."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(ch for ch in text if not unicodedata.combining(ch))
+
+def _build_word_weights() -> Dict[str, Dict[str, float]]:
+    """word -> {language: weight}; a word shared by n languages weighs 1/n in each."""
+    owners: Dict[str, list] = {}
+    for language, words in _STOPWORDS.items():
+        for word in words.split():
+            owners.setdefault(word, []).append(language)
+    return {word: {language: 1 / len(languages) for language in languages} for word, languages in owners.items()}
+
+_WORD_WEIGHTS = _build_word_weights()
+
+def normalize_text(text: str) -> str:
+    """Memo key of a prompt: casefolded, whitespace collapsed."""
+    return " ".join(text.casefold().split())
+
+
+class LanguageDetector:
+    """
+    Memoized prompt language detection.
+
+    Usage:
+        detector = LanguageDetector()
+        detector.load()                                  # on startup
+        detector.detect("Muéstrame los pedidos")         # "es-ES"
+        detector.resolve("ok", llm_language="Italian")   # "Italian"
+    """
+
+    def __init__(self, cache_size: int = 4096, short_text_words: int = 4, min_probability: float = 0.9):
+        """
+        Args:
+            cache_size: Normalized prompts remembered
+            short_text_words: Prompts with at most this many words never go to
+                langdetect, whose guesses on them are unreliable
+            min_probability: langdetect results below this are discarded
+        """
+        self.short_text_words = short_text_words
+        self.min_probability = min_probability
+        self._factory = None
+        self._detect_cached = lru_cache(maxsize=cache_size)(self._detect)
+        self.by_method = Counter()
+
+    def load(self):
+        """Load langdetect's profiles once, into a seeded factory of our own."""
+        if self._factory is None:
+            from langdetect.detector_factory import PROFILES_DIRECTORY, DetectorFactory
+
+            factory = DetectorFactory()
+            factory.load_profile(PROFILES_DIRECTORY)
+            factory.set_seed(0)  # Same text, same answer
+            self._factory = factory
+
+    def detect(self, text: str) -> Optional[str]:
+        """Locale of a prompt (e.g. "es-ES"), or None if it can't be told."""
+        if not text or not text.strip():
+            return None
+        return self._detect_cached(normalize_text(text))
+
+    def resolve(self, text: str, llm_language: Optional[str] = None) -> str:
+        """
+        Language for a prompt, given what the rewrite LLM reported.
+
+        A non-English LLM answer is kept. When the LLM says English (or
+        nothing), a detected non-English language wins; otherwise the LLM
+        answer, or "English", is used.
+        """
+        llm_language = (llm_language or "").strip()
+        if llm_language and llm_language.lower() not in ("english", "en", ENGLISH_LOCALE.lower()):
+            return llm_language
+        detected = self.detect(text)
+        if detected and detected != ENGLISH_LOCALE:
+            return detected
+        return llm_language or ENGLISH
+
+    def _detect(self, text: str) -> Optional[str]:
+        code, method = self._script(text)
+        if code is None:
+            words = _WORD.findall(text)
+            code, method = self._stopwords(text, words)
+            if code is None and len(words) > self.short_text_words:
+                code, method = self._langdetect(text)
+        self.by_method[method] += 1
+        return LANGUAGE_LOCALES.get(code) if code else None
+
+    @staticmethod
+    def _script(text: str) -> Tuple[Optional[str], str]:
+        """Language of the dominant non-Latin script, if any."""
+        scripts = Counter()
+        han = 0
+        for ch in text:
+            point = ord(ch)
+            if point < 0x0370:
+                continue
+            if 0x4E00 <= point <= 0x9FFF:
+                han += 1
+                continue
+            for first, last, code in _SCRIPTS:
+                if first <= point <= last:
+                    scripts[code] += 1
+                    break
+        if scripts.get("ja"):
+            return "ja", "script"  # Japanese mixes kana with Han
+        if scripts:
+            code = scripts.most_common(1)[0][0]
+            if code == "ru" and _UKRAINIAN_LETTERS & set(text):
+                code = "uk"
+            return code, "script"
+        if han:
+            return "zh-cn", "script"
+        return None, "latin"
+
+    def _stopwords(self, text: str, words: list) -> Tuple[Optional[str], str]:
+        """
+        Best-scoring language by word lists and letter hints. Short prompts
+        need a clear winner; longer ones also at least two matched words per
+        runner-up word, else they go to langdetect.
+        """
+        scores = Counter()
+        for word in words:
+            for language, weight in _WORD_WEIGHTS.get(_fold(word), {}).items():
+                scores[language] += weight
+        for ch in set(text):
+            for language in _LETTER_HINTS.get(ch, ()):
+                scores[language] += 1
+        if not scores:
+            return None, "unknown"
+        ranked = scores.most_common(2)
+        best, score = ranked[0]
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        if len(words) <= self.short_text_words:
+            confident = score >= 1 and score > runner_up
+        else:
+            confident = score >= 2 and score >= 2 * runner_up
+        return (best, "stopwords") if confident else (None, "unknown")
+
+    def _langdetect(self, text: str) -> Tuple[Optional[str], str]:
+        """Seeded langdetect, trusted only above min_probability."""
+        self.load()
+        from langdetect.lang_detect_exception import LangDetectException
+
+        detector = self._factory.create()
+        detector.append(text)
+        try:
+            candidates = detector.get_probabilities()
+        except LangDetectException:
+            return None, "unknown"
+        if candidates and candidates[0].prob >= self.min_probability:
+            return candidates[0].lang, "langdetect"
+        return None, "unknown"
+
+    def stats(self) -> Dict[str, object]:
+        """Memo hits and misses, and how cache misses were decided."""
+        info = self._detect_cached.cache_info()
+        return {
+            "cache_hits": info.hits,
+            "cache_misses": info.misses,
+            "cache_size": info.currsize,
+            "by_method": dict(self.by_method),
+            "profiles_loaded": self._factory is not None,
+        }
+
+    def clear(self):
+        """Forget memoized results (for benchmarks)."""
+        self._detect_cached.cache_clear()
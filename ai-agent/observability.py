@@ -0,0 +1,241 @@
+"""
+Request IDs, stage metrics, LLM accounting and sampled logging for the agent.
+
+- Each HTTP request runs with a request ID (the caller's ``X-Request-ID`` or
+  a new one). It is echoed in the response, added to log records and sent
+  to the backend, so one prompt can be followed through both services' logs.
+- ``stage_context(name)`` marks the pipeline stage a coroutine is in.
+  MeteredLLMClient uses it to label LLM calls, latency and token counts
+  by stage.
+- Log records go to stderr through the standard logging module
+  (LOG_LEVEL). DEBUG and INFO records are kept for LOG_SAMPLE_RATE of
+  requests, chosen by request ID; warnings and errors are always kept.
+- ``GET /metrics`` renders the histograms and counters here plus values
+  read at scrape time from the caches and session store (StatsCollector).
+"""
+
+import logging
+import random
+import sys
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Callable, Dict, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from insight_summary import count_tokens
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Seconds; LLM stages sit in the upper half
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+REQUESTS = Counter(
+    "orderboard_agent_requests_total", "HTTP requests by endpoint and status code", ["endpoint", "status"]
+)
+REQUEST_SECONDS = Histogram(
+    "orderboard_agent_request_seconds", "HTTP request duration, to the last body byte",
+    ["endpoint"], buckets=LATENCY_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "orderboard_agent_stage_seconds", "Duration of pipeline stages (intent, rewrite, args, backend, insights, ...)",
+    ["stage"], buckets=LATENCY_BUCKETS,
+)
+LLM_SECONDS = Histogram(
+    "orderboard_agent_llm_seconds", "LLM call duration by pipeline stage", ["stage"], buckets=LATENCY_BUCKETS,
+)
+LLM_ERRORS = Counter("orderboard_agent_llm_errors_total", "Failed LLM calls by pipeline stage", ["stage"])
+LLM_TOKENS = Counter(
+    "orderboard_agent_llm_tokens_total", "LLM tokens by pipeline stage and direction (prompt, completion)",
+    ["stage", "direction"],
+)
+LLM_IN_FLIGHT = Gauge("orderboard_agent_llm_in_flight", "LLM calls waiting for a response")
+BACKEND_IN_FLIGHT = Gauge("orderboard_agent_backend_in_flight", "Backend requests waiting for a response")
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_sampled: ContextVar[bool] = ContextVar("log_sampled", default=True)
+_stage: ContextVar[str] = ContextVar("stage", default="other")
+
+logger = logging.getLogger(__name__)
+
+def request_id() -> Optional[str]:
+    """ID of the request being handled, if any."""
+    return _request_id.get()
+
+def outgoing_headers() -> Dict[str, str]:
+    """Headers that carry the current request ID to the backend."""
+    rid = _request_id.get()
+    return {REQUEST_ID_HEADER: rid} if rid else {}
+
+@contextmanager
+def stage_context(name: str):
+    """Label work done inside the block (LLM calls) with a pipeline stage."""
+    token = _stage.set(name)
+    try:
+        yield
+    finally:
+        _stage.reset(token)
+
+def observe_stage(name: str, seconds: float):
+    STAGE_SECONDS.labels(name).observe(seconds)
+
+def _is_sampled(rid: str, rate: float) -> bool:
+    if rate >= 1:
+        return True
+    return zlib.crc32(rid.encode("utf-8")) / 2**32 < rate
+
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware setting the request ID and log sampling, and recording
+    request metrics. Raw ASGI, so NDJSON streams are timed to their end.
+    """
+
+    def __init__(self, app, sample_rate: float = 1.0):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(REQUEST_ID_HEADER.lower().encode("latin-1"))
+        rid = incoming.decode("latin-1")[:128] if incoming else uuid.uuid4().hex
+        id_token = _request_id.set(rid)
+        sampled_token = _sampled.set(_is_sampled(rid, self.sample_rate))
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (REQUEST_ID_HEADER.encode("latin-1"), rid.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            elapsed = time.perf_counter() - start
+            endpoint = getattr(scope.get("endpoint"), "__name__", "unmatched")
+            REQUESTS.labels(endpoint, str(status)).inc()
+            REQUEST_SECONDS.labels(endpoint).observe(elapsed)
+            _sampled.reset(sampled_token)
+            _request_id.reset(id_token)
+
+
+@lru_cache(maxsize=1024)
+def _message_tokens(content: str) -> int:
+    """Tokens of one message; system prompts repeat, so they are counted once."""
+    return count_tokens(content)
+
+class MeteredLLMClient:
+    """
+    Wraps an LLM client to record, per pipeline stage, call latency,
+    failures, calls in flight and prompt/completion tokens. Everything else
+    is passed through to the wrapped client.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    async def chat_completion(self, messages, *args, **kwargs):
+        stage = _stage.get()
+        start = time.perf_counter()
+        LLM_IN_FLIGHT.inc()
+        try:
+            response = await self.client.chat_completion(messages, *args, **kwargs)
+        except Exception:
+            LLM_ERRORS.labels(stage).inc()
+            raise
+        finally:
+            LLM_IN_FLIGHT.dec()
+            LLM_SECONDS.labels(stage).observe(time.perf_counter() - start)
+        LLM_TOKENS.labels(stage, "prompt").inc(sum(_message_tokens(str(message.content)) for message in messages))
+        LLM_TOKENS.labels(stage, "completion").inc(sum(count_tokens(str(choice.content)) for choice in response))
+        return response
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+class _RequestLogFilter(logging.Filter):
+    """Adds request_id to records and drops DEBUG/INFO of unsampled requests."""
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        rid = _request_id.get()
+        record.request_id = rid or "-"
+        if record.levelno >= logging.WARNING:
+            return True
+        if rid is None:  # Startup and background tasks: sample record by record
+            return self.sample_rate >= 1 or random.random() < self.sample_rate
+        return _sampled.get()
+
+def configure_logging(level: str = "INFO", sample_rate: float = 1.0):
+    """
+    Send the agent's log records (the root logger) to stderr with level,
+    request ID and sampling. Libraries' loggers stay at WARNING.
+    """
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+    handler.addFilter(_RequestLogFilter(sample_rate))
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(logging.WARNING)
+    for name in ("__main__", "main", "observability", "conversation_log", "session_memory"):
+        logging.getLogger(name).setLevel(level.upper())
+
+
+class StatsCollector:
+    """
+    Prometheus collector reading existing stats at scrape time. Each
+    callable returns a number or a dict of label value tuples to numbers;
+    one that raises is skipped for that scrape.
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def gauge(self, name: str, documentation: str, read: Callable, labels: Tuple[str, ...] = ()):
+        self._metrics.append((GaugeMetricFamily, name, documentation, read, labels))
+
+    def counter(self, name: str, documentation: str, read: Callable, labels: Tuple[str, ...] = ()):
+        self._metrics.append((CounterMetricFamily, name, documentation, read, labels))
+
+    def collect(self):
+        for family_type, name, documentation, read, labels in self._metrics:
+            try:
+                value = read()
+            except Exception as e:
+                logger.debug("Metric %s not collected: %s", name, e)
+                continue
+            family = family_type(name, documentation, labels=list(labels))
+            if isinstance(value, dict):
+                for label_values, number in value.items():
+                    family.add_metric(list(label_values), number)
+            else:
+                family.add_metric([], value)
+            yield family
+
+    def describe(self):
+        return []
+
+    def register(self):
+        REGISTRY.register(self)
+        return self
+
+def metrics_payload() -> Tuple[bytes, str]:
+    """The Prometheus exposition of every registered metric, and its content type."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
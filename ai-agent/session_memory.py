@@ -0,0 +1,303 @@
+"""
+Per-session conversation memory.
+
+Each chat session (X-Session-ID header) keeps its own recent messages and
+its own "last prompt context" (filters, select, customer, language). Before
+this, one module-level deque and one dict were shared by every user.
+
+Where the sessions live is chosen with SESSION_STORE_URL:
+- memory (default): an in-process LRU over sessions. Fastest, but each
+  uvicorn worker has its own sessions.
+- sqlite:///path/to/sessions.db: one SQLite file (WAL mode) shared by all
+  workers on a host.
+- redis://host:6379/0: any Redis-protocol server (Redis, Valkey, KeyDB,
+  Dragonfly) shared by workers on any host. Requires the redis package.
+
+Every backend evicts whole sessions: after SESSION_TTL seconds idle, and the
+least recently used once there are more than SESSION_MAX sessions (Redis
+leaves the count limit to its maxmemory policy). Within a session only the
+last SESSION_MAX_MESSAGES messages are kept.
+"""
+
+import json
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+DEFAULT_SESSION = "default"
+
+def new_context() -> dict:
+    """Context remembered from a session's last query."""
+    return {
+        "filters": [],
+        "select": [],
+        "customer": None,
+        "language": "English",
+    }
+
+
+class Session:
+    """Messages and last-query context of one session."""
+
+    def __init__(self, session_id: str, messages: Optional[List[dict]] = None,
+                 context: Optional[dict] = None, max_messages: int = 8):
+        self.session_id = session_id
+        self.messages: List[dict] = list(messages or [])  # {"role": "user" | "assistant", "content": str}
+        self.context = {**new_context(), **(context or {})}
+        self.max_messages = max_messages
+
+    def add_message(self, role: str, content: str):
+        """Append a message, dropping the oldest beyond max_messages."""
+        self.messages.append({"role": role, "content": content})
+        del self.messages[:-self.max_messages]
+
+    def last_messages(self, n: int) -> List[dict]:
+        """The last n user-assistant pairs (2n messages)."""
+        return self.messages[-2 * n:]
+
+    def dumps(self) -> str:
+        """Serialized state for storage backends."""
+        return json.dumps({"messages": self.messages, "context": self.context})
+
+    @classmethod
+    def loads(cls, session_id: str, data: str, max_messages: int) -> "Session":
+        """Session from serialized state."""
+        state = json.loads(data)
+        return cls(session_id, state.get("messages"), state.get("context"), max_messages)
+
+
+class MemorySessionBackend:
+    """In-process LRU of serialized sessions with idle expiry."""
+
+    name = "memory"
+
+    def __init__(self, max_sessions: int, ttl_seconds: float):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self._sessions: "OrderedDict[str, tuple]" = OrderedDict()  # id -> (state, last used)
+        self.evictions = 0
+
+    async def get(self, session_id: str) -> Optional[str]:
+        entry = self._sessions.get(session_id)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[1] > self.ttl_seconds:
+            del self._sessions[session_id]
+            self.evictions += 1
+            return None
+        self._sessions.move_to_end(session_id)
+        return entry[0]
+
+    async def put(self, session_id: str, state: str):
+        self._sessions[session_id] = (state, time.monotonic())
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, session_id: str):
+        self._sessions.pop(session_id, None)
+
+    async def count(self) -> int:
+        return len(self._sessions)
+
+    async def close(self):
+        self._sessions.clear()
+
+
+class SQLiteSessionBackend:
+    """
+    Sessions in one SQLite file, shared by every worker process on the host.
+
+    Reads and writes are single-row statements on a local file (tens of
+    microseconds), so they run inline rather than in a thread pool.
+    """
+
+    name = "sqlite"
+
+    # Expired and surplus sessions are purged on every Nth write
+    PURGE_EVERY = 100
+
+    def __init__(self, path: str, max_sessions: int, ttl_seconds: float):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.evictions = 0
+        self._writes = 0
+        self._conn = sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS agent_sessions ("
+            " session_id TEXT PRIMARY KEY,"
+            " state TEXT NOT NULL,"
+            " updated REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS agent_sessions_updated ON agent_sessions (updated)")
+
+    async def get(self, session_id: str) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT state FROM agent_sessions WHERE session_id = ? AND updated >= ?",
+            (session_id, time.time() - self.ttl_seconds),
+        ).fetchone()
+        return row[0] if row else None
+
+    async def put(self, session_id: str, state: str):
+        self._conn.execute(
+            "INSERT INTO agent_sessions (session_id, state, updated) VALUES (?, ?, ?)"
+            " ON CONFLICT (session_id) DO UPDATE SET state = excluded.state, updated = excluded.updated",
+            (session_id, state, time.time()),
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._purge()
+
+    def _purge(self):
+        """Drop idle sessions, then the least recently used beyond max_sessions."""
+        expired = self._conn.execute(
+            "DELETE FROM agent_sessions WHERE updated < ?", (time.time() - self.ttl_seconds,)
+        ).rowcount
+        surplus = self._conn.execute(
+            "DELETE FROM agent_sessions WHERE session_id IN ("
+            " SELECT session_id FROM agent_sessions ORDER BY updated DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,),
+        ).rowcount
+        self.evictions += expired + surplus
+
+    async def delete(self, session_id: str):
+        self._conn.execute("DELETE FROM agent_sessions WHERE session_id = ?", (session_id,))
+
+    async def count(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM agent_sessions").fetchone()[0]
+
+    async def close(self):
+        self._conn.close()
+
+
+class RedisSessionBackend:
+    """
+    Sessions as Redis keys with a TTL, shared by workers on any host.
+
+    Idle expiry is the key TTL. The session count limit is left to the
+    server's maxmemory policy (e.g. allkeys-lru).
+    """
+
+    name = "redis"
+
+    def __init__(self, url: str, ttl_seconds: float, prefix: str = "agent:session:"):
+        import redis.asyncio as redis  # Optional dependency, only needed for this backend
+
+        self._client = redis.from_url(url, decode_responses=True)
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+        self.evictions = 0  # Done by the server
+
+    async def get(self, session_id: str) -> Optional[str]:
+        key = self.prefix + session_id
+        state = await self._client.get(key)
+        if state is not None:
+            await self._client.expire(key, int(self.ttl_seconds))
+        return state
+
+    async def put(self, session_id: str, state: str):
+        await self._client.set(self.prefix + session_id, state, ex=int(self.ttl_seconds))
+
+    async def delete(self, session_id: str):
+        await self._client.delete(self.prefix + session_id)
+
+    async def count(self) -> int:
+        count = 0
+        async for _ in self._client.scan_iter(match=self.prefix + "*", count=1000):
+            count += 1
+        return count
+
+    async def close(self):
+        await self._client.aclose()
+
+
+def create_backend(url: str, max_sessions: int, ttl_seconds: float):
+    """
+    Storage backend for a SESSION_STORE_URL.
+
+    Raises:
+        ValueError: If the URL scheme is not memory, sqlite or redis(s)
+    """
+    parsed = urlparse(url)
+    scheme = parsed.scheme or url
+    if scheme == "memory":
+        return MemorySessionBackend(max_sessions, ttl_seconds)
+    if scheme == "sqlite":
+        path = url[len("sqlite:///"):] if url.startswith("sqlite:///") else parsed.path
+        return SQLiteSessionBackend(path or "agent_sessions.db", max_sessions, ttl_seconds)
+    if scheme in ("redis", "rediss"):
+        return RedisSessionBackend(url, ttl_seconds)
+    raise ValueError(f"Unsupported SESSION_STORE_URL scheme: {scheme!r}")
+
+
+class SessionMemory:
+    """
+    Session-keyed conversation memory over a storage backend.
+
+    Usage:
+        memory = SessionMemory(create_backend("memory", 1000, 7200))
+        session = await memory.load(session_id)
+        history = session.last_messages(4)
+        session.add_message("user", prompt)
+        await memory.save(session)
+    """
+
+    def __init__(self, backend, max_messages: int = 8):
+        """
+        Args:
+            backend: Memory, SQLite or Redis session backend
+            max_messages: Messages kept per session
+        """
+        self.backend = backend
+        self.max_messages = max_messages
+        self.loads = 0
+        self.new_sessions = 0
+        self.saves = 0
+
+    async def load(self, session_id: Optional[str]) -> Session:
+        """The stored session, or a new empty one."""
+        session_id = session_id or DEFAULT_SESSION
+        self.loads += 1
+        state = await self.backend.get(session_id)
+        if state is None:
+            self.new_sessions += 1
+            return Session(session_id, max_messages=self.max_messages)
+        return Session.loads(session_id, state, self.max_messages)
+
+    async def save(self, session: Session):
+        """Store a session (refreshing its idle timer)."""
+        self.saves += 1
+        await self.backend.put(session.session_id, session.dumps())
+
+    async def clear(self, session_id: Optional[str]):
+        """Forget one session."""
+        await self.backend.delete(session_id or DEFAULT_SESSION)
+
+    async def close(self):
+        await self.backend.close()
+
+    async def stats(self) -> Dict[str, object]:
+        """
+        Store statistics.
+
+        Returns:
+            dict: Backend name, session count, loads, new sessions, saves and
+                evictions (for this worker process)
+        """
+        return {
+            "backend": self.backend.name,
+            "sessions": await self.backend.count(),
+            "loads": self.loads,
+            "new_sessions": self.new_sessions,
+            "saves": self.saves,
+            "evictions": self.backend.evictions,
+            "max_messages": self.max_messages,
+            "pid": os.getpid(),
+        }
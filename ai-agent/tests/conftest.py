@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The agent's modules are imported from the ai-agent directory, as uvicorn does (main:app)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,62 @@
+from args_cache import ArgsCache, content_words, normalize_prompt
+
+ARGS = {"select": ["*"], "where": ["o.status = 'Pending'"], "limit": 50}
+TODAY = "2024-05-15"
+
+
+def test_normalize_folds_case_accents_and_punctuation():
+    assert normalize_prompt("  Pedidos  PENDIENTES, por favór!") == "pedidos pendientes por favor"
+    assert content_words("Show me the pending orders please") == ("pending",)
+
+
+def test_miss_then_exact_hit():
+    cache = ArgsCache()
+    assert cache.get("Pending orders", today=TODAY) is None
+    cache.put("Pending orders", ARGS, today=TODAY)
+    assert cache.get("pending orders!", today=TODAY) == (ARGS, "exact")
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hits"]["exact"] == 1
+
+
+def test_near_duplicate_and_fuzzy_hits():
+    cache = ArgsCache()
+    cache.put("Show me the pending orders from Etsy", ARGS, today=TODAY)
+    assert cache.get("pending Etsy orders please", today=TODAY) == (ARGS, "near_duplicate")
+    assert cache.get("pendng orders from Etsy", today=TODAY) == (ARGS, "fuzzy")
+
+
+def test_numbers_must_match():
+    cache = ArgsCache()
+    cache.put("last 5 pending orders", ARGS, today=TODAY)
+    assert cache.get("last 6 pending orders", today=TODAY) is None
+
+
+def test_returned_args_are_copies():
+    cache = ArgsCache()
+    cache.put("pending orders", ARGS, today=TODAY)
+    args, _ = cache.get("pending orders", today=TODAY)
+    args["limit"] = 1
+    assert cache.get("pending orders", today=TODAY)[0]["limit"] == 50
+
+
+def test_entries_do_not_survive_date_rollover():
+    # prompt_to_args resolves "last week" against {TODAY}, so yesterday's args are stale
+    cache = ArgsCache()
+    cache.put("orders shipped last week", ARGS, today="2024-05-15")
+    assert cache.get("orders shipped last week", today="2024-05-15") is not None
+    assert cache.get("orders shipped last week", today="2024-05-16") is None
+    assert cache.get("orders shiped last week", today="2024-05-16") is None
+
+
+def test_ttl_and_lru_eviction(monkeypatch):
+    clock = [1000.0]
+    monkeypatch.setattr("args_cache.time.monotonic", lambda: clock[0])
+    cache = ArgsCache(max_entries=2, ttl_seconds=60)
+    cache.put("pending orders", ARGS, today=TODAY)
+    cache.put("printed orders", ARGS, today=TODAY)
+    cache.get("pending orders", today=TODAY)
+    cache.put("shipped orders", ARGS, today=TODAY)
+    assert cache.get("printed orders", today=TODAY) is None
+    assert cache.stats()["evictions"] == 1
+    clock[0] += 61
+    assert cache.get("pending orders", today=TODAY) is None
@@ -0,0 +1,54 @@
+import asyncio
+import csv
+
+from conversation_log import ConversationLog
+
+
+def write_records(path, count=1, **options):
+    async def run():
+        log = ConversationLog(str(path), "csv", **options)
+        log.start()
+        for i in range(count):
+            log.write(session_id="s1", intent="orders", user_message=f"hi {i}", assistant_message="hello",
+                      latency_ms=12.5)
+        await log.close()
+        return log
+
+    return asyncio.run(run())
+
+
+def read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_new_file_gets_header_once(tmp_path):
+    path = tmp_path / "conversation_history.csv"
+    write_records(path, count=2)
+    write_records(path)
+    rows = read_rows(path)
+    assert rows[0] == ["Timestamp", "Session ID", "Intent", "User Message", "Assistant Message", "Latency (ms)"]
+    assert len(rows) == 4
+    assert all(len(row) == 6 for row in rows)
+
+
+def test_file_with_old_header_is_rotated_out(tmp_path):
+    path = tmp_path / "conversation_history.csv"
+    path.write_text("User Message,Assistant Message\nhi,hello\n", encoding="utf-8")
+    log = write_records(path, backup_count=0)
+    assert log.rotations == 1
+    assert read_rows(tmp_path / "conversation_history.csv.1") == [
+        ["User Message", "Assistant Message"], ["hi", "hello"],
+    ]
+    rows = read_rows(path)
+    assert rows[0][0] == "Timestamp"
+    assert len(rows) == 2 and len(rows[1]) == 6
+
+
+def test_size_rotation(tmp_path):
+    path = tmp_path / "conversation_history.csv"
+    write_records(path, max_bytes=1)
+    log = write_records(path, max_bytes=1)
+    assert log.rotations == 1
+    assert read_rows(path)[0][0] == "Timestamp"
+    assert read_rows(tmp_path / "conversation_history.csv.1")[0][0] == "Timestamp"
@@ -0,0 +1,80 @@
+from datetime import date
+
+import pytest
+
+from fast_path import FastPathParser
+
+TODAY = date(2024, 5, 15)  # A Wednesday
+
+
+def parse(prompt, parser=None):
+    return (parser or FastPathParser()).parse(prompt, today=TODAY)
+
+
+def test_customer_and_tag():
+    match = parse("Show me urgent orders from Etsy")
+    assert match.intent == "table_insights"
+    assert match.args["where"] == [
+        "o.customer_id = (SELECT customer_id FROM customers WHERE customer_name = 'Etsy')",
+        "'urgent' = ANY(o.tags)",
+    ]
+    assert match.args["limit"] == 50
+
+
+def test_count_and_sort():
+    match = parse("the 5 most recent urgent orders from Zazzle")
+    assert match.args["order_by"] == ["o.last_updated DESC"]
+    assert match.args["limit"] == 5
+
+
+def test_event_with_relative_week():
+    assert parse("orders shipped last week").args["where"] == [
+        "o.action_json->>'shipped' >= '2024-05-06'",
+        "o.action_json->>'shipped' < '2024-05-13'",
+    ]
+
+
+def test_due_date():
+    assert parse("orders due tomorrow").args["where"] == ["o.due_date >= '2024-05-16'", "o.due_date < '2024-05-17'"]
+
+
+def test_negated_customer_and_status():
+    assert parse("pending orders not from Canva").args["where"] == [
+        "o.customer_id <> (SELECT customer_id FROM customers WHERE customer_name = 'Canva')",
+        "o.status = 'Pending'",
+    ]
+
+
+def test_chart_by_status():
+    match = parse("bar chart of orders by status")
+    assert match.intent == "visual_insight"
+    assert match.args["group_by"] == ["o.status"]
+    assert match.args["select"] == ["o.status", "COUNT(*) as count"]
+
+
+@pytest.mark.parametrize("prompt", [
+    "hello there",             # Small talk
+    "pendng orders",           # Typo
+    "now only printed",        # Follow-up without the orders noun
+    "muéstrame los pedidos",   # Other language
+    "overdue orders",          # Not in the lexicon
+    "urgent",                  # No orders noun
+])
+def test_non_matches_go_to_the_llm(prompt):
+    parser = FastPathParser()
+    assert parse(prompt, parser) is None
+    assert parser.hits == 0
+    assert sum(parser.misses.values()) == 1
+
+
+def test_vocabulary_from_live_data():
+    parser = FastPathParser()
+    parser.set_vocabulary(customers=["Acme"])
+    assert parse("orders from Etsy", parser) is None
+    assert "'Acme'" in parse("orders from Acme", parser).args["where"][0]
+
+
+def test_ambiguous_vocabulary_is_rejected():
+    parser = FastPathParser()
+    parser.set_vocabulary(tags=["etsy", "urgent"])
+    assert parse("orders from Etsy", parser) is None
@@ -0,0 +1,193 @@
+"""
+Guard rails against runaway /query statements.
+
+A payload can ask for every column of every order, filtered by a LIKE no
+index can serve, with no limit. Such a statement holds a pooled
+connection for as long as it runs. Three limits keep that bounded:
+
+- statement_timeout: every connection starts with QUERY_STATEMENT_TIMEOUT_MS
+  (set in database.py), and a payload may ask for less with ``timeout_ms``.
+  A cancelled statement is answered with 504.
+- Default limit: a non-aggregate query without a limit gets
+  QUERY_DEFAULT_LIMIT. Grouped and aggregate queries are bounded by their
+  groups and are left alone.
+- Cost estimate: before running, the statement is EXPLAINed (planning
+  only, nothing is executed) and the planner's total cost compared with
+  two thresholds. Above the reject threshold the query fails with 400.
+  Above the downgrade threshold it still runs, with a lower row limit (for
+  non-aggregate queries) and a shorter statement_timeout.
+
+Estimates are cached by statement and bind values for ``cache_ttl``
+seconds, so a repeated payload costs one EXPLAIN per TTL. A failed
+EXPLAIN lets the query through; the statement_timeout still applies.
+"""
+
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE of a statement cancelled by statement_timeout (query_canceled)
+QUERY_CANCELED = "57014"
+
+class QueryCostError(ValueError):
+    """A query whose estimated cost is above the reject threshold."""
+
+def is_statement_timeout(exc: BaseException) -> bool:
+    """
+    Whether an exception is Postgres cancelling a statement on timeout.
+
+    SQLAlchemy wraps the driver error (``orig``), which in turn wraps the
+    asyncpg exception (``__cause__``); any of them may carry the SQLSTATE.
+    """
+    seen = set()
+    while exc is not None and id(exc) not in seen:
+        seen.add(id(exc))
+        if getattr(exc, "sqlstate", None) == QUERY_CANCELED or "statement timeout" in str(exc):
+            return True
+        exc = getattr(exc, "orig", None) or exc.__cause__
+    return False
+
+
+class CostGuard:
+    """
+    Default limits and EXPLAIN cost thresholds for planned queries.
+
+    Usage:
+        guard = CostGuard(default_limit=1000, downgrade_cost=25000, reject_cost=500000)
+        if guard.needs_default_limit(query_builder):
+            query_builder.limit(guard.default_limit)
+            guard.default_limited += 1
+        decision = await guard.check(db, sql, params, keep_limit=False)  # may raise QueryCostError
+    """
+
+    def __init__(self, default_limit: Optional[int] = 1000, downgrade_cost: Optional[float] = None,
+                 reject_cost: Optional[float] = None, downgrade_limit: int = 100,
+                 downgrade_timeout_ms: int = 2000, cache_size: int = 1024, cache_ttl: float = 300.0):
+        """
+        Args:
+            default_limit: LIMIT given to non-aggregate queries without one (None disables)
+            downgrade_cost: Estimated cost above which a query is downgraded (None disables)
+            reject_cost: Estimated cost above which a query is rejected (None disables)
+            downgrade_limit: Row limit of downgraded non-aggregate queries
+            downgrade_timeout_ms: statement_timeout of downgraded queries
+            cache_size: Cost estimates kept
+            cache_ttl: Seconds an estimate is reused
+        """
+        self.default_limit = default_limit
+        self.downgrade_cost = downgrade_cost
+        self.reject_cost = reject_cost
+        self.downgrade_limit = downgrade_limit
+        self.downgrade_timeout_ms = int(downgrade_timeout_ms)
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        self._estimates: "OrderedDict[tuple, tuple]" = OrderedDict()
+        self.default_limited = 0
+        self.estimated = 0
+        self.estimate_hits = 0
+        self.estimate_errors = 0
+        self.downgraded = 0
+        self.rejected = 0
+
+    @property
+    def estimating(self) -> bool:
+        """Whether any cost threshold is set."""
+        return self.downgrade_cost is not None or self.reject_cost is not None
+
+    def needs_default_limit(self, query_builder) -> bool:
+        """Whether a query is unbounded and not an aggregate."""
+        return bool(self.default_limit) and not query_builder.has_limit() and not query_builder.is_aggregate()
+
+    async def estimate(self, db, sql: str, params: Optional[dict]) -> Optional[float]:
+        """
+        Planner's total cost of a statement, from EXPLAIN without ANALYZE.
+
+        A savepoint keeps a failed EXPLAIN from aborting the transaction.
+
+        Returns:
+            float or None: Estimated cost, or None if EXPLAIN failed
+        """
+        key = (sql, json.dumps(params, sort_keys=True, default=str))
+        cached = self._estimates.get(key)
+        now = time.monotonic()
+        if cached is not None and now - cached[1] < self.cache_ttl:
+            self._estimates.move_to_end(key)
+            self.estimate_hits += 1
+            return cached[0]
+        try:
+            explain_sql = "EXPLAIN (FORMAT JSON) " + sql.rstrip().rstrip(";")
+            async with db.begin_nested():
+                plan = (await db.execute(text(explain_sql), params)).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            cost = float(plan[0]["Plan"]["Total Cost"])
+        except Exception as e:
+            self.estimate_errors += 1
+            logger.warning("Cost estimate failed: %s", e)
+            return None
+        self.estimated += 1
+        self._estimates[key] = (cost, now)
+        self._estimates.move_to_end(key)
+        if len(self._estimates) > self.cache_size:
+            self._estimates.popitem(last=False)
+        return cost
+
+    async def check(self, db, sql: str, params: Optional[dict], keep_limit: bool = False) -> Optional[dict]:
+        """
+        Compare a statement's estimated cost with the thresholds.
+
+        Args:
+            db: Session to run EXPLAIN on
+            sql: Parameterized statement
+            params: Bind values
+            keep_limit: Leave the row limit alone (grouped or paginated queries)
+
+        Returns:
+            dict or None: For a downgraded query, the estimated cost, the
+                new limit (None to keep it) and timeout_ms; None otherwise
+
+        Raises:
+            QueryCostError: If the cost is above the reject threshold
+        """
+        if not self.estimating:
+            return None
+        cost = await self.estimate(db, sql, params)
+        if cost is None:
+            return None
+        if self.reject_cost is not None and cost > self.reject_cost:
+            self.rejected += 1
+            logger.warning("Rejected query with estimated cost %.0f: %s", cost, sql)
+            raise QueryCostError(
+                f"estimated cost {cost:.0f} exceeds the limit of {self.reject_cost:.0f}; "
+                "add a selective filter or a smaller limit"
+            )
+        if self.downgrade_cost is not None and cost > self.downgrade_cost:
+            self.downgraded += 1
+            logger.warning("Downgraded query with estimated cost %.0f: %s", cost, sql)
+            limit = None
+            if not keep_limit and params and "limit" in params:
+                limit = min(params["limit"], self.downgrade_limit)
+            return {"estimated_cost": round(cost, 2), "limit": limit, "timeout_ms": self.downgrade_timeout_ms}
+        return None
+
+    def stats(self) -> dict:
+        """Settings and counters."""
+        return {
+            "default_limit": self.default_limit,
+            "downgrade_cost": self.downgrade_cost,
+            "reject_cost": self.reject_cost,
+            "downgrade_limit": self.downgrade_limit,
+            "downgrade_timeout_ms": self.downgrade_timeout_ms,
+            "default_limited": self.default_limited,
+            "estimated": self.estimated,
+            "estimate_hits": self.estimate_hits,
+            "estimate_errors": self.estimate_errors,
+            "estimates_cached": len(self._estimates),
+            "downgraded": self.downgraded,
+            "rejected": self.rejected,
+        }
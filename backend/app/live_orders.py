@@ -0,0 +1,273 @@
+"""
+Live order deltas pushed to subscribers.
+
+Statement-level triggers on ``orders`` (see ``db/init.sql``) NOTIFY the IDs
+of changed orders on the ``orders_delta`` channel. One LISTEN connection
+per worker feeds a LiveOrderHub, which fans the changes out to any number
+of subscribers (the /orders/live server-sent event streams):
+
+- Subscribers give a QueryPayload-style filter (``select`` and ``where``).
+  Subscribers with the same canonical filter share one group.
+- For each batch of notifications, every group re-reads the changed IDs
+  through its filter in one query (``... AND o.order_id = ANY(:order_ids)``).
+  Rows returned are sent as ``upsert``; IDs not returned (deleted, or no
+  longer matching) as ``delete``.
+- Notifications that arrive while a batch is being read are merged into
+  the next one, so a burst of writes costs one query per group.
+- Bulk changes, TRUNCATE, listener reconnects and subscribers too slow to
+  keep up get a ``resync`` event, telling the client to reload.
+
+Database work grows with the number of distinct filters and the write
+rate, not with the number of open dashboards.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+
+from .query_builder import QueryBuilder
+from .result_cache import canonical_key
+
+logger = logging.getLogger(__name__)
+
+DELTA_CHANNEL = "orders_delta"
+
+# Select items that already include the order_id column
+_ORDER_ID_FIELDS = {"*", "o.*", "o.order_id", "order_id"}
+
+class Subscription:
+    """One subscriber: its group key and a bounded queue of events."""
+
+    def __init__(self, key, queue_size):
+        self.key = key
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.resyncs = 0
+
+    def push(self, event):
+        """
+        Queue an event without waiting.
+
+        A subscriber that has fallen queue_size events behind has its
+        backlog replaced by a single resync.
+        """
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"op": "resync", "reason": "slow consumer"})
+            self.resyncs += 1
+
+class _FilterGroup:
+    """Subscribers sharing one canonical filter, and its query."""
+
+    def __init__(self, sql, params):
+        self.statement = text(sql)
+        self.params = params  # Filter values; order_ids is added per batch
+        self.subscribers = set()
+
+class LiveOrderHub:
+    """
+    Fans orders_delta notifications out to filtered subscribers.
+
+    Usage:
+        hub = LiveOrderHub(session_factory)
+        task = asyncio.create_task(hub.run(dsn))          # on startup
+        subscription = hub.subscribe(["o.order_id", "o.status"], ["o.status = 'Pending'"])
+        event = await subscription.queue.get()
+        hub.unsubscribe(subscription)
+    """
+
+    def __init__(self, session_factory, queue_size=100, max_filters=100):
+        """
+        Args:
+            session_factory: Async session factory used to re-read changed orders
+            queue_size (int): Events buffered per subscriber before a resync
+            max_filters (int): Distinct filters allowed at once
+        """
+        self.session_factory = session_factory
+        self.queue_size = queue_size
+        self.max_filters = max_filters
+        self._groups: Dict[str, _FilterGroup] = {}
+        self._pending = asyncio.Queue()
+        self.notifications = 0
+        self.batches = 0
+        self.queries = 0
+        self.events = 0
+        self.resyncs = 0
+        self.errors = 0
+
+    def subscribe(self, select: List[str], where: Optional[List[str]] = None) -> Subscription:
+        """
+        Register a subscriber.
+
+        Args:
+            select: Fields to send for changed orders; o.order_id is added
+                when missing so deltas can be matched to rows
+            where: Conditions a changed order must meet to be sent
+
+        Returns:
+            Subscription: Read events from subscription.queue
+
+        Raises:
+            ValueError: If the filter is invalid or too many distinct
+                filters are open
+        """
+        query_builder = QueryBuilder()
+        query_builder.select(list(select))
+        if not any(field.strip() in _ORDER_ID_FIELDS for field in select):
+            query_builder.select(["o.order_id"])
+        query_builder.where(where or [])
+        fragments = query_builder.fragments()
+        key = canonical_key({"select": fragments["select"], "where": fragments["where"]})
+
+        group = self._groups.get(key)
+        if group is None:
+            if len(self._groups) >= self.max_filters:
+                raise ValueError(f"Too many distinct live filters (max {self.max_filters})")
+            sql, params = query_builder.where_order_ids().build_parameterized()
+            group = self._groups[key] = _FilterGroup(sql, params)
+
+        subscription = Subscription(key, self.queue_size)
+        group.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        """Remove a subscriber; its group goes when the last one leaves."""
+        group = self._groups.get(subscription.key)
+        if group is None:
+            return
+        group.subscribers.discard(subscription)
+        if not group.subscribers:
+            del self._groups[subscription.key]
+
+    @property
+    def subscriber_count(self):
+        return sum(len(group.subscribers) for group in self._groups.values())
+
+    def notify(self, payload: str):
+        """Queue one orders_delta notification payload."""
+        self.notifications += 1
+        self._pending.put_nowait(payload)
+
+    def broadcast(self, event):
+        """Send the same event to every subscriber."""
+        for group in self._groups.values():
+            for subscription in group.subscribers:
+                subscription.push(event)
+                self.events += 1
+
+    def _drain(self, payload):
+        """Merge a payload and all queued behind it into (changed ids, resync reason)."""
+        ids, resync = set(), None
+        while payload is not None:
+            try:
+                delta = json.loads(payload)
+            except ValueError:
+                delta = {}
+            payload = None if self._pending.empty() else self._pending.get_nowait()
+            if not delta:
+                continue
+            if delta.get("ids") is None:
+                resync = f"{delta.get('op', 'bulk').lower()} of {delta.get('count') or 'all'} orders"
+            else:
+                ids.update(delta["ids"])
+        return ids, resync
+
+    async def dispatch(self):
+        """Turn queued notifications into subscriber events until cancelled."""
+        while True:
+            ids, resync = self._drain(await self._pending.get())
+            if not self._groups:
+                continue
+            self.batches += 1
+            if resync:
+                self.resyncs += 1
+                self.broadcast({"op": "resync", "reason": resync})
+                continue
+            try:
+                await self._send_changes(sorted(ids))
+            except Exception as e:
+                self.errors += 1
+                logger.warning("Live order dispatch error: %s", e)
+                self.broadcast({"op": "resync", "reason": "dispatch error"})
+
+    async def _send_changes(self, ids: List[str]):
+        """Re-read changed orders once per filter group and push the deltas."""
+        async with self.session_factory() as db:
+            for group in list(self._groups.values()):
+                result = await db.execute(group.statement, {**group.params, "order_ids": ids})
+                rows = [dict(row._mapping) for row in result]
+                self.queries += 1
+                matched = {str(row.get("order_id")) for row in rows}
+                removed = [order_id for order_id in ids if order_id not in matched]
+                events = []
+                if rows:
+                    events.append({"op": "upsert", "rows": rows})
+                if removed:
+                    events.append({"op": "delete", "ids": removed})
+                for subscription in list(group.subscribers):
+                    for event in events:
+                        subscription.push(event)
+                        self.events += 1
+
+    async def run(self, dsn, retry_seconds=5.0):
+        """
+        LISTEN on orders_delta and dispatch until cancelled.
+
+        Reconnects on failure; after a gap in notifications every
+        subscriber gets a resync, since changes may have been missed.
+
+        Args:
+            dsn (str): Plain ``postgresql://`` connection string
+            retry_seconds (float): Delay between reconnect attempts
+        """
+        import asyncpg
+
+        dispatcher = asyncio.create_task(self.dispatch())
+        try:
+            first = True
+            while True:
+                connection = None
+                try:
+                    connection = await asyncpg.connect(dsn)
+                    await connection.add_listener(DELTA_CHANNEL, lambda _c, _p, _ch, payload: self.notify(payload))
+                    if not first:
+                        self.broadcast({"op": "resync", "reason": "listener reconnected"})
+                    first = False
+                    closed = asyncio.Event()
+                    connection.add_termination_listener(lambda _conn: closed.set())
+                    await closed.wait()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning("Live order listener error: %s", e)
+                finally:
+                    if connection is not None and not connection.is_closed():
+                        await connection.close()
+                first = False
+                await asyncio.sleep(retry_seconds)
+        finally:
+            dispatcher.cancel()
+
+    def stats(self):
+        """
+        Fan-out statistics for this worker.
+
+        Returns:
+            dict: Subscribers, distinct filters, notifications received,
+                dispatch batches, queries run, events sent, resyncs and errors
+        """
+        return {
+            "subscribers": self.subscriber_count,
+            "filters": len(self._groups),
+            "notifications": self.notifications,
+            "batches": self.batches,
+            "queries": self.queries,
+            "events": self.events,
+            "resyncs": self.resyncs,
+            "errors": self.errors,
+        }
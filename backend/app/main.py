@@ -8,19 +8,131 @@ Features:
 - RESTful API design with automatic documentation
 - JSON input validation using Pydantic models
 - Dynamic SQL query generation
+- SQL fragments validated against the schema and normalized before use
+- Parameterized statements with a prepared-statement cache
+- Result cache invalidated by table write notifications
+- Keyset (cursor) pagination
+- Streaming NDJSON / chunked JSON responses for large results
+- Apache Arrow IPC output for analytics clients
+- Grouped COUNT queries answered from pre-aggregated rollups
+- Batches of queries in one request, optionally on one consistent snapshot
+- Live order deltas pushed over server-sent events from LISTEN/NOTIFY
+- Request IDs, per-stage timing spans and Prometheus metrics at /metrics
+- Slow-query log with sampled EXPLAIN (ANALYZE, BUFFERS) capture
+- Statement timeouts, default limits and EXPLAIN cost thresholds
+- Read-only queries spread across Postgres replicas
 - Database integration with PostgreSQL
 - CORS support for frontend integration
 """
 
-from fastapi import FastAPI, HTTPException, Depends
+from fastapi import FastAPI, HTTPException, Depends, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy.orm import Session
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, NamedTuple, Optional
+import asyncio
+import json
+import os
+import time
 
-from .database import get_db
+from .database import (
+    get_read_db, read_router, AsyncSessionLocal, STATEMENT_CACHE_SIZE, STATEMENT_TIMEOUT_MS, LISTEN_DATABASE_URL
+)
 from .query_builder import QueryBuilder
+from .statement_cache import StatementCache
+from .pagination import encode_cursor, decode_cursor, ordering_signature
+from .rollups import RollupRouter
+from .sql_fragments import parse_cache_stats
+from .streaming import (
+    stream_query, stream_query_arrow, arrow_available, json_default,
+    NDJSON_MEDIA_TYPE, ARROW_STREAM_MEDIA_TYPE
+)
+from .result_cache import ResultCache, canonical_key, listen_for_table_changes
+from .live_orders import LiveOrderHub
+from .slow_queries import SlowQueryLog
+from .cost_guard import CostGuard, is_statement_timeout
+from .observability import (
+    RequestContextMiddleware, StatsCollector, configure_logging, metrics_payload,
+    server_timing, span
+)
+
+# Leveled logging; DEBUG/INFO kept for LOG_SAMPLE_RATE of requests
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+configure_logging(__package__, os.getenv("LOG_LEVEL", "INFO"), LOG_SAMPLE_RATE)
+
+# Measure planning time (one EXPLAIN per new statement shape) for cache stats
+MEASURE_PLANNING = os.getenv("STATEMENT_CACHE_MEASURE_PLANNING", "true").lower() == "true"
+
+# Prepared statements keyed by parameterized SQL shape
+statement_cache = StatementCache(max_size=STATEMENT_CACHE_SIZE)
+
+# Page size used when paginating without an explicit limit
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+
+# Rows fetched per server-side cursor round trip when streaming
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+
+# Answer grouped COUNT payloads from order_count_rollup when possible
+ROLLUP_ROUTING_ENABLED = os.getenv("ROLLUP_ROUTING_ENABLED", "true").lower() == "true"
+rollup_router = RollupRouter(enabled=ROLLUP_ROUTING_ENABLED)
+
+# Queries accepted per /query/batch request, and connections a parallel batch may use
+BATCH_MAX_QUERIES = int(os.getenv("BATCH_MAX_QUERIES", "20"))
+BATCH_MAX_PARALLEL = int(os.getenv("BATCH_MAX_PARALLEL", "4"))
+
+# Read-only transaction in which every statement sees the same snapshot
+SNAPSHOT_TRANSACTION = "SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY"
+
+# Result cache configuration
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", "30"))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Whole /query responses keyed by canonical payload
+result_cache = ResultCache(ttl_seconds=RESULT_CACHE_TTL, max_bytes=RESULT_CACHE_MAX_BYTES)
+
+# Live order feed: one LISTEN connection per worker fanned out to subscribers
+LIVE_ORDERS_ENABLED = os.getenv("LIVE_ORDERS_ENABLED", "true").lower() == "true"
+LIVE_KEEPALIVE_SECONDS = float(os.getenv("LIVE_KEEPALIVE_SECONDS", "15"))
+live_hub = LiveOrderHub(
+    AsyncSessionLocal,
+    queue_size=int(os.getenv("LIVE_QUEUE_SIZE", "100")),
+    max_filters=int(os.getenv("LIVE_MAX_FILTERS", "100")),
+)
+
+# Slow-query log: every /query statement is timed by fingerprint; slow ones
+# are logged and a sample re-run under EXPLAIN (ANALYZE, BUFFERS)
+SLOW_QUERY_LOG_ENABLED = os.getenv("SLOW_QUERY_LOG_ENABLED", "true").lower() == "true"
+slow_query_log = SlowQueryLog(
+    AsyncSessionLocal,
+    threshold_ms=float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200")),
+    sample_rate=float(os.getenv("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", "0.1")),
+    explain_interval=float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "60")),
+    explain_timeout_ms=int(os.getenv("SLOW_QUERY_EXPLAIN_TIMEOUT_MS", "10000")),
+    capacity=int(os.getenv("SLOW_QUERY_CAPTURES", "100")),
+    max_fingerprints=int(os.getenv("SLOW_QUERY_MAX_FINGERPRINTS", "500")),
+)
+
+def _optional_float(name, default=""):
+    value = os.getenv(name, default)
+    return float(value) if value else None
+
+# Runaway query guard: unbounded non-aggregate queries get a default limit,
+# and EXPLAIN cost estimates above the thresholds are downgraded (lower
+# limit, shorter statement_timeout) or rejected. Both thresholds are off
+# (empty) unless QUERY_COST_DOWNGRADE / QUERY_COST_REJECT are set.
+cost_guard = CostGuard(
+    default_limit=int(os.getenv("QUERY_DEFAULT_LIMIT", "1000")) or None,
+    downgrade_cost=_optional_float("QUERY_COST_DOWNGRADE"),
+    reject_cost=_optional_float("QUERY_COST_REJECT"),
+    downgrade_limit=int(os.getenv("QUERY_DOWNGRADE_LIMIT", "100")),
+    downgrade_timeout_ms=int(os.getenv("QUERY_DOWNGRADE_TIMEOUT_MS", "2000")),
+)
+
+# Admin endpoints (/admin/...) require this X-Admin-Token when set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
 
 # Create FastAPI application with metadata
 app = FastAPI(
@@ -36,8 +148,53 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Request-ID"],
 )
 
+# Outermost, so request metrics and the request ID cover everything below
+app.add_middleware(RequestContextMiddleware, sample_rate=LOG_SAMPLE_RATE)
+
+@app.on_event("startup")
+async def start_table_change_listener():
+    """Start invalidating the result cache on Postgres table-change notifications."""
+    if RESULT_CACHE_ENABLED:
+        app.state.cache_listener = asyncio.create_task(
+            listen_for_table_changes(result_cache, LISTEN_DATABASE_URL)
+        )
+
+@app.on_event("shutdown")
+async def stop_table_change_listener():
+    """Stop the table-change listener task."""
+    listener = getattr(app.state, "cache_listener", None)
+    if listener is not None:
+        listener.cancel()
+
+@app.on_event("startup")
+async def start_live_order_listener():
+    """Start fanning orders_delta notifications out to live subscribers."""
+    if LIVE_ORDERS_ENABLED:
+        app.state.live_listener = asyncio.create_task(live_hub.run(LISTEN_DATABASE_URL))
+
+@app.on_event("shutdown")
+async def stop_live_order_listener():
+    """Stop the live order listener task."""
+    listener = getattr(app.state, "live_listener", None)
+    if listener is not None:
+        listener.cancel()
+
+@app.on_event("startup")
+async def start_replica_monitor():
+    """Start checking replica health and replication lag."""
+    if read_router.replicas:
+        app.state.replica_monitor = asyncio.create_task(read_router.monitor())
+
+@app.on_event("shutdown")
+async def stop_replica_monitor():
+    """Stop the replica monitor task."""
+    monitor = getattr(app.state, "replica_monitor", None)
+    if monitor is not None:
+        monitor.cancel()
+
 class QueryPayload(BaseModel):
     """
     Request model for dynamic query construction.
@@ -69,62 +226,291 @@ class QueryPayload(BaseModel):
         None,
         gt=0,  # Must be greater than 0
         le=1000,  # Maximum of 1000 results
-        description="Maximum number of results to return",
+        description="Maximum number of results to return (page size when paginating)",
         example=10
     )
+    paginate: bool = Field(
+        False,
+        description="Return a next_cursor for keyset pagination over order_by + order_id"
+    )
+    cursor: Optional[str] = Field(
+        None,
+        description="Opaque next_cursor from the previous page; implies paginate"
+    )
+    stream: bool = Field(
+        False,
+        description="Stream rows as they are read (chunked JSON, or NDJSON with Accept: application/x-ndjson)"
+    )
+    timeout_ms: Optional[int] = Field(
+        None,
+        gt=0,
+        le=STATEMENT_TIMEOUT_MS or None,
+        description="statement_timeout for this query in milliseconds, at most QUERY_STATEMENT_TIMEOUT_MS (not applied to streams)",
+        example=5000
+    )
+
+class BatchPayload(BaseModel):
+    """
+    Request model for running several queries in one request.
+    
+    Results come back in the order of ``queries``. A failing query is
+    reported in its own result and does not fail the others.
+    """
+    queries: List[QueryPayload] = Field(
+        ...,
+        min_items=1,
+        max_items=BATCH_MAX_QUERIES,
+        description="Queries to run; streaming is not supported inside a batch"
+    )
+    snapshot: bool = Field(
+        False,
+        description="Run every query in one read-only REPEATABLE READ snapshot, so the results are consistent with each other (bypasses the result cache)"
+    )
+    parallel: bool = Field(
+        False,
+        description="Run the queries concurrently on up to BATCH_MAX_PARALLEL pooled connections instead of one after another on one connection"
+    )
+
+async def measure_planning_ms(db, sql, params):
+    """
+    Ask Postgres how long it takes to plan a statement.
+    
+    Runs EXPLAIN (SUMMARY) without ANALYZE, so the query itself is not
+    executed. Failures are swallowed: this only feeds cache statistics.
+    A savepoint keeps a failed EXPLAIN from aborting the transaction.
+    
+    Returns:
+        float or None: Planning time in milliseconds
+    """
+    try:
+        explain_sql = "EXPLAIN (SUMMARY ON, FORMAT JSON) " + sql.rstrip().rstrip(";")
+        async with db.begin_nested():
+            plan = (await db.execute(text(explain_sql), params)).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        return plan[0].get("Planning Time")
+    except Exception:
+        return None
+
+class PlannedQuery(NamedTuple):
+    """A validated payload ready to execute, or a result cache hit."""
+    sql: Optional[str]
+    params: Optional[dict]
+    statement: object
+    routed: bool
+    query_builder: QueryBuilder
+    paginate: bool
+    signature: Optional[str]
+    cache_key: str
+    versions: Optional[dict]
+    cached: Optional[dict]  # Response served from the result cache
+    timeout_ms: Optional[int] = None  # statement_timeout set for this query only
+    guard: Optional[dict] = None  # What the cost guard changed, reported in the response
+
+async def plan_query(payload: QueryPayload, db: AsyncSession, stream: bool = False, use_cache: bool = True) -> PlannedQuery:
+    """
+    Validate a payload and turn it into a prepared statement.
+    
+    Args:
+        payload: JSON query specification
+        db: Session used for rollup checks and planning measurements
+        stream: Whether rows will be streamed (streams bypass the result cache)
+        use_cache: Whether the result cache may answer this payload
+        
+    Returns:
+        PlannedQuery: Statement and bind values, or the cached response
+        
+    Raises:
+        ValueError: For query validation errors, and QueryCostError for
+            queries estimated to cost more than QUERY_COST_REJECT
+    """
+    # Initialize query builder and apply JSON specifications; fragments
+    # are parsed and validated here, before any database work
+    query_builder = QueryBuilder()
+    query_builder.select(payload.select)
+    
+    # Apply optional clauses based on input
+    if payload.where:
+        query_builder.where(payload.where)
+    
+    if payload.group_by:
+        query_builder.group_by(payload.group_by)
+    
+    if payload.order_by:
+        query_builder.order_by(payload.order_by)
+    
+    # Key caches and rollup matching on the canonical fragments
+    canonical = payload.model_copy(update=query_builder.fragments())
+    
+    # Serve repeated payloads from the result cache
+    cache_key = canonical_key(canonical.model_dump())
+    if RESULT_CACHE_ENABLED and use_cache and not stream:
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            response, age = cached
+            return PlannedQuery(None, None, None, False, query_builder, False, None, cache_key, None,
+                                {**response, "cache_hit": True, "cache_age": round(age, 3)})
+    versions = result_cache.snapshot()
+    
+    paginate = payload.paginate or payload.cursor is not None
+    if paginate and stream:
+        raise ValueError("Streaming cannot be combined with cursor pagination")
+    signature = None
+    if paginate:
+        signature = ordering_signature(query_builder.order_keys())
+        after = decode_cursor(payload.cursor, signature) if payload.cursor else None
+        query_builder.paginate(payload.limit or DEFAULT_PAGE_SIZE, after=after)
+    elif payload.limit:
+        query_builder.limit(payload.limit)
+    
+    # Unbounded row listings get a default limit; streams may read everything
+    guard = {}
+    if not stream and cost_guard.needs_default_limit(query_builder):
+        query_builder.limit(cost_guard.default_limit)
+        cost_guard.default_limited += 1
+        guard["default_limit"] = cost_guard.default_limit
+
+    # Grouped counts come from the rollup table when it can answer exactly
+    routed = await rollup_router.route(db, canonical)
+    timeout_ms = payload.timeout_ms
+    if routed:
+        sql, params = routed
+    else:
+        # Generate parameterized SQL and bind values from builder
+        sql, params = query_builder.build_parameterized()
+        
+        # Reject or downgrade statements the planner expects to be expensive
+        downgrade = await cost_guard.check(
+            db, sql, params, keep_limit=paginate or query_builder.is_aggregate()
+        )
+        if downgrade and not stream:
+            if downgrade["limit"] is not None:
+                params = {**params, "limit": downgrade["limit"]}
+            timeout_ms = min(timeout_ms or downgrade["timeout_ms"], downgrade["timeout_ms"])
+            guard.update(downgraded=True, **downgrade)
+    
+    # Reuse the prepared statement for this shape when we have one
+    statement, is_new = statement_cache.get(sql)
+    if is_new and MEASURE_PLANNING:
+        statement_cache.record_planning(sql, await measure_planning_ms(db, sql, params))
+    
+    return PlannedQuery(sql, params, statement, bool(routed), query_builder, paginate, signature,
+                        cache_key, versions if use_cache else None, None, timeout_ms, guard or None)
+
+async def run_planned_query(plan: PlannedQuery, db: AsyncSession) -> dict:
+    """
+    Execute a planned query and build the /query response.
+    
+    The response is stored in the result cache unless the plan was made
+    with use_cache=False or the session is on a replica.
+    """
+    if plan.cached is not None:
+        return plan.cached
+    
+    # Per-query timeout; reset after the statement, since SET LOCAL would
+    # otherwise last for the rest of a batch's transaction
+    if plan.timeout_ms:
+        await db.execute(text(f"SET LOCAL statement_timeout = {int(plan.timeout_ms)}"))
+    
+    # Execute query against database
+    target = read_router.target_of(db.bind)
+    start = time.perf_counter()
+    with span("execute"):
+        result = await db.execute(plan.statement, plan.params)
+    if SLOW_QUERY_LOG_ENABLED:
+        slow_query_log.record(plan.sql, plan.params, (time.perf_counter() - start) * 1000,
+                              sessions=target.sessions if target else None)
+    with span("fetch"):
+        rows = [dict(row._mapping) for row in result]
+    if plan.timeout_ms:
+        await db.execute(text("SET LOCAL statement_timeout TO DEFAULT"))
+    
+    # Return structured response with metadata
+    response = {
+        "success": True,
+        "data": rows,
+        "count": len(rows),
+        "sql": plan.sql,  # Include generated SQL for debugging
+        "params": plan.params,  # Bind values for the placeholders in sql
+        "source": "rollup" if plan.routed else "orders",
+    }
+    if plan.paginate:
+        rows, next_values = plan.query_builder.split_page(rows)
+        response["data"] = rows
+        response["count"] = len(rows)
+        response["next_cursor"] = encode_cursor(next_values, plan.signature) if next_values else None
+    if plan.guard:
+        response["cost_guard"] = plan.guard
+    # Table versions move with commits on the primary; a replica result may
+    # predate them, so only primary reads are cached
+    if RESULT_CACHE_ENABLED and plan.versions is not None and target is read_router.primary:
+        result_cache.put(plan.cache_key, response, plan.versions)
+    return {**response, "cache_hit": False, "cache_age": 0.0}
 
 @app.post("/query")
-def execute_query(payload: QueryPayload, db: Session = Depends(get_db)):
+async def execute_query(payload: QueryPayload, request: Request, db: AsyncSession = Depends(get_read_db)):
     """
     Execute a dynamic SQL query based on JSON input.
     
     Takes a JSON specification and converts it to SQL, executes the query
     against the database, and returns the results with metadata.
     
+    With ``stream`` set, or an ``Accept: application/x-ndjson`` header, rows
+    are read through a server-side cursor and written as they arrive
+    instead of being collected into one response. ``Accept:
+    application/vnd.apache.arrow.stream`` streams the same rows as an
+    Arrow IPC stream of typed columns.
+    
     Args:
         payload: JSON query specification following QueryPayload schema
-        db: Database session injected by FastAPI dependency system
+        request: Incoming request, inspected for the Accept header
+        db: Read-only session (on a replica when one is usable)
         
     Returns:
-        dict: Query results with success status, data, count, and SQL
+        dict: Query results with success status, data, count, SQL and
+            cache_hit / cache_age (seconds) from the result cache, plus
+            cost_guard when a default limit or downgrade was applied; a
+            Server-Timing header gives the build, execute, fetch and
+            serialize times in milliseconds
         
     Raises:
         HTTPException: 
-            - 400 for query validation errors
+            - 400 for query validation errors and queries over the cost limit
+            - 406 if Arrow output is requested but pyarrow is not installed
             - 500 for database execution errors
+            - 504 if the statement_timeout cancelled the query
     """
+    accept = request.headers.get("accept", "")
+    arrow = ARROW_STREAM_MEDIA_TYPE in accept
+    if arrow and not arrow_available():
+        raise HTTPException(status_code=406, detail="Arrow output requires pyarrow on the server")
+    
     try:
-        # Initialize query builder and apply JSON specifications
-        query_builder = QueryBuilder()
-        query_builder.select(payload.select)
-        
-        # Apply optional clauses based on input
-        if payload.where:
-            query_builder.where(payload.where)
+        ndjson = NDJSON_MEDIA_TYPE in accept
+        stream = payload.stream or ndjson or arrow
         
-        if payload.group_by:
-            query_builder.group_by(payload.group_by)
+        with span("build"):
+            plan = await plan_query(payload, db, stream=stream)
         
-        if payload.order_by:
-            query_builder.order_by(payload.order_by)
+        # Streams open their own session, on the engine this request was given
+        sessions = read_router.target_of(db.bind).sessions
+        if arrow:
+            return StreamingResponse(
+                stream_query_arrow(plan.statement, plan.params, batch_size=STREAM_BATCH_SIZE, sessions=sessions),
+                media_type=ARROW_STREAM_MEDIA_TYPE,
+            )
+        if stream:
+            return StreamingResponse(
+                stream_query(plan.statement, plan.params, plan.sql, ndjson=ndjson,
+                             batch_size=STREAM_BATCH_SIZE, sessions=sessions),
+                media_type=NDJSON_MEDIA_TYPE if ndjson else "application/json",
+            )
         
-        if payload.limit:
-            query_builder.limit(payload.limit)
-
-        # Generate SQL string from builder
-        sql = query_builder.build()
-        
-        # Execute query against database
-        result = db.execute(text(sql))
-        rows = [dict(row._mapping) for row in result]
-        
-        # Return structured response with metadata
-        return {
-            "success": True,
-            "data": rows,
-            "count": len(rows),
-            "sql": sql,  # Include generated SQL for debugging
-        }
+        result = await run_planned_query(plan, db)
+        # Encoded here rather than by FastAPI so serialization is a span too
+        with span("serialize"):
+            body = json.dumps(result, default=json_default, ensure_ascii=False, separators=(",", ":"))
+        return Response(body, media_type="application/json", headers={"Server-Timing": server_timing()})
         
     except ValueError as e:
         # Handle query validation errors (bad input)
@@ -133,12 +519,356 @@ def execute_query(payload: QueryPayload, db: Session = Depends(get_db)):
             detail=f"Query validation error: {str(e)}"
         )
     except Exception as e:
+        read_router.report_error(db.bind, e)
+        if is_statement_timeout(e):
+            raise HTTPException(
+                status_code=504,
+                detail=f"Query timed out: {str(e)}"
+            )
         # Handle database and other unexpected errors
         raise HTTPException(
             status_code=500,
             detail=f"Query execution failed: {str(e)}"
         )
 
+async def run_batch_item(payload: QueryPayload, db: AsyncSession, use_cache: bool) -> dict:
+    """Run one query of a batch; errors become a result with success false."""
+    start = time.perf_counter()
+    try:
+        if payload.stream:
+            raise ValueError("Streaming is not supported inside a batch")
+        with span("build"):
+            plan = await plan_query(payload, db, use_cache=use_cache)
+        result = await run_planned_query(plan, db)
+    except ValueError as e:
+        result = {"success": False, "status": 400, "detail": f"Query validation error: {str(e)}"}
+    except Exception as e:
+        read_router.report_error(db.bind, e)
+        if is_statement_timeout(e):
+            result = {"success": False, "status": 504, "detail": f"Query timed out: {str(e)}"}
+        else:
+            result = {"success": False, "status": 500, "detail": f"Query execution failed: {str(e)}"}
+    return {**result, "elapsed_ms": round((time.perf_counter() - start) * 1000, 2)}
+
+async def run_batch_serial(payloads: List[QueryPayload], db: AsyncSession, snapshot: bool) -> List[dict]:
+    """
+    Run queries one after another on one session (one pooled connection).
+    
+    A database error rolls the transaction back. Without a snapshot the
+    next query starts a new transaction; in a snapshot the remaining
+    queries are skipped, since they could no longer see the same data.
+    """
+    if snapshot:
+        await db.execute(text(SNAPSHOT_TRANSACTION))
+    results = []
+    aborted = None
+    for payload in payloads:
+        if aborted:
+            results.append({
+                "success": False,
+                "status": 500,
+                "detail": f"Skipped: the snapshot transaction was aborted by an earlier query ({aborted})",
+                "elapsed_ms": 0.0,
+            })
+            continue
+        result = await run_batch_item(payload, db, use_cache=not snapshot)
+        if result.get("status", 0) >= 500:
+            await db.rollback()
+            if snapshot:
+                aborted = result["detail"]
+        results.append(result)
+    return results
+
+async def run_batch_parallel(payloads: List[QueryPayload], snapshot: bool, sessions) -> List[dict]:
+    """
+    Run queries concurrently, each on its own session from ``sessions``
+    (one engine, so a snapshot can be shared).
+    
+    For a snapshot, one session exports its snapshot with
+    pg_export_snapshot() and keeps its transaction open while the other
+    sessions import it, so every query still sees the same data.
+    """
+    semaphore = asyncio.Semaphore(BATCH_MAX_PARALLEL)
+    exporter = sessions() if snapshot else None
+    try:
+        snapshot_id = None
+        if exporter is not None:
+            await exporter.execute(text(SNAPSHOT_TRANSACTION))
+            snapshot_id = (await exporter.execute(text("SELECT pg_export_snapshot()"))).scalar()
+        
+        async def run_one(payload):
+            async with semaphore:
+                async with sessions() as db:
+                    if snapshot_id:
+                        await db.execute(text(SNAPSHOT_TRANSACTION))
+                        # Snapshot IDs come from Postgres and cannot be bound as parameters
+                        await db.execute(text(f"SET TRANSACTION SNAPSHOT '{snapshot_id}'"))
+                    return await run_batch_item(payload, db, use_cache=not snapshot)
+        
+        return list(await asyncio.gather(*(run_one(payload) for payload in payloads)))
+    finally:
+        if exporter is not None:
+            await exporter.close()
+
+@app.post("/query/batch")
+async def execute_query_batch(batch: BatchPayload, db: AsyncSession = Depends(get_read_db)):
+    """
+    Execute several query payloads in one request.
+    
+    By default the queries run one after another on one connection, which
+    saves the per-request overhead and pool checkouts of separate /query
+    calls. With ``parallel`` they run concurrently on separate pooled
+    connections, so the batch takes about as long as its slowest query.
+    ``snapshot`` makes all queries read the same consistent state.
+    
+    Args:
+        batch: Queries plus the snapshot and parallel options
+        db: Database session injected by FastAPI dependency system
+        
+    Returns:
+        dict: success (true if every query succeeded), results in request
+            order (each a /query response, or success false with status
+            and detail), count and elapsed_ms
+        
+    Raises:
+        HTTPException: 500 if the snapshot transaction cannot be set up
+    """
+    start = time.perf_counter()
+    try:
+        if batch.parallel:
+            results = await run_batch_parallel(batch.queries, batch.snapshot, read_router.target_of(db.bind).sessions)
+        else:
+            results = await run_batch_serial(batch.queries, db, batch.snapshot)
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Batch execution failed: {str(e)}"
+        )
+    return {
+        "success": all(result["success"] for result in results),
+        "results": results,
+        "count": len(results),
+        "snapshot": batch.snapshot,
+        "parallel": batch.parallel,
+        "elapsed_ms": round((time.perf_counter() - start) * 1000, 2),
+    }
+
+@app.get("/orders/live")
+async def live_orders(
+    request: Request,
+    select: List[str] = Query(["*"], description="Fields to send for changed orders"),
+    where: Optional[List[str]] = Query(None, description="Conditions a changed order must meet"),
+):
+    """
+    Server-sent event stream of changes to orders matching a filter.
+    
+    Each event's data is JSON with an ``op``:
+    - ``ready``: subscribed; load the current rows (e.g. with /query) now
+    - ``upsert``: ``rows`` that were inserted or changed and match the filter
+    - ``delete``: ``ids`` of orders deleted or no longer matching
+    - ``resync``: changes were missed (bulk write, reconnect, slow client);
+      reload
+    
+    Args:
+        request: Incoming request, checked for client disconnects
+        select: Fields to send, as in QueryPayload (o.order_id is always included)
+        where: WHERE conditions, as in QueryPayload
+        
+    Raises:
+        HTTPException:
+            - 400 for filter validation errors
+            - 503 if the live feed is disabled
+    """
+    if not LIVE_ORDERS_ENABLED:
+        raise HTTPException(status_code=503, detail="Live order feed is disabled")
+    try:
+        subscription = live_hub.subscribe(select, where)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Query validation error: {str(e)}"
+        )
+    
+    async def events():
+        try:
+            yield f"data: {json.dumps({'op': 'ready'})}\n\n"
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), LIVE_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"  # SSE comment; keeps proxies from closing the stream
+                    continue
+                yield f"data: {json.dumps(event, default=json_default, separators=(',', ':'))}\n\n"
+        finally:
+            live_hub.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+def require_admin(request: Request):
+    """Reject admin requests without the right X-Admin-Token, when ADMIN_TOKEN is set."""
+    if ADMIN_TOKEN and request.headers.get("x-admin-token") != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+@app.get("/admin/slow-queries", dependencies=[Depends(require_admin)])
+def slow_queries(
+    limit: int = Query(50, gt=0, le=500, description="Fingerprints and captures returned"),
+    fingerprint: Optional[str] = Query(None, description="Only this fingerprint and its captures"),
+):
+    """
+    Slow-query log of this worker.
+    
+    Returns statement fingerprints ranked by total execution time, each
+    with its normalized SQL, count, slow count and mean/p50/p95/p99/max
+    milliseconds, and the EXPLAIN (ANALYZE, BUFFERS) plans captured for
+    slow statements, newest first, with a summary listing sequential scans.
+    """
+    return {"enabled": SLOW_QUERY_LOG_ENABLED, **slow_query_log.report(limit, fingerprint)}
+
+@app.delete("/admin/slow-queries", dependencies=[Depends(require_admin)])
+def clear_slow_queries():
+    """Forget the fingerprints and captures of this worker's slow-query log."""
+    slow_query_log.clear()
+    return {"success": True}
+
+@app.get("/stats/live")
+def live_order_stats():
+    """
+    Live order feed statistics for this worker.
+    
+    Returns open subscribers, distinct filters, notifications received,
+    queries run to re-read changed orders and events sent.
+    """
+    return live_hub.stats()
+
+@app.get("/stats/statements")
+def statement_cache_stats():
+    """
+    Prepared statement cache statistics.
+    
+    Returns hit rate, evictions, an upper bound on the planning time saved
+    and the most reused statement shapes.
+    """
+    return statement_cache.stats()
+
+@app.get("/stats/fragments")
+def fragment_parse_stats():
+    """
+    SQL fragment parse cache statistics.
+    
+    Returns per-clause hits, misses and entry counts of the parse caches.
+    """
+    return parse_cache_stats()
+
+@app.get("/stats/rollups")
+def rollup_routing_stats():
+    """
+    Rollup routing statistics.
+    
+    Returns how many grouped queries were answered from order_count_rollup
+    and how many fell back to the base tables.
+    """
+    return {
+        "enabled": rollup_router.enabled,
+        "table_ready": rollup_router.table_ready,
+        "routed": rollup_router.routed,
+        "fallbacks": rollup_router.fallbacks,
+    }
+
+@app.get("/stats/cost-guard")
+def cost_guard_stats():
+    """
+    Runaway query guard statistics.
+    
+    Returns the statement timeout, default limit and cost thresholds, and
+    how many queries were given a default limit, downgraded or rejected.
+    """
+    return {"statement_timeout_ms": STATEMENT_TIMEOUT_MS, **cost_guard.stats()}
+
+@app.get("/stats/results")
+def result_cache_stats():
+    """
+    Result cache statistics.
+    
+    Returns entry count, bytes used, hit rate and current table versions.
+    """
+    return result_cache.stats()
+
+@app.get("/stats/replicas")
+def replica_stats():
+    """
+    Read replica routing statistics.
+    
+    Returns the routing strategy, how often reads fell back to the primary,
+    and per engine its health, replication lag, reads routed to it and
+    connections in use.
+    """
+    return read_router.stats()
+
+def _pool_stats(read):
+    """One value per engine of a pool statistic."""
+    return {(target.name,): read(target.engine.pool) for target in read_router.targets}
+
+metrics_collector = StatsCollector()
+metrics_collector.gauge("orderboard_backend_pool_size", "Connections kept open by the pool",
+                        lambda: _pool_stats(lambda pool: pool.size()), labels=("engine",))
+metrics_collector.gauge("orderboard_backend_pool_checked_out", "Pooled connections in use",
+                        lambda: _pool_stats(lambda pool: pool.checkedout()), labels=("engine",))
+metrics_collector.gauge("orderboard_backend_pool_overflow", "Connections open beyond the pool size",
+                        lambda: _pool_stats(lambda pool: max(pool.overflow(), 0)), labels=("engine",))
+metrics_collector.counter("orderboard_backend_result_cache_lookups", "Result cache lookups by outcome",
+                          lambda: {("hit",): result_cache.hits, ("miss",): result_cache.misses}, labels=("result",))
+metrics_collector.counter("orderboard_backend_result_cache_evictions", "Result cache entries evicted for space",
+                          lambda: result_cache.evictions)
+metrics_collector.counter("orderboard_backend_result_cache_invalidations", "Table writes that invalidated the result cache",
+                          lambda: result_cache.invalidations)
+metrics_collector.gauge("orderboard_backend_result_cache_bytes", "Bytes held by the result cache",
+                        lambda: result_cache.current_bytes)
+metrics_collector.counter("orderboard_backend_statement_cache_lookups", "Prepared statement cache lookups by outcome",
+                          lambda: {("hit",): statement_cache.hits, ("miss",): statement_cache.misses}, labels=("result",))
+metrics_collector.counter("orderboard_backend_rollup_queries", "Grouped queries by where they were answered",
+                          lambda: {("rollup",): rollup_router.routed, ("base_tables",): rollup_router.fallbacks},
+                          labels=("source",))
+metrics_collector.gauge("orderboard_backend_live_subscribers", "Open /orders/live streams",
+                        lambda: live_hub.subscriber_count)
+metrics_collector.counter("orderboard_backend_slow_queries", "Statements slower than SLOW_QUERY_THRESHOLD_MS",
+                          lambda: slow_query_log.slow)
+metrics_collector.counter("orderboard_backend_slow_query_explains", "EXPLAIN captures of slow statements by outcome",
+                          lambda: {("captured",): slow_query_log.explained, ("skipped",): slow_query_log.skipped,
+                                   ("failed",): slow_query_log.explain_errors},
+                          labels=("result",))
+metrics_collector.counter("orderboard_backend_cost_guard_queries", "Queries changed by the cost guard by action",
+                          lambda: {("default_limit",): cost_guard.default_limited, ("downgraded",): cost_guard.downgraded,
+                                   ("rejected",): cost_guard.rejected},
+                          labels=("action",))
+metrics_collector.counter("orderboard_backend_reads", "Read-only sessions by engine",
+                          lambda: {(target.name,): target.reads for target in read_router.targets}, labels=("engine",))
+metrics_collector.counter("orderboard_backend_replica_fallbacks", "Reads sent to the primary because no replica was usable",
+                          lambda: read_router.fallbacks)
+metrics_collector.gauge("orderboard_backend_replica_usable", "1 if the replica is healthy and within REPLICA_MAX_LAG_SECONDS",
+                        lambda: {(replica.name,): int(read_router.usable(replica)) for replica in read_router.replicas},
+                        labels=("engine",))
+metrics_collector.gauge("orderboard_backend_replica_lag_seconds", "Replication lag at the last check",
+                        lambda: {(replica.name,): replica.lag_seconds for replica in read_router.replicas},
+                        labels=("engine",))
+metrics_collector.register()
+
+@app.get("/metrics")
+def metrics():
+    """
+    Prometheus metrics for this worker.
+    
+    Request and stage duration histograms, connection pool usage, and
+    result cache, statement cache and rollup routing counters.
+    """
+    payload, content_type = metrics_payload()
+    return Response(payload, media_type=content_type)
+
 @app.get("/")
 def health_check():
     """
@@ -0,0 +1,218 @@
+"""
+Request IDs, timing spans, sampled logging and Prometheus metrics.
+
+- Every HTTP request runs with a request ID: the caller's ``X-Request-ID``
+  (the agent sends the ID of the prompt it is answering) or a new one. It
+  is echoed in the response and added to every log record.
+- ``span("execute")`` times part of a request into the
+  ``orderboard_backend_stage_seconds`` histogram and into the request's
+  span list, which /query returns as a ``Server-Timing`` header.
+- Log records go to stderr through the standard logging module
+  (LOG_LEVEL). DEBUG and INFO records are kept for a LOG_SAMPLE_RATE
+  fraction of requests, picked by request ID so a request is logged whole
+  or not at all; warnings and errors are always kept.
+- ``GET /metrics`` renders request and stage histograms, plus values read
+  from the caches and connection pools at scrape time (StatsCollector).
+
+Metrics are per worker process, like the /stats endpoints.
+"""
+
+import logging
+import random
+import sys
+import time
+import uuid
+import zlib
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, List, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Latency buckets in seconds, from a rollup lookup to a runaway scan
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUESTS = Counter(
+    "orderboard_backend_requests_total", "HTTP requests by endpoint and status code", ["endpoint", "status"]
+)
+REQUEST_SECONDS = Histogram(
+    "orderboard_backend_request_seconds", "HTTP request duration, to the last body byte",
+    ["endpoint"], buckets=LATENCY_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "orderboard_backend_stage_seconds", "Duration of request stages (build, execute, fetch, serialize)",
+    ["stage"], buckets=LATENCY_BUCKETS,
+)
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+_sampled: ContextVar[bool] = ContextVar("log_sampled", default=True)
+_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("spans", default=None)
+
+logger = logging.getLogger(__name__)
+
+def request_id() -> Optional[str]:
+    """ID of the request being handled, if any."""
+    return _request_id.get()
+
+@contextmanager
+def span(name: str):
+    """Time a stage of the current request (see module docstring)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_span(name, time.perf_counter() - start)
+
+def record_span(name: str, seconds: float):
+    """Record a stage duration measured elsewhere."""
+    STAGE_SECONDS.labels(name).observe(seconds)
+    spans = _spans.get()
+    if spans is not None:
+        spans.append((name, seconds * 1000))
+
+def server_timing() -> str:
+    """The current request's spans as a Server-Timing header value."""
+    return ", ".join(f"{name};dur={ms:.2f}" for name, ms in _spans.get() or ())
+
+def _is_sampled(rid: str, rate: float) -> bool:
+    if rate >= 1:
+        return True
+    return zlib.crc32(rid.encode("utf-8")) / 2**32 < rate
+
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware: request ID, span list, log sampling and request metrics.
+
+    Written against the raw ASGI interface rather than BaseHTTPMiddleware so
+    streamed responses pass through untouched and are timed to their end.
+    """
+
+    def __init__(self, app, sample_rate: float = 1.0):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        incoming = dict(scope["headers"]).get(REQUEST_ID_HEADER.lower().encode("latin-1"))
+        rid = incoming.decode("latin-1")[:128] if incoming else uuid.uuid4().hex
+        tokens = (
+            _request_id.set(rid),
+            _sampled.set(_is_sampled(rid, self.sample_rate)),
+            _spans.set([]),
+        )
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (REQUEST_ID_HEADER.encode("latin-1"), rid.encode("latin-1"))
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            elapsed = time.perf_counter() - start
+            # The router leaves the matched endpoint in the scope; its name keeps label values bounded
+            endpoint = getattr(scope.get("endpoint"), "__name__", "unmatched")
+            REQUESTS.labels(endpoint, str(status)).inc()
+            REQUEST_SECONDS.labels(endpoint).observe(elapsed)
+            logger.info("%s %s %s %.1fms %s", scope["method"], scope["path"], status, elapsed * 1000, server_timing())
+            for var, token in zip((_request_id, _sampled, _spans), tokens):
+                var.reset(token)
+
+
+class _RequestLogFilter(logging.Filter):
+    """Adds request_id to records and drops DEBUG/INFO of unsampled requests."""
+
+    def __init__(self, sample_rate: float):
+        super().__init__()
+        self.sample_rate = sample_rate
+
+    def filter(self, record):
+        rid = _request_id.get()
+        record.request_id = rid or "-"
+        if record.levelno >= logging.WARNING:
+            return True
+        if rid is None:  # Background tasks: sample record by record
+            return self.sample_rate >= 1 or random.random() < self.sample_rate
+        return _sampled.get()
+
+def configure_logging(package: str, level: str = "INFO", sample_rate: float = 1.0):
+    """
+    Send a package's log records to stderr with level, request ID and sampling.
+
+    Args:
+        package: Logger name the handler is attached to (e.g. "app")
+        level: Minimum level name
+        sample_rate: Fraction of requests whose DEBUG and INFO records are kept
+    """
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(request_id)s] %(name)s: %(message)s"))
+    handler.addFilter(_RequestLogFilter(sample_rate))
+    package_logger = logging.getLogger(package)
+    package_logger.handlers[:] = [handler]
+    package_logger.setLevel(level.upper())
+    package_logger.propagate = False
+
+
+class StatsCollector:
+    """
+    Prometheus collector for numbers the app already keeps.
+
+    Each metric is read at scrape time from a callable that returns a
+    number, or a dict of label value tuples to numbers; a callable that
+    raises is skipped for that scrape.
+
+    Usage:
+        collector = StatsCollector()
+        collector.counter("orderboard_backend_result_cache_hits", "Hits", lambda: result_cache.hits)
+        collector.gauge("orderboard_backend_pool_checked_out", "In use", read_pools, labels=("engine",))
+        REGISTRY.register(collector)
+    """
+
+    def __init__(self):
+        self._metrics = []
+
+    def gauge(self, name: str, documentation: str, read: Callable, labels: Tuple[str, ...] = ()):
+        self._metrics.append((GaugeMetricFamily, name, documentation, read, labels))
+
+    def counter(self, name: str, documentation: str, read: Callable, labels: Tuple[str, ...] = ()):
+        self._metrics.append((CounterMetricFamily, name, documentation, read, labels))
+
+    def collect(self):
+        for family_type, name, documentation, read, labels in self._metrics:
+            try:
+                value = read()
+            except Exception as e:
+                logger.debug("Metric %s not collected: %s", name, e)
+                continue
+            family = family_type(name, documentation, labels=list(labels))
+            if isinstance(value, dict):
+                for label_values, number in value.items():
+                    family.add_metric(list(label_values), number)
+            else:
+                family.add_metric([], value)
+            yield family
+
+    def describe(self):
+        return []  # Collected lazily; nothing to check at registration
+
+    def register(self):
+        REGISTRY.register(self)
+        return self
+
+def metrics_payload() -> Tuple[bytes, str]:
+    """The Prometheus exposition of every registered metric, and its content type."""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
@@ -0,0 +1,88 @@
+"""
+Opaque cursors for keyset pagination.
+
+Features:
+- Encodes the ORDER BY key values of the last row into a URL-safe token
+- Preserves date, datetime and numeric types across the round trip
+- Rejects cursors replayed against a different ordering
+"""
+
+import base64
+import hashlib
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+def ordering_signature(order_keys):
+    """
+    Fingerprint an ordering so cursors only continue the query they came from.
+    
+    Args:
+        order_keys (list): (expression, direction) pairs
+        
+    Returns:
+        str: Short hex digest
+    """
+    raw = "|".join(f"{expr} {direction}" for expr, direction in order_keys)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:12]
+
+def _encode_value(value):
+    """Tag values JSON can't represent natively so they decode to the same type."""
+    if isinstance(value, datetime):
+        return {"$dt": value.isoformat()}
+    if isinstance(value, date):
+        return {"$d": value.isoformat()}
+    if isinstance(value, Decimal):
+        return {"$n": str(value)}
+    return value
+
+def _decode_value(value):
+    """Inverse of _encode_value."""
+    if isinstance(value, dict):
+        if "$dt" in value:
+            return datetime.fromisoformat(value["$dt"])
+        if "$d" in value:
+            return date.fromisoformat(value["$d"])
+        if "$n" in value:
+            return Decimal(value["$n"])
+    return value
+
+def encode_cursor(values, signature):
+    """
+    Build an opaque cursor from the last row's ordering key values.
+    
+    Args:
+        values (list): Key values in ORDER BY order (tiebreak last)
+        signature (str): Result of ordering_signature()
+        
+    Returns:
+        str: URL-safe cursor token
+    """
+    body = {"s": signature, "v": [_encode_value(v) for v in values]}
+    raw = json.dumps(body, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor, signature):
+    """
+    Recover key values from a cursor token.
+    
+    Args:
+        cursor (str): Token returned by encode_cursor()
+        signature (str): Signature of the ordering being paged
+        
+    Returns:
+        list: Key values in ORDER BY order
+        
+    Raises:
+        ValueError: If the cursor is malformed or belongs to another ordering
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        body = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        values = [_decode_value(v) for v in body["v"]]
+        cursor_signature = body["s"]
+    except Exception:
+        raise ValueError("Invalid pagination cursor")
+    if cursor_signature != signature:
+        raise ValueError("Pagination cursor does not match this query's ORDER BY")
+    return values
@@ -6,17 +6,239 @@ Features:
 - Input validation and SQL injection prevention
 - Support for SELECT, WHERE, GROUP BY, ORDER BY, LIMIT clauses
 - Automatic table joins (orders with customers)
+- Parameterized output: WHERE literals lifted into bind parameters
+- Keyset (cursor) pagination on the ORDER BY keys with order_id tiebreak
+- Fragments parsed once into an AST (sql_fragments), validated against the
+  schema and rendered in canonical form
 """
 
+import logging
+import re
+from datetime import date, datetime
+from decimal import Decimal
+from typing import NamedTuple
+
+from .sql_fragments import (
+    Array, Between, Binary, Cast, Column, Exists, Func, In, Literal, OutputName, SpecialValue, Subquery, Unary,
+    find_aggregate, parse_condition, parse_group_item, parse_order_item, parse_select_item, walk,
+)
+
+logger = logging.getLogger(__name__)
+
+_ISO_DATE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+_ISO_DATETIME = re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?$")
+
+_INTEGER_TEXT = re.compile(r"^\s*[+-]?\d+\s*$")
+_NUMERIC_TEXT = re.compile(r"^\s*[+-]?(\d+(\.\d*)?|\.\d+)\s*$")
+
+# Types of the expressions a string literal can be compared with (db/init.sql);
+# literals compared with anything else are bound as text
+_DATE, _TIMESTAMP, _TEXT_ARRAY, _INTEGER, _NUMERIC = "date", "timestamp", "text[]", "integer", "numeric"
+_COLUMN_TYPES = {
+    "due_date": _DATE, "last_updated": _TIMESTAMP, "created_at": _TIMESTAMP, "tags": _TEXT_ARRAY,
+    "customer_id": _INTEGER, "items": _INTEGER, "item_id": _INTEGER, "product_id": _INTEGER, "quantity": _INTEGER,
+    "price": _NUMERIC, "discount": _NUMERIC, "total": _NUMERIC,
+}
+_FUNCTION_TYPES = {
+    "action_event_date": _DATE, "date": _DATE, "date_trunc": _TIMESTAMP, "now": _TIMESTAMP,
+    "array_length": _INTEGER, "cardinality": _INTEGER, "length": _INTEGER, "jsonb_array_length": _INTEGER,
+}
+_CAST_TYPES = {
+    "date": _DATE, "timestamp": _TIMESTAMP, "timestamptz": _TIMESTAMP,
+    "int": _INTEGER, "integer": _INTEGER, "bigint": _INTEGER, "smallint": _INTEGER,
+    "numeric": _NUMERIC, "decimal": _NUMERIC,
+}
+_SPECIAL_TYPES = {"current_date": _DATE, "current_timestamp": _TIMESTAMP, "localtimestamp": _TIMESTAMP}
+
+# Operators whose operands share a type
+_TYPED_OPS = {"=", "<>", "!=", "<", "<=", ">", ">=", "@>", "<@", "&&"}
+
+# Comparisons rewritten to dates when one side is a ->> JSON lookup
+_RANGE_OPS = {"<", "<=", ">", ">="}
+
+# Unique, non-null key appended to every paginated ordering
+_TIEBREAK_KEY = "o.order_id"
+
+# Ordering keys declared NOT NULL in db/init.sql
+_NOT_NULL_KEYS = {"o.order_id", "o.status"}
+
+# Prefix for hidden columns carrying cursor key values
+_CURSOR_COLUMN = "_cursor_"
+
+def _event_date_expr(node):
+    """
+    Date expression for a ->> JSON lookup, or the node unchanged.
+    
+    o.action_json->>'shipped' becomes action_event_date(o.action_json,
+    'shipped') so the expression indexes from db/migrations/001_query_indexes.sql
+    apply; other JSON paths fall back to a plain ::date cast.
+    """
+    if not isinstance(node, Binary) or node.op != "->>":
+        return node
+    if isinstance(node.left, Column) and node.left.name == "action_json" \
+            and isinstance(node.right, Literal) and node.right.kind == "string":
+        return Func("action_event_date", (node.left, node.right))
+    return Cast(node, "date")
+
+def _index_friendly(node):
+    """
+    Rewrite condition forms Postgres can't serve from an index.
+    
+    ``'x' = ANY(o.tags)`` becomes ``o.tags @> ARRAY['x']``, which means the
+    same thing but can use the GIN index on tags, and range comparisons on
+    ``->>`` event lookups compare dates via action_event_date(). Recurses
+    through AND / OR / NOT.
+    """
+    if isinstance(node, Binary) and node.op in ("AND", "OR"):
+        return Binary(node.op, _index_friendly(node.left), _index_friendly(node.right))
+    if isinstance(node, Unary) and node.op == "NOT":
+        return Unary("NOT", _index_friendly(node.operand))
+    if isinstance(node, Binary) and node.op == "=" and isinstance(node.left, Literal) \
+            and isinstance(node.right, Func) and node.right.name == "any" and len(node.right.args) == 1 \
+            and isinstance(node.right.args[0], Column) and node.right.args[0].name == "tags":
+        return Binary("@>", node.right.args[0], Array((node.left,)))
+    if isinstance(node, Binary) and node.op in _RANGE_OPS:
+        return Binary(node.op, _event_date_expr(node.left), _event_date_expr(node.right))
+    if isinstance(node, Between):
+        return Between(_event_date_expr(node.expr), node.low, node.high, node.negated)
+    return node
+
+def _sql_literal(value):
+    """Render a Python value as an inline SQL literal (non-parameterized builds)."""
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    return "'" + str(value).replace("'", "''") + "'"
+
+class _Bound(NamedTuple):
+    """A string literal with the Python value to bind in its place."""
+    literal: Literal
+    value: object
+    precedence = 12
+
+    def sql(self, bind=None):
+        return bind(self.value) if bind else self.literal.sql()
+
+def _expr_type(node):
+    """date, timestamp, text[], integer or numeric for expressions of those types; None otherwise."""
+    if isinstance(node, Column):
+        return _COLUMN_TYPES.get(node.name)
+    if isinstance(node, Func):
+        return _FUNCTION_TYPES.get(node.name)
+    if isinstance(node, Cast):
+        return _CAST_TYPES.get(node.type_name)
+    if isinstance(node, SpecialValue):
+        return _SPECIAL_TYPES.get(node.name)
+    return None
+
+def _parse_text_array(value):
+    """Items of a ``'{a,"b c"}'`` array literal, or None if it isn't one."""
+    if not (value.startswith("{") and value.endswith("}")):
+        return None
+    items, item, quoted, escaped, in_quotes = [], [], False, False, False
+    for ch in value[1:-1]:
+        if escaped:
+            item.append(ch)
+            escaped = False
+        elif ch == "\\":
+            escaped = True
+        elif ch == '"':
+            in_quotes = not in_quotes
+            quoted = True
+        elif ch == "," and not in_quotes:
+            text = "".join(item) if quoted else "".join(item).strip()
+            items.append(None if not quoted and text.upper() == "NULL" else text)
+            item, quoted = [], False
+        else:
+            item.append(ch)
+    if in_quotes or escaped:
+        return None
+    if item or quoted or items:
+        text = "".join(item) if quoted else "".join(item).strip()
+        items.append(None if not quoted and text.upper() == "NULL" else text)
+    return items
+
+def _coerce_literal(value, type_name):
+    """
+    Convert a SQL string literal to the Python value the driver should bind.
+
+    asyncpg binds by the type Postgres infers for the placeholder, so an ISO
+    string compared with a DATE or TIMESTAMP expression has to be a
+    date/datetime, a number compared with an INT or NUMERIC column an
+    int/Decimal, and an array literal compared with tags a list. In any
+    other context (text columns, ->> lookups, to_char()) it stays a str.
+    """
+    if type_name in (_DATE, _TIMESTAMP):
+        if _ISO_DATE.match(value):
+            parsed = date.fromisoformat(value)
+            return parsed if type_name == _DATE else datetime.combine(parsed, datetime.min.time())
+        if _ISO_DATETIME.match(value):
+            parsed = datetime.fromisoformat(value)
+            return parsed.date() if type_name == _DATE else parsed
+    elif type_name == _TEXT_ARRAY:
+        items = _parse_text_array(value)
+        if items is not None:
+            return items
+    elif type_name == _INTEGER and _INTEGER_TEXT.match(value):
+        return int(value)
+    elif type_name == _NUMERIC and _NUMERIC_TEXT.match(value):
+        return Decimal(value.strip())
+    return value
+
+def _typed(node, type_name):
+    """A string literal bound as the given type; other nodes unchanged."""
+    if type_name and isinstance(node, Literal) and node.kind == "string":
+        value = _coerce_literal(node.value, type_name)
+        if value is not node.value:
+            return _Bound(node, value)
+    return node
+
+def _typed_literals(node):
+    """
+    Mark literals compared with typed expressions (see _COLUMN_TYPES).
+
+    Covers both sides of a comparison, BETWEEN bounds and IN lists, and
+    recurses through AND / OR / NOT and into subqueries.
+    """
+    if isinstance(node, Subquery):
+        return node._replace(where=_typed_literals(node.where)) if node.where is not None else node
+    if isinstance(node, Exists):
+        return Exists(_typed_literals(node.subquery))
+    if isinstance(node, Binary) and node.op in ("AND", "OR"):
+        return Binary(node.op, _typed_literals(node.left), _typed_literals(node.right))
+    if isinstance(node, Unary) and node.op == "NOT":
+        return Unary("NOT", _typed_literals(node.operand))
+    if isinstance(node, Binary) and node.op in _TYPED_OPS:
+        left = _typed_literals(node.left) if isinstance(node.left, Subquery) else node.left
+        right = _typed_literals(node.right) if isinstance(node.right, Subquery) else node.right
+        return Binary(node.op, _typed(left, _expr_type(right)), _typed(right, _expr_type(left)))
+    if isinstance(node, Between):
+        type_name = _expr_type(node.expr)
+        return Between(node.expr, _typed(node.low, type_name), _typed(node.high, type_name), node.negated)
+    if isinstance(node, In) and isinstance(node.items, Subquery):
+        return In(node.expr, _typed_literals(node.items), node.negated)
+    if isinstance(node, In):
+        type_name = _expr_type(node.expr)
+        return In(node.expr, tuple(_typed(item, type_name) for item in node.items), node.negated)
+    return node
+
 class QueryBuilder:
     """
     Builds SQL SELECT statements from structured input.
     
+    Every fragment is parsed when added, so unknown columns, disallowed
+    functions and malformed SQL raise ValueError before anything reaches
+    Postgres. Fragments are stored as AST nodes and rendered in canonical
+    form (see fragments()).
+    
     Usage:
         qb = QueryBuilder()
-        qb.select(['order_id', 'status'])
-          .where(['status = "Pending"'])
-          .order_by(['created_at DESC'])
+        qb.select(['o.order_id', 'o.status'])
+          .where(["o.status = 'Pending'"])
+          .order_by(['o.created_at DESC'])
           .limit(10)
         
         sql = qb.build()  # Returns the complete SQL string
@@ -29,6 +251,9 @@ class QueryBuilder:
         self._group_by_fields = []
         self._order_by_fields = []
         self._limit_value = None
+        self._page_size = None
+        self._after_values = None
+        self._order_ids_param = None
     
     def select(self, fields):
         """
@@ -41,7 +266,7 @@ class QueryBuilder:
             QueryBuilder: Self for method chaining
             
         Raises:
-            ValueError: If fields is empty
+            ValueError: If fields is empty or a field is invalid
             TypeError: If fields is not a list
         """
         if not fields:
@@ -50,7 +275,7 @@ class QueryBuilder:
         if not isinstance(fields, list):
             raise TypeError("SELECT fields must be a list")
             
-        self._select_fields.extend(fields)
+        self._select_fields.extend(parse_select_item(field) for field in fields)
         return self
     
     def where(self, conditions):
@@ -64,12 +289,30 @@ class QueryBuilder:
             QueryBuilder: Self for method chaining
             
         Raises:
+            ValueError: If a condition is invalid
             TypeError: If conditions is not a list
         """
         if conditions:
             if not isinstance(conditions, list):
                 raise TypeError("WHERE conditions must be a list")
-            self._where_conditions.extend(conditions)
+            self._where_conditions.extend(parse_condition(condition) for condition in conditions)
+        return self
+    
+    def where_order_ids(self, param="order_ids"):
+        """
+        Restrict the query to the order IDs bound to an array parameter.
+        
+        Adds ``o.order_id = ANY(:param)``; the caller passes the list of IDs
+        under that name when executing. Used to re-read changed orders
+        through a subscriber's filter.
+        
+        Args:
+            param (str): Name of the bind parameter holding the IDs
+            
+        Returns:
+            QueryBuilder: Self for method chaining
+        """
+        self._order_ids_param = param
         return self
     
     def group_by(self, fields):
@@ -83,12 +326,13 @@ class QueryBuilder:
             QueryBuilder: Self for method chaining
             
         Raises:
+            ValueError: If a field is invalid
             TypeError: If fields is not a list
         """
         if fields:
             if not isinstance(fields, list):
                 raise TypeError("GROUP BY fields must be a list")
-            self._group_by_fields.extend(fields)
+            self._group_by_fields.extend(parse_group_item(field) for field in fields)
         return self
     
     def order_by(self, fields):
@@ -102,12 +346,13 @@ class QueryBuilder:
             QueryBuilder: Self for method chaining
             
         Raises:
+            ValueError: If a field is invalid
             TypeError: If fields is not a list
         """
         if fields:
             if not isinstance(fields, list):
                 raise TypeError("ORDER BY fields must be a list")
-            self._order_by_fields.extend(fields)
+            self._order_by_fields.extend(parse_order_item(field) for field in fields)
         return self
     
     def limit(self, count):
@@ -131,6 +376,160 @@ class QueryBuilder:
             self._limit_value = count
         return self
     
+    def paginate(self, page_size, after=None):
+        """
+        Enable keyset pagination.
+        
+        Rows are ordered by the ORDER BY keys plus o.order_id as a tiebreak,
+        and the page starts strictly after the given key values, so every
+        page costs the same however deep the client goes.
+        
+        Args:
+            page_size (int): Rows per page
+            after (list): Key values of the previous page's last row, as
+                returned by split_page(); None for the first page
+            
+        Returns:
+            QueryBuilder: Self for method chaining
+            
+        Raises:
+            ValueError: If page_size is invalid
+        """
+        if not isinstance(page_size, int) or page_size <= 0:
+            raise ValueError("Page size must be a positive integer")
+        self._page_size = page_size
+        self._after_values = after
+        return self
+    
+    def _aliases(self):
+        """SELECT aliases mapped to their expressions."""
+        return {item.alias: item.expr for item in self._select_fields if item.alias}
+    
+    def _order_items(self):
+        """
+        ORDER BY items with output names resolved.
+        
+        A bare name that matches a SELECT alias refers to the alias, as in
+        Postgres, even when a column has the same name.
+        """
+        aliases = self._aliases()
+        return [
+            item._replace(expr=OutputName(item.name)) if item.name in aliases else item
+            for item in self._order_by_fields
+        ]
+    
+    def _check_output_names(self, order_items):
+        """
+        Raise if GROUP BY / ORDER BY names something that is neither a column nor an alias.
+        
+        Raises:
+            ValueError: On the first unknown name
+        """
+        aliases = self._aliases()
+        nodes = tuple(self._group_by_fields) + tuple(item.expr for item in order_items)
+        for node in walk(nodes):
+            if isinstance(node, OutputName) and node.name not in aliases:
+                raise ValueError(f"Unknown column or alias: {node.name}")
+    
+    def order_keys(self):
+        """
+        Normalized ordering used for keyset pagination.
+        
+        Returns:
+            list: (expression, "ASC" | "DESC") pairs ending with the tiebreak;
+                aliases are replaced by the expressions they name
+            
+        Raises:
+            ValueError: If the query can't be paged by key
+        """
+        if self._group_by_fields:
+            raise ValueError("Cursor pagination is not supported for grouped queries")
+        
+        order_items = self._order_items()
+        self._check_output_names(order_items)
+        aliases = self._aliases()
+        
+        keys = []
+        for item in order_items:
+            if item.nulls:
+                raise ValueError("Cursor pagination does not support NULLS FIRST/LAST")
+            expr = item.expr
+            if isinstance(expr, OutputName):
+                # The keyset predicate is in WHERE, where aliases aren't visible
+                expr = aliases[expr.name]
+            keys.append((expr.sql(), item.direction))
+        
+        if not any(expr == _TIEBREAK_KEY for expr, _ in keys):
+            # Follow the last key's direction so a row comparison still applies
+            keys.append((_TIEBREAK_KEY, keys[-1][1] if keys else "ASC"))
+        return keys
+    
+    def split_page(self, rows):
+        """
+        Trim the look-ahead row and extract the cursor for the next page.
+        
+        Args:
+            rows (list): Row dicts returned by the paginated statement
+            
+        Returns:
+            tuple: (rows without cursor columns, next key values or None)
+        """
+        has_more = len(rows) > self._page_size
+        rows = rows[:self._page_size]
+        next_values = None
+        if has_more and rows:
+            last = rows[-1]
+            next_values = [last[f"{_CURSOR_COLUMN}{i}"] for i in range(len(self.order_keys()))]
+        page = [
+            {k: v for k, v in row.items() if not k.startswith(_CURSOR_COLUMN)}
+            for row in rows
+        ]
+        return page, next_values
+    
+    def _keyset_condition(self, keys, values, bind):
+        """
+        Build the "strictly after this row" predicate for keyset pagination.
+        
+        Uses a row-value comparison, which Postgres can serve with an index
+        range scan, when directions are uniform and NULL ordering can't
+        interfere. Otherwise expands to an OR chain that follows Postgres'
+        default NULL placement (last for ASC, first for DESC).
+        
+        Args:
+            keys (list): (expression, direction) pairs
+            values (list): Key values of the last row seen
+            bind (callable): Turns a value into a placeholder or literal
+            
+        Returns:
+            str: SQL condition
+        """
+        if len(values) != len(keys):
+            raise ValueError("Pagination cursor does not match this query's ORDER BY")
+        
+        directions = {direction for _, direction in keys}
+        if None not in values and len(directions) == 1 and (
+            directions == {"DESC"} or all(expr in _NOT_NULL_KEYS for expr, _ in keys)
+        ):
+            op = "<" if directions == {"DESC"} else ">"
+            left = ", ".join(expr for expr, _ in keys)
+            right = ", ".join(bind(value) for value in values)
+            return f"({left}) {op} ({right})"
+        
+        branches = []
+        equal_prefix = []
+        for (expr, direction), value in zip(keys, values):
+            if direction == "ASC":
+                after = None if value is None else f"({expr} > {bind(value)} OR {expr} IS NULL)"
+            else:
+                after = f"{expr} IS NOT NULL" if value is None else f"{expr} < {bind(value)}"
+            if after is not None:
+                branches.append(" AND ".join(equal_prefix + [after]))
+            equal_prefix.append(f"{expr} IS NULL" if value is None else f"{expr} = {bind(value)}")
+        
+        if not branches:
+            return "FALSE"
+        return "(" + " OR ".join(f"({branch})" for branch in branches) + ")"
+    
     def build(self):
         """
         Build the final SQL query string.
@@ -141,57 +540,157 @@ class QueryBuilder:
         Raises:
             ValueError: If the query is invalid (missing SELECT)
         """
+        sql, _ = self._compile(parameterize=False)
+        logger.debug("SQL generated: %s", sql)
+        return sql
+    
+    def build_parameterized(self):
+        """
+        Build the SQL statement with literal values lifted into bind parameters.
+        
+        Queries that differ only in filter values ("status = 'Pending'" vs
+        "status = 'Shipped'") produce the same statement text, so the text
+        can be used as a cache key for prepared statements and plans.
+        
+        Returns:
+            tuple: (sql, params) where sql uses :name placeholders
+            
+        Raises:
+            ValueError: If the query is invalid (missing SELECT)
+        """
+        sql, params = self._compile(parameterize=True)
+        logger.debug("SQL generated: %s params: %s", sql, params)
+        return sql, params
+    
+    def _compile(self, parameterize):
+        """
+        Assemble the statement text, optionally extracting bind parameters.
+        
+        Args:
+            parameterize (bool): Lift WHERE literals and LIMIT into params
+            
+        Returns:
+            tuple: (sql, params); params is empty when not parameterizing
+        """
         if not self._select_fields:
             raise ValueError("Cannot build query: SELECT clause is required")
         
+        params = {}
+        
+        def bind(value):
+            if not parameterize:
+                return _sql_literal(value)
+            name = f"c{sum(1 for key in params if key.startswith('c'))}"
+            params[name] = value
+            return f":{name}"
+        
+        def bind_filter(value):
+            name = f"p{sum(1 for key in params if key.startswith('p'))}"
+            params[name] = value
+            return f":{name}"
+        
+        order_items = self._order_items()
+        self._check_output_names(order_items)
+        keys = self.order_keys() if self._page_size else []
+        
         # Build query parts step by step
         query_parts = []
         
-        # SELECT clause
+        # SELECT clause (plus hidden cursor key columns when paginating)
+        select_fields = [item.sql() for item in self._select_fields]
+        select_fields += [f"{expr} AS {_CURSOR_COLUMN}{i}" for i, (expr, _) in enumerate(keys)]
         query_parts.append("SELECT")
-        query_parts.append(", ".join(self._select_fields))
+        query_parts.append(", ".join(select_fields))
         
         # FROM clause with explicit join to customers table
         query_parts.append("FROM orders o")
         query_parts.append("LEFT JOIN customers c ON o.customer_id = c.customer_id")
         
         # WHERE clause - combine conditions with AND
-        if self._where_conditions:
-            transformed_conditions = []
-            for condition in self._where_conditions:
-                if "->>" in condition and any(op in condition for op in [">=", "<=", ">", "<"]):
-                    parts = condition.split(" ", 2)
-                    if len(parts) == 3:
-                        left, op, right = parts
-                        transformed = f"({left})::date {op} {right}"
-                        transformed_conditions.append(transformed)
-                    else:
-                        transformed_conditions.append(condition)
-                else:
-                    transformed_conditions.append(condition)
-
+        transformed_conditions = []
+        for condition in self._where_conditions:
+            condition = _typed_literals(_index_friendly(condition))
+            sql = condition.sql(bind_filter if parameterize else None)
+            # An OR must not leak into the surrounding AND
+            transformed_conditions.append(f"({sql})" if condition.precedence < 2 else sql)
+        
+        if self._order_ids_param:
+            transformed_conditions.append(f"o.order_id = ANY(:{self._order_ids_param})")
+        
+        if self._page_size and self._after_values is not None:
+            transformed_conditions.append(self._keyset_condition(keys, self._after_values, bind))
+        
+        if transformed_conditions:
             query_parts.append("WHERE")
             query_parts.append(" AND ".join(transformed_conditions))
         
         # GROUP BY clause
         if self._group_by_fields:
             query_parts.append("GROUP BY")
-            query_parts.append(", ".join(self._group_by_fields))
+            query_parts.append(", ".join(node.sql() for node in self._group_by_fields))
         
         # ORDER BY clause
-        if self._order_by_fields:
+        if keys:
+            query_parts.append("ORDER BY")
+            query_parts.append(", ".join(f"{expr} {direction}" for expr, direction in keys))
+        elif order_items:
             query_parts.append("ORDER BY")
-            query_parts.append(", ".join(self._order_by_fields))
+            query_parts.append(", ".join(item.sql() for item in order_items))
         
-        # LIMIT clause
-        if self._limit_value:
+        # LIMIT clause (one extra row tells us whether another page exists)
+        limit_value = self._page_size + 1 if self._page_size else self._limit_value
+        if limit_value:
             query_parts.append("LIMIT")
-            query_parts.append(str(self._limit_value))
+            if parameterize:
+                params["limit"] = limit_value
+                query_parts.append(":limit")
+            else:
+                query_parts.append(str(limit_value))
         
         # Combine all parts and add semicolon
         sql = " ".join(query_parts) + ";"
-        print(f"[DEBUG] SQL Generated:\n{sql}")
-        return sql
+        return sql, params
+    
+    def fragments(self):
+        """
+        Canonical text of each clause.
+        
+        Equivalent payloads ("status='Pending'" and "o.status = 'Pending'")
+        give the same text, which makes it a stable key for result and plan
+        caches and for matching rollup queries.
+        
+        Returns:
+            dict: select / where / group_by / order_by lists of SQL strings
+        """
+        return {
+            "select": [item.sql() for item in self._select_fields],
+            "where": [node.sql() for node in self._where_conditions],
+            "group_by": [node.sql() for node in self._group_by_fields],
+            "order_by": [item.sql() for item in self._order_items()],
+        }
+    
+    def is_aggregate(self):
+        """
+        Whether the query returns one row per group rather than per order.
+        
+        True with a GROUP BY or an aggregate in the SELECT list; such
+        queries are bounded by their groups, not by LIMIT.
+        
+        Returns:
+            bool: True for grouped or aggregate queries
+        """
+        if self._group_by_fields:
+            return True
+        return any(find_aggregate(item.expr) is not None for item in self._select_fields)
+    
+    def has_limit(self):
+        """
+        Whether the query has a row limit (an explicit LIMIT or a page size).
+        
+        Returns:
+            bool: True if the built SQL will end in LIMIT
+        """
+        return bool(self._limit_value or self._page_size)
     
     def reset(self):
         """
@@ -205,6 +704,9 @@ class QueryBuilder:
         self._group_by_fields.clear()
         self._order_by_fields.clear()
         self._limit_value = None
+        self._page_size = None
+        self._after_values = None
+        self._order_ids_param = None
         return self
     
     def __str__(self):
@@ -213,4 +715,5 @@ class QueryBuilder:
     
     def __repr__(self):
         """Detailed representation for debugging."""
-        return f"QueryBuilder(select={self._select_fields}, where={self._where_conditions})"
\ No newline at end of file
+        fragments = self.fragments()
+        return f"QueryBuilder(select={fragments['select']}, where={fragments['where']})"
\ No newline at end of file
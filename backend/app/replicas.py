@@ -0,0 +1,218 @@
+"""
+Routing of read-only queries across Postgres streaming replicas.
+
+The primary takes every write (order updates, LISTEN/NOTIFY, rollup
+refreshes). /query and /query/batch only read, so with replicas configured
+their sessions are opened on a replica instead:
+
+- round_robin: replicas take turns
+- least_connections: the replica with the fewest pooled connections in use
+
+Each replica is checked every ``check_interval`` seconds through its own
+pool, so ``pool_pre_ping`` replaces dead connections before the check runs.
+The check reads the replication lag: zero when the replica is streaming
+and has replayed everything it received, otherwise the age of the last
+replayed transaction. A replica that fails the check, lags by more than
+``max_lag`` seconds, or drops a connection during a request is left out
+until a later check passes. With no replica usable, reads fall back to
+the primary.
+"""
+
+import asyncio
+import logging
+import math
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+logger = logging.getLogger(__name__)
+
+ROUND_ROBIN = "round_robin"
+LEAST_CONNECTIONS = "least_connections"
+
+# Seconds behind the primary; 0 when every WAL record received is replayed.
+# receive and replay positions are also equal while the WAL receiver is
+# disconnected, so without a streaming receiver the lag is the age of the last
+# replayed transaction (infinite if there is none). Roles without
+# pg_read_all_stats see a NULL status, counted as streaming.
+# A primary answers 0 too, so its own URL can be listed among the replicas
+# to keep it in the read rotation.
+LAG_QUERY = """
+SELECT CASE
+    WHEN NOT pg_is_in_recovery() THEN 0
+    WHEN NOT EXISTS (SELECT 1 FROM pg_stat_wal_receiver WHERE COALESCE(status, 'streaming') = 'streaming')
+        THEN COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())::float8, 'Infinity')
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())::float8, 0)
+END
+"""
+
+
+class ReadTarget:
+    """One engine reads can go to, with its session factory and health."""
+
+    def __init__(self, name: str, engine, sessions):
+        self.name = name
+        self.engine = engine
+        self.sessions = sessions
+        self.healthy = True
+        self.lag_seconds = 0.0
+        self.error: Optional[str] = None
+        self.checked_at: Optional[float] = None
+        self.reads = 0
+
+    @property
+    def checked_out(self) -> int:
+        """Pooled connections in use."""
+        return self.engine.pool.checkedout()
+
+
+class ReplicaRouter:
+    """
+    Picks the engine for each read-only session.
+
+    Usage:
+        router = ReplicaRouter(primary, [replica_a, replica_b], strategy="least_connections")
+        async with router.pick().sessions() as db:
+            ...
+        task = asyncio.create_task(router.monitor())
+    """
+
+    def __init__(self, primary: ReadTarget, replicas: List[ReadTarget], strategy: str = ROUND_ROBIN,
+                 max_lag: float = 5.0, check_interval: float = 5.0, check_timeout: float = 2.0):
+        """
+        Args:
+            primary: Fallback target when no replica is usable
+            replicas: Read replicas
+            strategy: round_robin or least_connections
+            max_lag: Seconds of replication lag above which a replica is skipped
+            check_interval: Seconds between health and lag checks
+            check_timeout: Seconds a check may take before the replica counts as down
+        """
+        if strategy not in (ROUND_ROBIN, LEAST_CONNECTIONS):
+            raise ValueError(f"Unknown replica routing strategy {strategy!r}")
+        self.primary = primary
+        self.replicas = replicas
+        self.strategy = strategy
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self._turn = 0
+        self.fallbacks = 0
+
+    @property
+    def targets(self) -> List[ReadTarget]:
+        """Primary first, then the replicas."""
+        return [self.primary, *self.replicas]
+
+    def usable(self, target: ReadTarget) -> bool:
+        return target.healthy and target.lag_seconds <= self.max_lag
+
+    def pick(self) -> ReadTarget:
+        """The target for the next read-only session."""
+        candidates = [replica for replica in self.replicas if self.usable(replica)]
+        if not candidates:
+            return self.fallback() if self.replicas else self._count(self.primary)
+        if self.strategy == LEAST_CONNECTIONS:
+            # Ties go to whichever has served fewer reads, so idle replicas still alternate
+            target = min(candidates, key=lambda replica: (replica.checked_out, replica.reads))
+        else:
+            self._turn += 1
+            target = candidates[self._turn % len(candidates)]
+        return self._count(target)
+
+    def fallback(self) -> ReadTarget:
+        """The primary, for a read no replica could take."""
+        self.fallbacks += 1
+        return self._count(self.primary)
+
+    def _count(self, target: ReadTarget) -> ReadTarget:
+        target.reads += 1
+        return target
+
+    def target_of(self, engine) -> Optional[ReadTarget]:
+        """The target owning an engine (a session's ``bind``)."""
+        sync_engine = getattr(engine, "sync_engine", engine)
+        for target in self.targets:
+            if target.engine.sync_engine is sync_engine:
+                return target
+        return None
+
+    def report_error(self, engine, exc: BaseException):
+        """
+        Take a replica out of rotation after a connection-level failure.
+
+        Query errors (bad SQL, timeouts) leave it in; the next successful
+        check puts a failed replica back.
+        """
+        target = self.target_of(engine)
+        if target is None or target is self.primary:
+            return
+        if isinstance(exc, (OSError, ConnectionError)) or (
+            isinstance(exc, DBAPIError) and exc.connection_invalidated
+        ):
+            self.mark_down(target, exc)
+
+    def mark_down(self, target: ReadTarget, exc: BaseException):
+        """Leave a replica out until its next successful check."""
+        if target.healthy:
+            logger.warning("Replica %s failed, routing reads elsewhere: %s", target.name, exc)
+        target.healthy = False
+        target.error = str(exc) or type(exc).__name__
+
+    async def _read_lag(self, target: ReadTarget):
+        async with target.engine.connect() as connection:
+            return await connection.scalar(text(LAG_QUERY))
+
+    async def check(self, target: ReadTarget):
+        """Update one replica's health and lag."""
+        try:
+            lag = await asyncio.wait_for(self._read_lag(target), timeout=self.check_timeout)
+            if not target.healthy:
+                logger.info("Replica %s is back", target.name)
+            target.lag_seconds = float(lag or 0)
+            target.healthy = True
+            target.error = None
+            if target.lag_seconds > self.max_lag:
+                logger.warning("Replica %s lags by %.1f s", target.name, target.lag_seconds)
+        except Exception as e:
+            if target.healthy:
+                logger.warning("Replica %s failed its health check: %s", target.name, e)
+            target.healthy = False
+            target.error = str(e) or type(e).__name__
+        target.checked_at = time.time()
+
+    async def check_all(self):
+        await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+
+    async def monitor(self):
+        """Check every replica each check_interval, forever."""
+        while True:
+            await self.check_all()
+            await asyncio.sleep(self.check_interval)
+
+    def stats(self) -> Dict[str, object]:
+        """Strategy, fallbacks to the primary, and each target's state."""
+        return {
+            "strategy": self.strategy,
+            "max_lag_seconds": self.max_lag,
+            "fallbacks": self.fallbacks,
+            "targets": [
+                {
+                    "name": target.name,
+                    "role": "primary" if target is self.primary else "replica",
+                    "usable": target is self.primary or self.usable(target),
+                    "healthy": target.healthy,
+                    # None while the lag is unknown (no replayed transaction to date it)
+                    "lag_seconds": round(target.lag_seconds, 3) if math.isfinite(target.lag_seconds) else None,
+                    "error": target.error,
+                    "checked_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(target.checked_at))
+                        if target.checked_at else None,
+                    "reads": target.reads,
+                    "checked_out": target.checked_out,
+                }
+                for target in self.targets
+            ],
+        }
@@ -0,0 +1,249 @@
+"""
+In-process result cache for /query responses.
+
+Features:
+- Canonical cache keys built from the query payload
+- TTL expiry, byte-size bound and LRU eviction
+- Invalidation by per-table write version (bumped via Postgres NOTIFY)
+"""
+
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Tables every /query statement may read (orders is always joined to customers)
+QUERY_TABLES = ("orders", "customers")
+
+# Channel the table-change trigger in db/init.sql notifies on
+TABLE_CHANGE_CHANNEL = "table_changed"
+
+def canonical_key(payload):
+    """
+    Build a stable cache key from a query payload.
+    
+    Fragments are expected in canonical form (QueryBuilder.fragments()),
+    so they are used as they are; folding whitespace here would also fold
+    it inside quoted literals. WHERE conditions are ANDed, so their order
+    is irrelevant and they are sorted; other lists keep their order
+    because it changes the result.
+    
+    Args:
+        payload (dict): Query payload fields
+        
+    Returns:
+        str: Canonical JSON string
+    """
+    canonical = {}
+    for field, value in payload.items():
+        if value in (None, []):
+            continue
+        if isinstance(value, list):
+            value = [str(item) for item in value]
+            if field == "where":
+                value = sorted(value)
+        canonical[field] = value
+    return json.dumps(canonical, sort_keys=True, separators=(",", ":"))
+
+class ResultCache:
+    """
+    LRU cache of query responses bounded by TTL and total size in bytes.
+    
+    Each entry remembers the write version of the tables it was read from.
+    A write to any of those tables bumps the version, and the entry stops
+    matching on the next lookup. While ``listening`` is False (the NOTIFY
+    listener is disconnected) nothing is served or stored.
+    
+    Usage:
+        cache = ResultCache(ttl_seconds=30, max_bytes=64 * 1024 * 1024)
+        versions = cache.snapshot()
+        cached = cache.get(key)
+        if cached is None:
+            cache.put(key, response, versions)
+    """
+    
+    def __init__(self, ttl_seconds=30.0, max_bytes=64 * 1024 * 1024, tables=QUERY_TABLES):
+        """
+        Initialize an empty cache.
+        
+        Args:
+            ttl_seconds (float): Maximum entry age
+            max_bytes (int): Upper bound on the serialized size of all entries
+            tables (tuple): Tables whose write versions guard every entry
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.tables = tables
+        self.table_versions = {table: 0 for table in tables}
+        self.listening = True
+        self._entries = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def snapshot(self):
+        """
+        Capture current table versions; take it before running the query.
+        
+        Returns:
+            tuple: Versions of the guarded tables
+        """
+        return tuple(self.table_versions[table] for table in self.tables)
+    
+    def bump(self, table):
+        """
+        Record a write to a table, invalidating entries that read it.
+        
+        Args:
+            table (str): Table name from the NOTIFY payload
+        """
+        if table in self.table_versions:
+            self.table_versions[table] += 1
+            self.invalidations += 1
+    
+    def get(self, key):
+        """
+        Look up a cached response.
+        
+        Args:
+            key (str): Canonical payload key
+            
+        Returns:
+            tuple or None: (response, age_seconds) on a hit, None on a miss
+        """
+        if not self.listening:
+            self.misses += 1
+            return None
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry["created"]
+            if age <= self.ttl_seconds and entry["versions"] == self.snapshot():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["value"], age
+            self._remove(key)
+        self.misses += 1
+        return None
+    
+    def put(self, key, value, versions):
+        """
+        Store a response, evicting least recently used entries to fit.
+        
+        Responses larger than the whole budget, computed against table
+        versions that have since changed, or read while the listener is
+        disconnected are not stored.
+        
+        Args:
+            key (str): Canonical payload key
+            value (dict): JSON-serializable response
+            versions (tuple): Table versions captured before the query ran
+        """
+        if not self.listening or versions != self.snapshot():
+            return
+        size = len(json.dumps(value, default=str))
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            self._remove(key)
+        while self._entries and self.current_bytes + size > self.max_bytes:
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+        self._entries[key] = {
+            "value": value,
+            "size": size,
+            "created": time.monotonic(),
+            "versions": versions,
+        }
+        self.current_bytes += size
+    
+    def _remove(self, key):
+        """Drop an entry and release its bytes."""
+        entry = self._entries.pop(key)
+        self.current_bytes -= entry["size"]
+    
+    def clear(self):
+        """Drop all entries and reset counters."""
+        self._entries.clear()
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def stats(self):
+        """
+        Summarize cache effectiveness.
+        
+        Returns:
+            dict: Entry count, bytes used, hit rate and table versions
+        """
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "listening": self.listening,
+            "table_versions": dict(self.table_versions),
+        }
+
+async def listen_for_table_changes(cache, dsn, retry_seconds=5.0):
+    """
+    Bump cache table versions whenever Postgres signals a write.
+    
+    Keeps a dedicated asyncpg connection LISTENing on the table-change
+    channel and reconnects on failure. From the moment the connection is
+    seen to close until it is back, the cache serves and stores nothing,
+    and every version is bumped on both sides of the gap, so no entry
+    outlives it. A connection that dies without asyncpg noticing (a silent
+    network drop) is only caught by the TTL, which bounds staleness.
+    
+    Args:
+        cache (ResultCache): Cache to invalidate
+        dsn (str): Plain ``postgresql://`` connection string
+        retry_seconds (float): Delay between reconnect attempts
+    """
+    import asyncpg
+
+    def on_notify(connection, pid, channel, payload):
+        cache.bump(payload)
+
+    def stop_serving():
+        cache.listening = False
+        for table in cache.tables:
+            cache.bump(table)
+
+    stop_serving()  # Until the first LISTEN is in place
+    while True:
+        connection = None
+        try:
+            connection = await asyncpg.connect(dsn)
+            await connection.add_listener(TABLE_CHANGE_CHANNEL, on_notify)
+            # Anything written while we were not listening is unaccounted for
+            for table in cache.tables:
+                cache.bump(table)
+            cache.listening = True
+            closed = asyncio.Event()
+            connection.add_termination_listener(lambda _conn: closed.set())
+            await closed.wait()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Result cache listener error: %s", e)
+        finally:
+            if cache.listening:
+                stop_serving()
+            if connection is not None and not connection.is_closed():
+                await connection.close()
+        await asyncio.sleep(retry_seconds)
@@ -0,0 +1,297 @@
+"""
+Routing of grouped COUNT queries to pre-aggregated rollups.
+
+Features:
+- Recognizes single-dimension GROUP BY + COUNT(*) payloads
+- Serves status, customer, order type, tag and due-date bucket counts
+  from the order_count_rollup table (db/migrations/002_order_rollups.sql)
+- Filters on the grouped column are applied to the rollup; any other
+  filter falls back to the base orders table
+"""
+
+import logging
+import re
+import time
+from datetime import date
+
+from sqlalchemy import text
+
+from .sql_fragments import Binary, Column, In, Literal, Subquery, parse_condition
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_TABLE = "order_count_rollup"
+
+# Rollup rows store '' for NULL; this turns them back into NULL
+_VALUE = "NULLIF(r.value, '')"
+
+# Grouping expression -> (rollup dimension, SQL for the group value)
+_DIMENSIONS = {
+    "o.status": ("status", _VALUE),
+    "status": ("status", _VALUE),
+    "o.order_type": ("order_type", _VALUE),
+    "order_type": ("order_type", _VALUE),
+    "c.customer_name": ("customer_id", "c.customer_name"),
+    "customer_name": ("customer_id", "c.customer_name"),
+    "o.customer_id": ("customer_id", f"{_VALUE}::int"),
+    "unnest(o.tags)": ("tag", _VALUE),
+    "unnest(tags)": ("tag", _VALUE),
+    "o.due_date": ("due_date", f"{_VALUE}::date"),
+    "due_date": ("due_date", f"{_VALUE}::date"),
+}
+
+# date_trunc('month', o.due_date) style buckets, summed from per-day rows
+_DUE_DATE_BUCKET = re.compile(r"^date_trunc\('(day|week|month|quarter|year)',(?:o\.)?due_date\)$")
+
+_COUNT_EXPRESSIONS = {"count(*)", "count(1)", "count(o.order_id)", "count(order_id)"}
+
+# Filterable base column per dimension, the rollup expression standing in
+# for it, and the comparison operators allowed (IN lists are always allowed)
+_EQUALITY_OPS = {"=", "!=", "<>"}
+_FILTERS = {
+    "status": (Column("o", "status"), _VALUE, _EQUALITY_OPS),
+    "order_type": (Column("o", "order_type"), _VALUE, _EQUALITY_OPS),
+    "customer_id": (Column("c", "customer_name"), "c.customer_name", _EQUALITY_OPS),
+    "due_date": (Column("o", "due_date"), f"{_VALUE}::date", _EQUALITY_OPS | {"<", "<=", ">", ">="}),
+}
+
+_ALIAS = re.compile(r"^(.*?)\s+as\s+\"?(\w+)\"?$", re.IGNORECASE | re.DOTALL)
+_ORDER = re.compile(r"^(.+?)(?:\s+(asc|desc))?$", re.IGNORECASE | re.DOTALL)
+
+def _normalize(expr):
+    """Canonical form for matching expressions: lowercase, no whitespace."""
+    return "".join(expr.split()).lower()
+
+def _output_name(expr, alias):
+    """Column name Postgres gives a select item (alias, column, or function name)."""
+    if alias:
+        return alias
+    match = re.match(r"^(?:\w+\.)?(\w+)$", expr.strip())
+    if match:
+        return match.group(1)
+    match = re.match(r"^(\w+)\s*\(", expr.strip())
+    return match.group(1).lower() if match else None
+
+def _split_alias(item):
+    """Split 'expr AS alias' into (expr, alias or None)."""
+    match = _ALIAS.match(item.strip())
+    return (match.group(1), match.group(2)) if match else (item.strip(), None)
+
+def _dimension(expr):
+    """Return (dimension, value SQL) for a grouping expression, or None."""
+    normalized = _normalize(expr)
+    if normalized in _DIMENSIONS:
+        return _DIMENSIONS[normalized]
+    match = _DUE_DATE_BUCKET.match(normalized)
+    if match:
+        return "due_date", f"date_trunc('{match.group(1)}', {_VALUE}::date)"
+    return None
+
+def _filter_value(dimension, literal):
+    """
+    Bind value for a literal compared with a dimension, or None if the
+    rollup can't take it (NULL, numbers for text columns, non-dates).
+    """
+    if not isinstance(literal, Literal) or literal.kind != "string":
+        return None
+    if dimension != "due_date":
+        return literal.value
+    try:
+        return date.fromisoformat(literal.value)
+    except ValueError:
+        return None
+
+def _rollup_filter(dimension, condition, params):
+    """
+    SQL for a WHERE condition applied to the rollup, or None.
+
+    Only a single comparison or IN list whose left side is the grouped
+    column and whose right side is constants qualifies; AND / OR trees,
+    functions and other columns need the base table.
+    """
+    if dimension not in _FILTERS:
+        return None
+    column, filter_sql, ops = _FILTERS[dimension]
+    try:
+        node = parse_condition(condition)
+    except ValueError:
+        return None  # Left for the query builder to report
+
+    def bind(value):
+        name = f"p{len(params)}"
+        params[name] = value
+        return f":{name}"
+
+    if isinstance(node, Binary) and node.op in ops and node.left == column:
+        value = _filter_value(dimension, node.right)
+        if value is None:
+            return None
+        return f"{filter_sql} {node.op} {bind(value)}"
+    if isinstance(node, In) and node.expr == column and not isinstance(node.items, Subquery):
+        values = [_filter_value(dimension, item) for item in node.items]
+        if any(value is None for value in values):
+            return None
+        items = ", ".join(bind(value) for value in values)
+        return f"{filter_sql} {'NOT ' if node.negated else ''}IN ({items})"
+    return None
+
+def rollup_query(select, where=None, group_by=None, order_by=None, limit=None):
+    """
+    Rewrite a grouped COUNT payload into a query over the rollup table.
+    
+    Args:
+        select (list): SELECT items, e.g. ["o.status", "COUNT(*) as count"]
+        where (list): WHERE conditions
+        group_by (list): GROUP BY items
+        order_by (list): ORDER BY items
+        limit (int): Row limit
+        
+    Returns:
+        tuple or None: (sql, params) when the rollup can answer the query
+            exactly, otherwise None
+    """
+    if not group_by or len(group_by) != 1 or len(select) != 2:
+        return None
+    
+    items = [_split_alias(item) for item in select]
+    count_items = [item for item in items if _normalize(item[0]) in _COUNT_EXPRESSIONS]
+    if len(count_items) != 1:
+        return None
+    count_expr, count_alias = count_items[0]
+    dim_expr, dim_alias = next(item for item in items if item is not count_items[0])
+    
+    found = _dimension(dim_expr)
+    if found is None:
+        return None
+    dimension, value_sql = found
+    
+    grouped = _normalize(group_by[0])
+    if grouped != _normalize(dim_expr) and grouped != (dim_alias or "").lower():
+        return None
+    
+    dim_name = _output_name(dim_expr, dim_alias)
+    count_name = _output_name(count_expr, count_alias)
+    if not dim_name or not count_name:
+        return None
+    
+    params = {}
+    
+    # Only filters on the grouped column itself can be answered from the rollup
+    conditions = [f"r.dimension = '{dimension}'"]
+    for condition in where or []:
+        filter_sql = _rollup_filter(dimension, condition, params)
+        if filter_sql is None:
+            return None
+        conditions.append(filter_sql)
+    
+    # ORDER BY may name an output column or repeat a select expression
+    names = {
+        _normalize(dim_expr): dim_name, dim_name.lower(): dim_name,
+        _normalize(count_expr): count_name, count_name.lower(): count_name,
+    }
+    order_parts = []
+    for field in order_by or []:
+        expr, direction = _ORDER.match(field.strip()).groups()
+        name = names.get(_normalize(expr))
+        if name is None:
+            return None
+        order_parts.append(f'"{name}" {(direction or "ASC").upper()}')
+    
+    columns = {
+        dim_name: f'{value_sql} AS "{dim_name}"',
+        count_name: f'SUM(r.count)::bigint AS "{count_name}"',
+    }
+    select_sql = ", ".join(
+        columns[dim_name] if item is not count_items[0] else columns[count_name]
+        for item in items
+    )
+    
+    query_parts = ["SELECT", select_sql, f"FROM {ROLLUP_TABLE} r"]
+    if dimension == "customer_id":
+        query_parts.append(f"LEFT JOIN customers c ON c.customer_id = {_VALUE}::int")
+    query_parts += ["WHERE", " AND ".join(conditions)]
+    query_parts += ["GROUP BY", value_sql, "HAVING SUM(r.count) > 0"]
+    if order_parts:
+        query_parts += ["ORDER BY", ", ".join(order_parts)]
+    if limit:
+        params["limit"] = limit
+        query_parts += ["LIMIT", ":limit"]
+    
+    return " ".join(query_parts) + ";", params
+
+class RollupRouter:
+    """
+    Decides per request whether a payload is answered from the rollup table.
+    
+    Checks that the rollup table exists (the migration may not have been
+    applied) and routes nothing while it doesn't. A found table is
+    remembered for the life of the process; a missing one is looked for
+    again every ``recheck_seconds``, so applying the migration to a running
+    backend turns routing on.
+    
+    Usage:
+        router = RollupRouter(enabled=True)
+        routed = await router.route(db, payload)
+        if routed:
+            sql, params = routed
+    """
+    
+    def __init__(self, enabled=True, recheck_seconds=60.0):
+        """
+        Args:
+            enabled (bool): Master switch for routing
+            recheck_seconds (float): Delay before a missing table is looked for again
+        """
+        self.enabled = enabled
+        self.recheck_seconds = recheck_seconds
+        self._table_ready = False
+        self._checked_at = None
+        self.routed = 0
+        self.fallbacks = 0
+    
+    @property
+    def table_ready(self):
+        """Whether the rollup table was found at the last check."""
+        return self._table_ready
+
+    async def _check_table(self, db):
+        """Return True if order_count_rollup is a table (migration 002 applied)."""
+        try:
+            result = await db.execute(text(
+                "SELECT relkind::text FROM pg_class WHERE oid = to_regclass(:name)"
+            ), {"name": ROLLUP_TABLE})
+            return result.scalar() == "r"
+        except Exception as e:
+            logger.warning("Rollup table check failed: %s", e)
+            return False
+    
+    async def route(self, db, payload):
+        """
+        Try to answer a payload from the rollup table.
+        
+        Args:
+            db: Async database session
+            payload: QueryPayload
+            
+        Returns:
+            tuple or None: (sql, params) for the rollup query, or None to use
+                the base tables
+        """
+        if not self.enabled or not payload.group_by:
+            return None
+        routed = rollup_query(
+            payload.select, payload.where, payload.group_by, payload.order_by, payload.limit
+        )
+        if routed is None:
+            self.fallbacks += 1
+            return None
+        if not self._table_ready:
+            now = time.monotonic()
+            if self._checked_at is not None and now - self._checked_at < self.recheck_seconds:
+                return None
+            self._checked_at = now
+            self._table_ready = await self._check_table(db)
+            if not self._table_ready:
+                return None
+        self.routed += 1
+        return routed
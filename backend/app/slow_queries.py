@@ -0,0 +1,281 @@
+"""
+Slow-query log with sampled EXPLAIN (ANALYZE, BUFFERS) capture.
+
+Every statement /query executes is timed and counted under its
+fingerprint: the SQL with whitespace collapsed and any literals left in it
+(intervals, JSON keys, IN lists) replaced by ``?``. Each fingerprint keeps
+a count, total time and a window of recent latencies for percentiles.
+
+A statement slower than the threshold is logged, and for a sample of them
+the plan is captured: the same statement and bind values are re-run under
+``EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)`` in a background task, in a
+read-only transaction with its own statement_timeout. Captures go into a
+bounded ring buffer along with a summary of the plan (sequential scans,
+execution time, buffers read), so a generated ``where`` that scans all of
+``orders`` shows up in /admin/slow-queries before users notice.
+
+EXPLAIN ANALYZE runs the query a second time. To keep that cost bounded,
+a fingerprint is captured at most once per ``explain_interval`` and only
+one capture runs at a time per worker; the rest are skipped and counted.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import random
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+
+from .observability import request_id
+
+logger = logging.getLogger(__name__)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"(?<![\w.:$])\d+(?:\.\d+)?(?![\w.])")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*\?\s*,)*\s*\?\s*\)", re.IGNORECASE)
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_sql(sql: str) -> str:
+    """SQL with literals replaced by ? and whitespace collapsed."""
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (?)", sql)
+    return _WHITESPACE.sub(" ", sql).strip().rstrip(";").strip()
+
+def fingerprint(sql: str) -> str:
+    """Short stable ID of a statement shape."""
+    return hashlib.sha1(normalize_sql(sql).encode("utf-8")).hexdigest()[:16]
+
+def percentile(samples, pct):
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def summarize_plan(plan: dict) -> dict:
+    """
+    The parts of an EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) result worth
+    scanning: relations read by sequential scan, the top node, timings and
+    shared buffers hit and read.
+    """
+    seq_scans = []
+
+    def walk(node):
+        if node.get("Node Type") == "Seq Scan":
+            seq_scans.append({
+                "relation": node.get("Relation Name"),
+                "rows": node.get("Actual Rows"),
+                "rows_removed_by_filter": node.get("Rows Removed by Filter", 0),
+            })
+        for child in node.get("Plans", ()):
+            walk(child)
+
+    root = plan.get("Plan", {})
+    walk(root)
+    return {
+        "node_type": root.get("Node Type"),
+        "seq_scans": seq_scans,
+        "planning_ms": plan.get("Planning Time"),
+        "execution_ms": plan.get("Execution Time"),
+        "shared_hit_blocks": root.get("Shared Hit Blocks"),
+        "shared_read_blocks": root.get("Shared Read Blocks"),
+    }
+
+
+class _Fingerprint:
+    """Running statistics of one statement shape."""
+
+    __slots__ = ("sql", "count", "total_ms", "max_ms", "slow", "captures", "latencies", "last_seen", "last_explained")
+
+    def __init__(self, sql, window):
+        self.sql = sql
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.slow = 0
+        self.captures = 0
+        self.latencies = deque(maxlen=window)
+        self.last_seen = 0.0
+        self.last_explained = None
+
+
+class SlowQueryLog:
+    """
+    Per-fingerprint timings of executed statements, and a ring buffer of
+    EXPLAIN captures for slow ones.
+
+    Usage:
+        log = SlowQueryLog(session_factory, threshold_ms=200)
+        log.record(sql, params, elapsed_ms, sessions)  # after each execute; may schedule a capture
+        log.report()                           # for the admin endpoint
+    """
+
+    def __init__(self, session_factory, threshold_ms: float = 200.0, sample_rate: float = 0.1,
+                 explain_interval: float = 60.0, explain_timeout_ms: int = 10000,
+                 capacity: int = 100, max_fingerprints: int = 500, window: int = 500):
+        """
+        Args:
+            session_factory: Async session factory used to run EXPLAIN, unless
+                record() is given the one the statement ran on
+            threshold_ms: Statements at least this slow are logged and may be explained
+            sample_rate: Fraction of slow statements explained
+            explain_interval: Seconds before the same fingerprint is explained again
+            explain_timeout_ms: statement_timeout of the EXPLAIN ANALYZE run
+            capacity: Captures kept; the oldest are dropped
+            max_fingerprints: Fingerprints tracked; the least recently seen are dropped
+            window: Recent latencies kept per fingerprint for percentiles
+        """
+        self.session_factory = session_factory
+        self.threshold_ms = threshold_ms
+        self.sample_rate = sample_rate
+        self.explain_interval = explain_interval
+        self.explain_timeout_ms = int(explain_timeout_ms)
+        self.max_fingerprints = max_fingerprints
+        self.window = window
+        self.captures = deque(maxlen=capacity)
+        self._fingerprints: "OrderedDict[str, _Fingerprint]" = OrderedDict()
+        self._explaining = False
+        self._tasks = set()
+        self.slow = 0
+        self.explained = 0
+        self.skipped = 0
+        self.explain_errors = 0
+
+    def record(self, sql: str, params: Optional[dict], elapsed_ms: float, sessions=None) -> str:
+        """
+        Count one execution; a slow one is logged and may be explained.
+
+        ``sessions`` is the session factory of the engine that ran the
+        statement, so a plan captured for a replica read comes from that
+        replica rather than the primary.
+
+        Returns:
+            str: The statement's fingerprint
+        """
+        key = fingerprint(sql)
+        entry = self._fingerprints.get(key)
+        if entry is None:
+            entry = self._fingerprints[key] = _Fingerprint(normalize_sql(sql), self.window)
+            if len(self._fingerprints) > self.max_fingerprints:
+                self._fingerprints.popitem(last=False)
+        else:
+            self._fingerprints.move_to_end(key)
+        entry.count += 1
+        entry.total_ms += elapsed_ms
+        entry.max_ms = max(entry.max_ms, elapsed_ms)
+        entry.latencies.append(elapsed_ms)
+        entry.last_seen = time.time()
+
+        if elapsed_ms >= self.threshold_ms:
+            entry.slow += 1
+            self.slow += 1
+            logger.warning("Slow query %s: %.1f ms: %s", key, elapsed_ms, entry.sql)
+            if self._should_explain(entry):
+                self._start_capture(key, entry, sql, params, elapsed_ms, sessions or self.session_factory)
+        return key
+
+    def _should_explain(self, entry: _Fingerprint) -> bool:
+        if self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            return False
+        recently = entry.last_explained is not None and time.monotonic() - entry.last_explained < self.explain_interval
+        if recently or self._explaining:
+            self.skipped += 1
+            return False
+        return True
+
+    def _start_capture(self, key, entry, sql, params, elapsed_ms, sessions):
+        entry.last_explained = time.monotonic()
+        self._explaining = True
+        task = asyncio.create_task(self._capture(key, entry, sql, dict(params or {}), elapsed_ms, request_id(), sessions))
+        self._tasks.add(task)  # Keep a reference until it finishes
+        task.add_done_callback(self._tasks.discard)
+
+    async def _capture(self, key, entry, sql, params, elapsed_ms, rid, sessions):
+        """Re-run a statement under EXPLAIN ANALYZE and keep the plan."""
+        try:
+            explain_sql = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + sql.rstrip().rstrip(";")
+            async with sessions() as db:
+                await db.execute(text("SET TRANSACTION READ ONLY"))
+                await db.execute(text(f"SET LOCAL statement_timeout = {self.explain_timeout_ms}"))
+                plan = (await db.execute(text(explain_sql), params)).scalar()
+                await db.rollback()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            plan = plan[0]
+            entry.captures += 1
+            self.explained += 1
+            self.captures.append({
+                "fingerprint": key,
+                "sql": sql,
+                "params": params,
+                "elapsed_ms": round(elapsed_ms, 2),
+                "request_id": rid,
+                "captured_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "summary": summarize_plan(plan),
+                "plan": plan,
+            })
+        except Exception as e:
+            self.explain_errors += 1
+            logger.warning("EXPLAIN capture of %s failed: %s", key, e)
+        finally:
+            self._explaining = False
+
+    def report(self, limit: int = 50, fingerprint_id: Optional[str] = None) -> Dict[str, object]:
+        """
+        Fingerprints by total time spent, and the captured plans.
+
+        Args:
+            limit: Fingerprints and captures returned
+            fingerprint_id: Only this fingerprint and its captures
+
+        Returns:
+            dict: Settings, counters, fingerprints (count, slow count,
+                mean/p50/p95/p99/max ms) and captures, newest first
+        """
+        items = self._fingerprints.items()
+        if fingerprint_id:
+            items = [(key, entry) for key, entry in items if key == fingerprint_id]
+        ranked = sorted(items, key=lambda item: item[1].total_ms, reverse=True)[:limit]
+        fingerprints: List[dict] = []
+        for key, entry in ranked:
+            samples = list(entry.latencies)
+            fingerprints.append({
+                "fingerprint": key,
+                "sql": entry.sql,
+                "count": entry.count,
+                "slow": entry.slow,
+                "captures": entry.captures,
+                "total_ms": round(entry.total_ms, 2),
+                "mean_ms": round(entry.total_ms / entry.count, 2),
+                "p50_ms": round(percentile(samples, 50), 2),
+                "p95_ms": round(percentile(samples, 95), 2),
+                "p99_ms": round(percentile(samples, 99), 2),
+                "max_ms": round(entry.max_ms, 2),
+                "last_seen": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(entry.last_seen)),
+            })
+        captures = [capture for capture in reversed(self.captures)
+                    if not fingerprint_id or capture["fingerprint"] == fingerprint_id][:limit]
+        return {
+            "threshold_ms": self.threshold_ms,
+            "sample_rate": self.sample_rate,
+            "explain_interval": self.explain_interval,
+            "fingerprints_tracked": len(self._fingerprints),
+            "slow": self.slow,
+            "explained": self.explained,
+            "skipped": self.skipped,
+            "explain_errors": self.explain_errors,
+            "fingerprints": fingerprints,
+            "captures": captures,
+        }
+
+    def clear(self):
+        """Forget all fingerprints and captures."""
+        self._fingerprints.clear()
+        self.captures.clear()
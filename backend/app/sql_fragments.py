@@ -0,0 +1,961 @@
+"""
+Parser for the SQL fragments accepted by /query.
+
+Features:
+- Tokenizes select, where, group_by and order_by strings into a small AST
+- Validates column references against the orders / customers / order_items schema
+- Whitelists the functions and operators a fragment may use
+- Renders a canonical form: qualified columns, uppercase keywords, single spacing
+- Parses each distinct fragment once (LRU cache keyed by the string)
+"""
+
+import os
+import re
+from functools import lru_cache
+from typing import NamedTuple, Optional, Tuple
+
+# Distinct fragment strings kept parsed, per clause
+PARSE_CACHE_SIZE = int(os.getenv("FRAGMENT_PARSE_CACHE_SIZE", "4096"))
+
+# Columns per table, as declared in db/init.sql
+SCHEMA = {
+    "orders": {
+        "order_id", "customer_id", "status", "order_type", "items", "tags", "due_date",
+        "last_updated", "created_at", "action_notes", "action_json",
+    },
+    "customers": {"customer_id", "customer_name", "customer_avatar"},
+    "order_items": {"item_id", "order_id", "product_id", "quantity", "price", "discount", "total"},
+}
+
+# Tables of the main query (FROM orders o LEFT JOIN customers c), in lookup order
+# for unqualified columns; customer_id resolves to o.customer_id
+QUERY_TABLES = (("o", "orders"), ("c", "customers"))
+
+_AGGREGATES = {"count", "sum", "avg", "min", "max", "array_agg", "string_agg", "bool_and", "bool_or"}
+
+_FUNCTIONS = _AGGREGATES | {
+    # Dates
+    "date", "date_trunc", "date_part", "now", "age", "to_char", "action_event_date",
+    # Arrays and JSON
+    "unnest", "array_length", "cardinality", "any", "all",
+    "jsonb_array_length", "jsonb_extract_path_text",
+    # Scalars
+    "coalesce", "nullif", "greatest", "least", "lower", "upper", "length", "trim",
+    "round", "abs", "concat",
+}
+
+# Arguments that name a unit, format or JSON key rather than a filter value;
+# they stay inline in parameterized SQL so the statement shape (and any
+# expression index) is unchanged
+_INLINE_ARGS = {"action_event_date": {1}, "date_trunc": {0}, "date_part": {0}, "to_char": {1}}
+
+_TYPES = {
+    "date", "timestamp", "timestamptz", "time", "interval", "int", "integer", "bigint",
+    "smallint", "numeric", "decimal", "real", "float", "text", "varchar", "char",
+    "boolean", "bool", "json", "jsonb",
+}
+
+# Keywords that introduce a typed literal, e.g. INTERVAL '7 days'
+_TYPED_LITERALS = {"interval", "date", "timestamp", "time"}
+
+_SPECIAL_VALUES = {"current_date", "current_timestamp", "current_time", "localtimestamp"}
+
+_RESERVED = {
+    "all", "and", "any", "array", "as", "asc", "between", "by", "case", "cast", "desc",
+    "distinct", "else", "end", "exists", "false", "from", "group", "having", "ilike", "in",
+    "into", "is", "like", "limit", "not", "null", "offset", "on", "or", "order", "select",
+    "table", "then", "true", "union", "when", "where", "with",
+}
+
+_COMPARISON_OPS = {"=", "<>", "!=", "<", "<=", ">", ">="}
+_ARITHMETIC_OPS = {"+", "-", "*", "/", "%"}
+_OTHER_OPS = {"->", "->>", "||", "@>", "<@", "&&", "~", "~*", "!~", "!~*"}
+
+# Binding strength used to parenthesize on render (higher binds tighter)
+_PRECEDENCE = {"OR": 1, "AND": 2}
+_PRECEDENCE.update({op: 5 for op in _COMPARISON_OPS})
+_PRECEDENCE.update({op: 6 for op in ("LIKE", "NOT LIKE", "ILIKE", "NOT ILIKE")})
+_PRECEDENCE.update({op: 7 for op in _OTHER_OPS})
+_PRECEDENCE.update({"+": 8, "-": 8, "*": 9, "/": 9, "%": 9})
+_ATOM = 12
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<string>'(?:[^']|'')*')
+      | (?P<number>\d+(?:\.\d+)?)
+      | (?P<qident>"(?:[^"]|"")+")
+      | (?P<ident>[A-Za-z_][A-Za-z0-9_]*)
+      | (?P<comment>--|/\*)
+      | (?P<op>->>|->|::|<=|>=|<>|!=|\|\||@>|<@|&&|!~\*|!~|~\*|[~=<>+\-*/%.,()\[\]])
+    )""", re.VERBOSE)
+
+_SIMPLE_IDENT = re.compile(r"^[a-z_][a-z0-9_]*$")
+
+def quote_ident(name):
+    """Render an identifier, quoting it only when Postgres requires it."""
+    if _SIMPLE_IDENT.match(name) and name not in _RESERVED:
+        return name
+    return '"' + name.replace('"', '""') + '"'
+
+def _child(node, bind, min_precedence):
+    """Render a sub-expression, parenthesized if it binds looser than its context."""
+    sql = node.sql(bind)
+    return f"({sql})" if node.precedence < min_precedence else sql
+
+
+class Column(NamedTuple):
+    """Column reference; qualifier is o / c, a subquery table, or None inside its own subquery."""
+    qualifier: Optional[str]
+    name: str
+    precedence = _ATOM
+
+    def sql(self, bind=None):
+        column = quote_ident(self.name)
+        return f"{self.qualifier}.{column}" if self.qualifier else column
+
+
+class OutputName(NamedTuple):
+    """Bare name that isn't a column; must match a SELECT alias (GROUP BY / ORDER BY only)."""
+    name: str
+    precedence = _ATOM
+
+    def sql(self, bind=None):
+        return quote_ident(self.name)
+
+
+class Star(NamedTuple):
+    """``*`` or ``o.*`` in a select list."""
+    qualifier: Optional[str]
+    precedence = _ATOM
+
+    def sql(self, bind=None):
+        return f"{self.qualifier}.*" if self.qualifier else "*"
+
+
+class Literal(NamedTuple):
+    """String, number, boolean or NULL constant."""
+    kind: str
+    value: str
+    precedence = _ATOM
+
+    def sql(self, bind=None):
+        if self.kind == "string":
+            if bind:
+                return bind(self.value)
+            return "'" + self.value.replace("'", "''") + "'"
+        if self.kind == "number" and bind and "." not in self.value:
+            return bind(int(self.value))
+        return self.value
+
+
+class TypedLiteral(NamedTuple):
+    """``INTERVAL '7 days'`` style constant; always rendered inline."""
+    type_name: str
+    value: str
+    precedence = _ATOM
+
+    def sql(self, bind=None):
+        return f"{self.type_name.upper()} '" + self.value.replace("'", "''") + "'"
+
+
+class SpecialValue(NamedTuple):
+    """CURRENT_DATE, CURRENT_TIMESTAMP and friends."""
+    name: str
+    precedence = _ATOM
+
+    def sql(self, bind=None):
+        return self.name.upper()
+
+
+class Func(NamedTuple):
+    """Call of a whitelisted function."""
+    name: str
+    args: Tuple = ()
+    distinct: bool = False
+    star: bool = False
+    precedence = _ATOM
+
+    def sql(self, bind=None):
+        name = self.name.upper() if self.name in ("any", "all") else self.name
+        if self.star:
+            return f"{name}(*)"
+        inline = _INLINE_ARGS.get(self.name, ())
+        args = ", ".join(
+            arg.sql(None if i in inline else bind) for i, arg in enumerate(self.args)
+        )
+        return f"{name}({'DISTINCT ' if self.distinct else ''}{args})"
+
+
+class Extract(NamedTuple):
+    """``EXTRACT(field FROM expr)``."""
+    field: str
+    expr: object
+    precedence = _ATOM
+
+    def sql(self, bind=None):
+        return f"EXTRACT({self.field.upper()} FROM {self.expr.sql(bind)})"
+
+
+class Cast(NamedTuple):
+    """``expr::type``."""
+    expr: object
+    type_name: str
+    precedence = 11
+
+    def sql(self, bind=None):
+        return f"{_child(self.expr, bind, 11)}::{self.type_name}"
+
+
+class Subscript(NamedTuple):
+    """``expr[index]``; the index stays inline."""
+    expr: object
+    index: object
+    precedence = 11
+
+    def sql(self, bind=None):
+        return f"{_child(self.expr, bind, 11)}[{self.index.sql()}]"
+
+
+class Array(NamedTuple):
+    """``ARRAY[...]`` constructor."""
+    items: Tuple
+    precedence = _ATOM
+
+    def sql(self, bind=None):
+        return "ARRAY[" + ", ".join(item.sql(bind) for item in self.items) + "]"
+
+
+class Row(NamedTuple):
+    """``(a, b)`` row constructor."""
+    items: Tuple
+    precedence = _ATOM
+
+    def sql(self, bind=None):
+        return "(" + ", ".join(item.sql(bind) for item in self.items) + ")"
+
+
+class Unary(NamedTuple):
+    """NOT, unary minus or plus."""
+    op: str
+    operand: object
+
+    @property
+    def precedence(self):
+        return 3 if self.op == "NOT" else 10
+
+    def sql(self, bind=None):
+        if self.op == "NOT":
+            return f"NOT {_child(self.operand, bind, 3)}"
+        # 11 rather than 10 so "- -1" can never render as a "--" comment;
+        # a signed constant stays inline like an arithmetic operand
+        operand_bind = None if isinstance(self.operand, Literal) else bind
+        return f"{self.op}{_child(self.operand, operand_bind, 11)}"
+
+
+class Binary(NamedTuple):
+    """Binary operator: boolean, comparison, pattern, arithmetic or JSON/array."""
+    op: str
+    left: object
+    right: object
+
+    @property
+    def precedence(self):
+        return _PRECEDENCE[self.op]
+
+    def sql(self, bind=None):
+        p = self.precedence
+        if self.op in ("->", "->>"):
+            # The key is part of the path, not a filter value
+            return f"{_child(self.left, bind, p)}{self.op}{_child(self.right, None, p + 1)}"
+        left_min = p + 1 if p == 5 else p
+        right_min = p if self.op in ("AND", "OR") else p + 1
+        left_bind = right_bind = bind
+        if self.op in _ARITHMETIC_OPS:
+            # Operand types pick the operator (date + integer, integer * integer);
+            # an untyped placeholder leaves it ambiguous, so constants stay inline
+            left_bind = None if isinstance(self.left, Literal) else bind
+            right_bind = None if isinstance(self.right, Literal) else bind
+        return f"{_child(self.left, left_bind, left_min)} {self.op} {_child(self.right, right_bind, right_min)}"
+
+
+class Is(NamedTuple):
+    """``expr IS [NOT] NULL/TRUE/FALSE``."""
+    expr: object
+    value: str
+    negated: bool
+    precedence = 4
+
+    def sql(self, bind=None):
+        return f"{_child(self.expr, bind, 5)} IS {'NOT ' if self.negated else ''}{self.value}"
+
+
+class In(NamedTuple):
+    """``expr [NOT] IN (list | subquery)``."""
+    expr: object
+    items: object
+    negated: bool
+    precedence = 6
+
+    def sql(self, bind=None):
+        if isinstance(self.items, Subquery):
+            items = self.items.sql(bind)
+        else:
+            items = "(" + ", ".join(item.sql(bind) for item in self.items) + ")"
+        return f"{_child(self.expr, bind, 7)} {'NOT ' if self.negated else ''}IN {items}"
+
+
+class Between(NamedTuple):
+    """``expr [NOT] BETWEEN low AND high``."""
+    expr: object
+    low: object
+    high: object
+    negated: bool
+    precedence = 6
+
+    def sql(self, bind=None):
+        return (
+            f"{_child(self.expr, bind, 7)} {'NOT ' if self.negated else ''}BETWEEN "
+            f"{_child(self.low, bind, 7)} AND {_child(self.high, bind, 7)}"
+        )
+
+
+class Case(NamedTuple):
+    """``CASE [operand] WHEN ... THEN ... [ELSE ...] END``."""
+    operand: object
+    whens: Tuple
+    default: object
+    precedence = _ATOM
+
+    def sql(self, bind=None):
+        parts = ["CASE"]
+        if self.operand is not None:
+            parts.append(self.operand.sql(bind))
+        for condition, result in self.whens:
+            parts += ["WHEN", condition.sql(bind), "THEN", result.sql(bind)]
+        if self.default is not None:
+            parts += ["ELSE", self.default.sql(bind)]
+        parts.append("END")
+        return " ".join(parts)
+
+
+class Subquery(NamedTuple):
+    """Single-table ``(SELECT ... FROM table [WHERE ...] [LIMIT n])``."""
+    items: Tuple
+    distinct: bool
+    table: str
+    where: object
+    limit: Optional[str]
+    precedence = _ATOM
+
+    def sql(self, bind=None):
+        parts = ["SELECT"]
+        if self.distinct:
+            parts.append("DISTINCT")
+        # Output expressions, like the main select list, are not filter values
+        parts += [", ".join(item.sql() for item in self.items), "FROM", self.table]
+        if self.where is not None:
+            parts += ["WHERE", self.where.sql(bind)]
+        if self.limit is not None:
+            parts += ["LIMIT", self.limit]
+        return "(" + " ".join(parts) + ")"
+
+
+class Exists(NamedTuple):
+    """``EXISTS (subquery)``."""
+    subquery: Subquery
+    precedence = _ATOM
+
+    def sql(self, bind=None):
+        return f"EXISTS {self.subquery.sql(bind)}"
+
+
+class SelectItem(NamedTuple):
+    """Select list entry with optional alias."""
+    expr: object
+    alias: Optional[str]
+
+    def sql(self, bind=None):
+        expr = self.expr.sql(bind)
+        return f"{expr} AS {quote_ident(self.alias)}" if self.alias else expr
+
+
+class OrderItem(NamedTuple):
+    """ORDER BY entry; name is set when the expression was a bare identifier."""
+    expr: object
+    direction: str
+    nulls: Optional[str]
+    name: Optional[str]
+
+    def sql(self, bind=None):
+        sql = f"{self.expr.sql(bind)} {self.direction}"
+        return f"{sql} NULLS {self.nulls}" if self.nulls else sql
+
+
+def walk(node, subqueries=True):
+    """
+    Yield a node and all nodes below it, depth first.
+
+    Args:
+        node: AST node (or tuple of nodes)
+        subqueries (bool): Descend into subqueries
+    """
+    if isinstance(node, tuple) and not hasattr(node, "_fields"):
+        for item in node:
+            yield from walk(item, subqueries)
+        return
+    if not hasattr(node, "_fields"):
+        return
+    yield node
+    if isinstance(node, Subquery) and not subqueries:
+        return
+    for value in node:
+        if isinstance(value, tuple):
+            yield from walk(value, subqueries)
+
+
+def _tokenize(text):
+    """Split a fragment into (kind, value) tokens; identifiers are case-folded."""
+    tokens = []
+    pos = 0
+    text = text.rstrip()
+    while pos < len(text):
+        match = _TOKEN.match(text, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"unexpected character {text[pos:].lstrip()[:1]!r}")
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "comment":
+            raise ValueError("comments are not allowed")
+        if kind == "string":
+            value = value[1:-1].replace("''", "'")
+        elif kind == "qident":
+            value = value[1:-1].replace('""', '"')
+        elif kind == "ident":
+            value = value.lower()
+        tokens.append((kind, value))
+        pos = match.end()
+    if text[pos:].strip():
+        raise ValueError("unterminated literal")
+    tokens.append(("end", None))
+    return tokens
+
+
+class _Parser:
+    """
+    Recursive-descent parser for one fragment.
+
+    Columns are resolved while parsing: subquery tables first (innermost
+    last in ``scopes``), then the main query's o / c tables.
+    """
+
+    def __init__(self, text, output_names=False):
+        """
+        Args:
+            text (str): Fragment to parse
+            output_names (bool): Allow bare names that may be SELECT aliases
+        """
+        self.tokens = _tokenize(text)
+        self.pos = 0
+        self.output_names = output_names
+        self.scopes = []
+
+    # Token helpers
+
+    def peek(self, offset=0):
+        return self.tokens[min(self.pos + offset, len(self.tokens) - 1)]
+
+    def advance(self):
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def at_keyword(self, *words, offset=0):
+        kind, value = self.peek(offset)
+        return kind == "ident" and value in words
+
+    def accept_keyword(self, word):
+        if self.at_keyword(word):
+            self.pos += 1
+            return True
+        return False
+
+    def expect_keyword(self, word):
+        if not self.accept_keyword(word):
+            self.fail(f"expected {word.upper()}")
+
+    def at_op(self, *ops, offset=0):
+        kind, value = self.peek(offset)
+        return kind == "op" and value in ops
+
+    def accept_op(self, op):
+        if self.at_op(op):
+            self.pos += 1
+            return True
+        return False
+
+    def expect_op(self, op):
+        if not self.accept_op(op):
+            self.fail(f"expected {op!r}")
+
+    def fail(self, message):
+        kind, value = self.peek()
+        found = "end of input" if kind == "end" else repr(value)
+        raise ValueError(f"{message}, found {found}")
+
+    def finish(self):
+        if self.peek()[0] != "end":
+            self.fail("unexpected trailing input")
+
+    def identifier(self):
+        kind, value = self.peek()
+        if kind == "qident" or (kind == "ident" and value not in _RESERVED):
+            self.pos += 1
+            return value
+        self.fail("expected an identifier")
+
+    # Column resolution
+
+    def column(self, qualifier, name):
+        """Resolve a column reference against the enclosing scopes and the schema."""
+        for depth, (table, alias) in enumerate(reversed(self.scopes)):
+            if (qualifier is None and name in SCHEMA[table]) or \
+                    (qualifier is not None and qualifier in (table, alias)):
+                if name not in SCHEMA[table]:
+                    raise ValueError(f"unknown column {qualifier}.{name}")
+                # Columns of the innermost subquery need no qualifier
+                return Column(None if depth == 0 else (alias or table), name)
+
+        for alias, table in QUERY_TABLES:
+            if qualifier in (alias, table):
+                if name not in SCHEMA[table]:
+                    raise ValueError(f"unknown column {qualifier}.{name}")
+                return Column(alias, name)
+        if qualifier is not None:
+            raise ValueError(f"unknown table or alias {qualifier!r}")
+
+        for alias, table in QUERY_TABLES:
+            if name in SCHEMA[table]:
+                return Column(alias, name)
+        if self.output_names and not self.scopes:
+            return OutputName(name)
+        raise ValueError(f"unknown column {name}")
+
+    # Expressions, loosest binding first
+
+    def expr(self):
+        node = self.and_expr()
+        while self.accept_keyword("or"):
+            node = Binary("OR", node, self.and_expr())
+        return node
+
+    def and_expr(self):
+        node = self.not_expr()
+        while self.accept_keyword("and"):
+            node = Binary("AND", node, self.not_expr())
+        return node
+
+    def not_expr(self):
+        if self.accept_keyword("not"):
+            return Unary("NOT", self.not_expr())
+        return self.is_expr()
+
+    def is_expr(self):
+        node = self.comparison()
+        while self.accept_keyword("is"):
+            negated = self.accept_keyword("not")
+            for value in ("null", "true", "false"):
+                if self.accept_keyword(value):
+                    break
+            else:
+                self.fail("expected NULL, TRUE or FALSE after IS")
+            node = Is(node, value.upper(), negated)
+        return node
+
+    def comparison(self):
+        node = self.pattern()
+        if self.at_op(*_COMPARISON_OPS):
+            op = self.advance()[1]
+            node = Binary("<>" if op == "!=" else op, node, self.pattern())
+        return node
+
+    def pattern(self):
+        node = self.other()
+        negated = False
+        if self.at_keyword("not") and self.at_keyword("in", "between", "like", "ilike", offset=1):
+            self.pos += 1
+            negated = True
+
+        if self.accept_keyword("in"):
+            self.expect_op("(")
+            if self.at_keyword("select"):
+                items = self.subquery()
+            else:
+                items = self.expr_list()
+            self.expect_op(")")
+            return In(node, items, negated)
+        if self.accept_keyword("between"):
+            low = self.other()
+            self.expect_keyword("and")
+            return Between(node, low, self.other(), negated)
+        for op in ("like", "ilike"):
+            if self.accept_keyword(op):
+                op = f"NOT {op.upper()}" if negated else op.upper()
+                return Binary(op, node, self.other())
+        if negated:
+            self.fail("expected IN, BETWEEN, LIKE or ILIKE after NOT")
+        return node
+
+    def other(self):
+        node = self.additive()
+        while self.at_op(*_OTHER_OPS):
+            op = self.advance()[1]
+            node = Binary(op, node, self.additive())
+        return node
+
+    def additive(self):
+        node = self.multiplicative()
+        while self.at_op("+", "-"):
+            op = self.advance()[1]
+            node = Binary(op, node, self.multiplicative())
+        return node
+
+    def multiplicative(self):
+        node = self.unary()
+        while self.at_op("*", "/", "%"):
+            op = self.advance()[1]
+            node = Binary(op, node, self.unary())
+        return node
+
+    def unary(self):
+        if self.at_op("-", "+"):
+            op = self.advance()[1]
+            return Unary(op, self.unary())
+        return self.postfix()
+
+    def postfix(self):
+        node = self.primary()
+        while True:
+            if self.accept_op("::"):
+                node = Cast(node, self.type_name())
+            elif self.accept_op("["):
+                index = self.expr()
+                self.expect_op("]")
+                node = Subscript(node, index)
+            else:
+                return node
+
+    def type_name(self):
+        kind, value = self.peek()
+        if kind != "ident" or value not in _TYPES:
+            self.fail("expected a type name")
+        self.pos += 1
+        if self.accept_op("("):
+            sizes = [self.number()]
+            while self.accept_op(","):
+                sizes.append(self.number())
+            self.expect_op(")")
+            value += "(" + ",".join(sizes) + ")"
+        if self.accept_op("["):
+            self.expect_op("]")
+            value += "[]"
+        return value
+
+    def number(self):
+        kind, value = self.peek()
+        if kind != "number":
+            self.fail("expected a number")
+        self.pos += 1
+        return value
+
+    def expr_list(self):
+        items = [self.expr()]
+        while self.accept_op(","):
+            items.append(self.expr())
+        return tuple(items)
+
+    def primary(self):
+        kind, value = self.peek()
+
+        if kind == "string":
+            self.pos += 1
+            return Literal("string", value)
+        if kind == "number":
+            self.pos += 1
+            return Literal("number", value)
+        if self.accept_op("("):
+            if self.at_keyword("select"):
+                node = self.subquery()
+            else:
+                items = self.expr_list()
+                node = items[0] if len(items) == 1 else Row(items)
+            self.expect_op(")")
+            return node
+        if kind == "qident":
+            self.pos += 1
+            return self.column_ref(value)
+        if kind != "ident":
+            self.fail("expected an expression")
+
+        if value in ("null", "true", "false"):
+            self.pos += 1
+            return Literal(value, value.upper())
+        if value in _SPECIAL_VALUES:
+            self.pos += 1
+            return SpecialValue(value)
+        if value == "case":
+            return self.case()
+        if value == "exists":
+            self.pos += 1
+            self.expect_op("(")
+            node = Exists(self.subquery())
+            self.expect_op(")")
+            return node
+        if value == "array":
+            self.pos += 1
+            self.expect_op("[")
+            items = () if self.at_op("]") else self.expr_list()
+            self.expect_op("]")
+            return Array(items)
+        if value == "cast":
+            self.pos += 1
+            self.expect_op("(")
+            node = self.expr()
+            self.expect_keyword("as")
+            node = Cast(node, self.type_name())
+            self.expect_op(")")
+            return node
+        if value == "extract" and self.at_op("(", offset=1):
+            self.pos += 2
+            field = self.identifier()
+            self.expect_keyword("from")
+            node = Extract(field, self.expr())
+            self.expect_op(")")
+            return node
+        if value in _TYPED_LITERALS and self.peek(1)[0] == "string":
+            self.pos += 2
+            return TypedLiteral(value, self.tokens[self.pos - 1][1])
+        if self.at_op("(", offset=1):
+            return self.call()
+        if value in _RESERVED:
+            self.fail("unexpected keyword")
+        self.pos += 1
+        return self.column_ref(value)
+
+    def column_ref(self, name):
+        """Parse the rest of ``name``, ``name.column`` or ``name.*``."""
+        if not self.accept_op("."):
+            return self.column(None, name)
+        if self.accept_op("*"):
+            if name not in ("o", "c"):
+                raise ValueError(f"unknown table or alias {name!r}")
+            return Star(name)
+        return self.column(name, self.identifier())
+
+    def call(self):
+        name = self.advance()[1]
+        if name not in _FUNCTIONS:
+            raise ValueError(f"function {name}() is not allowed")
+        self.expect_op("(")
+        if name == "count" and self.accept_op("*"):
+            self.expect_op(")")
+            return Func(name, star=True)
+        distinct = name in _AGGREGATES and self.accept_keyword("distinct")
+        args = () if self.at_op(")") else self.expr_list()
+        self.expect_op(")")
+        return Func(name, args, distinct)
+
+    def case(self):
+        self.expect_keyword("case")
+        operand = None if self.at_keyword("when") else self.expr()
+        whens = []
+        while self.accept_keyword("when"):
+            condition = self.expr()
+            self.expect_keyword("then")
+            whens.append((condition, self.expr()))
+        if not whens:
+            self.fail("expected WHEN")
+        default = self.expr() if self.accept_keyword("else") else None
+        self.expect_keyword("end")
+        return Case(operand, tuple(whens), default)
+
+    def subquery(self):
+        """
+        Parse ``SELECT ... FROM table [alias] [WHERE ...] [LIMIT n]``.
+
+        The FROM table is read ahead of the select list so its columns can
+        be resolved while the list is parsed.
+        """
+        self.expect_keyword("select")
+        distinct = self.accept_keyword("distinct")
+
+        depth = 0
+        index = self.pos
+        while True:
+            kind, value = self.tokens[index]
+            if kind == "end" or (depth == 0 and kind == "op" and value == ")"):
+                raise ValueError("subquery requires a FROM clause")
+            if kind == "op" and value in ("(", "["):
+                depth += 1
+            elif kind == "op" and value in (")", "]"):
+                depth -= 1
+            elif depth == 0 and kind == "ident" and value == "from":
+                break
+            index += 1
+
+        select_start = self.pos
+        self.pos = index + 1
+        kind, table = self.advance()
+        if kind != "ident" or table not in SCHEMA:
+            raise ValueError(f"unknown table {table!r}")
+        alias = None
+        if self.accept_keyword("as") or (self.peek()[0] == "ident" and self.peek()[1] not in _RESERVED):
+            alias = self.identifier()
+        after_from = self.pos
+
+        self.scopes.append((table, alias))
+        self.pos = select_start
+        items = [self.select_item()]
+        while self.accept_op(","):
+            items.append(self.select_item())
+        if self.pos != index:
+            self.fail("expected FROM")
+
+        self.pos = after_from
+        where = self.expr() if self.accept_keyword("where") else None
+        limit = self.number() if self.accept_keyword("limit") else None
+        self.scopes.pop()
+        return Subquery(tuple(items), distinct, table, where, limit)
+
+    def select_item(self):
+        if self.accept_op("*"):
+            return SelectItem(Star(None), None)
+        expr = self.expr()
+        alias = None
+        if self.accept_keyword("as"):
+            alias = self.identifier()
+        elif self.peek()[0] == "qident" or (self.peek()[0] == "ident" and self.peek()[1] not in _RESERVED):
+            alias = self.identifier()
+        return SelectItem(expr, alias)
+
+    def order_item(self):
+        bare = self.peek() if self.peek()[0] in ("ident", "qident") else None
+        start = self.pos
+        expr = self.expr()
+        name = bare[1] if bare and self.pos == start + 1 else None
+        direction = "ASC"
+        if self.accept_keyword("desc"):
+            direction = "DESC"
+        else:
+            self.accept_keyword("asc")
+        nulls = None
+        if self.accept_keyword("nulls"):
+            if self.accept_keyword("first"):
+                nulls = "FIRST"
+            else:
+                self.expect_keyword("last")
+                nulls = "LAST"
+        return OrderItem(expr, direction, nulls, name)
+
+
+def _parse(text, clause, rule, output_names=False):
+    """Run one parser rule over the whole fragment, prefixing errors with the clause."""
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError(f"Invalid {clause} item: empty fragment")
+    try:
+        parser = _Parser(text, output_names)
+        node = rule(parser)
+        parser.finish()
+        return node
+    except ValueError as e:
+        raise ValueError(f"Invalid {clause} item {text!r}: {e}") from None
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_select_item(text):
+    """
+    Parse a SELECT item such as ``"COUNT(*) as count"``.
+
+    Returns:
+        SelectItem: Expression and optional alias
+
+    Raises:
+        ValueError: On syntax errors, unknown columns or disallowed functions
+    """
+    return _parse(text, "SELECT", _Parser.select_item)
+
+def find_aggregate(node):
+    """
+    First aggregate call in an expression, outside subqueries.
+
+    Args:
+        node: AST node (or tuple of nodes)
+
+    Returns:
+        Func or None
+    """
+    for child in walk(node, subqueries=False):
+        if isinstance(child, Func) and child.name in _AGGREGATES:
+            return child
+    return None
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_condition(text):
+    """
+    Parse a WHERE condition such as ``"o.status IN ('Printed', 'Shipped')"``.
+
+    Returns:
+        AST node of the boolean expression
+
+    Raises:
+        ValueError: On syntax errors, unknown columns, disallowed functions
+            or aggregates
+    """
+    node = _parse(text, "WHERE", _Parser.expr)
+    aggregate = find_aggregate(node)
+    if aggregate is not None:
+        raise ValueError(f"Invalid WHERE item {text!r}: aggregate {aggregate.name}() is not allowed in WHERE")
+    return node
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_group_item(text):
+    """
+    Parse a GROUP BY item; bare names that aren't columns may be SELECT aliases.
+
+    Returns:
+        AST node of the grouping expression
+    """
+    return _parse(text, "GROUP BY", _Parser.expr, output_names=True)
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_order_item(text):
+    """
+    Parse an ORDER BY item such as ``"o.due_date DESC NULLS LAST"``.
+
+    Returns:
+        OrderItem: Expression, direction (default ASC) and NULLS placement
+    """
+    return _parse(text, "ORDER BY", _Parser.order_item, output_names=True)
+
+def parse_cache_stats():
+    """
+    Hit/miss counts of the fragment parse caches.
+
+    Returns:
+        dict: Per clause hits, misses and size, plus the overall hit rate
+    """
+    caches = {
+        "select": parse_select_item,
+        "where": parse_condition,
+        "group_by": parse_group_item,
+        "order_by": parse_order_item,
+    }
+    stats = {}
+    hits = misses = 0
+    for clause, cached in caches.items():
+        info = cached.cache_info()
+        stats[clause] = {"hits": info.hits, "misses": info.misses, "size": info.currsize}
+        hits += info.hits
+        misses += info.misses
+    total = hits + misses
+    stats["max_size"] = PARSE_CACHE_SIZE
+    stats["hit_rate"] = round(hits / total, 4) if total else 0.0
+    return stats
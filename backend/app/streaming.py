@@ -0,0 +1,204 @@
+"""
+Streaming serialization of /query results.
+
+Features:
+- Reads rows through a server-side cursor in fixed-size batches
+- NDJSON (one row per line) or a chunked JSON document
+- Apache Arrow IPC stream built column-wise from cursor batches
+- Memory stays bounded by the batch size, not the result size
+"""
+
+import io
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from uuid import UUID
+
+from .database import AsyncSessionLocal
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# Arrow types for the Postgres type OIDs (pg_type.dat) the cursor reports;
+# columns of any other type are sent as text
+_ARROW_TYPES = {
+    16: "bool_", 20: "int64", 21: "int16", 23: "int32", 26: "int64",
+    700: "float32", 701: "float64",
+    1082: "date", 1083: "time", 1114: "timestamp", 1184: "timestamptz",
+    114: "json", 3802: "json", 1700: "numeric",
+    1009: "text[]", 1015: "text[]", 1005: "int[]", 1007: "int[]", 1016: "int[]",
+}
+
+# Field metadata of text columns carrying JSON / exact decimal text
+_JSON_METADATA = {"content_type": "application/json"}
+_NUMERIC_METADATA = {"pg_type": "numeric"}
+
+def json_default(value):
+    """
+    Encode database types the same way FastAPI's JSON response does.
+    
+    Args:
+        value: Value json.dumps can't handle natively
+        
+    Returns:
+        A JSON-serializable equivalent
+    """
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        # Whole numbers (SUM of an integer column) stay integers, as in FastAPI
+        return int(value) if value.as_tuple().exponent >= 0 else float(value)
+    if isinstance(value, UUID):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def _dumps(value):
+    return json.dumps(value, default=json_default, separators=(",", ":"))
+
+async def stream_query(statement, params, sql, ndjson=True, batch_size=500, sessions=AsyncSessionLocal):
+    """
+    Execute a statement and yield serialized output as rows arrive.
+    
+    Opens its own session so the connection lives exactly as long as the
+    response body, independent of request-scoped dependencies.
+    
+    Args:
+        statement: Compiled SQL statement
+        params (dict): Bind parameters
+        sql (str): Statement text, echoed in the JSON document trailer
+        ndjson (bool): One JSON object per line instead of a single document
+        batch_size (int): Rows fetched per round trip from the cursor
+        sessions: Session factory of the engine to read from
+        
+    Yields:
+        bytes: Chunks of the response body
+    """
+    count = 0
+    if not ndjson:
+        yield b'{"success":true,"data":['
+    try:
+        async with sessions() as session:
+            result = await session.stream(
+                statement.execution_options(yield_per=batch_size), params
+            )
+            async for partition in result.partitions(batch_size):
+                chunk = []
+                for row in partition:
+                    line = _dumps(dict(row._mapping))
+                    if ndjson:
+                        chunk.append(line + "\n")
+                    else:
+                        chunk.append(("," if count else "") + line)
+                    count += 1
+                yield "".join(chunk).encode("utf-8")
+    except Exception as e:
+        # Status line is already sent; report the failure in-band
+        error = f"Query execution failed: {str(e)}"
+        if ndjson:
+            yield (_dumps({"error": error}) + "\n").encode("utf-8")
+        else:
+            yield ('],"success":false,"error":' + _dumps(error) + "}").encode("utf-8")
+        return
+    
+    if not ndjson:
+        trailer = {"count": count, "sql": sql, "params": params}
+        yield ("]," + _dumps(trailer)[1:]).encode("utf-8")
+
+
+def arrow_available():
+    """Return True if pyarrow is installed (it's only needed for Arrow output)."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def _arrow_field(pa, name, type_code):
+    """
+    Choose an Arrow type for a column from the Postgres type the cursor reports.
+    
+    JSON / JSONB become JSON text tagged with field metadata, and arrays
+    become lists. NUMERIC is sent as its exact decimal text, also tagged:
+    the driver doesn't report a declared precision, and the NUMERIC values
+    queries return here (averages, casts, subquery sums) have none, so any
+    fixed Arrow decimal would round or overflow some of them.
+    """
+    kind = _ARROW_TYPES.get(type_code)
+    if kind == "json":
+        return pa.field(name, pa.string(), metadata=_JSON_METADATA)
+    if kind == "numeric":
+        return pa.field(name, pa.string(), metadata=_NUMERIC_METADATA)
+    if kind == "text[]":
+        return pa.field(name, pa.list_(pa.string()))
+    if kind == "int[]":
+        return pa.field(name, pa.list_(pa.int64()))
+    if kind == "timestamp":
+        return pa.field(name, pa.timestamp("us"))
+    if kind == "timestamptz":
+        return pa.field(name, pa.timestamp("us", tz="UTC"))
+    if kind == "date":
+        return pa.field(name, pa.date32())
+    if kind == "time":
+        return pa.field(name, pa.time64("us"))
+    if kind:
+        return pa.field(name, getattr(pa, kind)())
+    return pa.field(name, pa.string())
+
+def _arrow_column(pa, field, values):
+    """Convert one column of Python values to an Arrow array of the field's type."""
+    metadata = field.metadata or {}
+    if metadata.get(b"content_type") == b"application/json":
+        values = [None if v is None else _dumps(v) for v in values]
+    elif metadata.get(b"pg_type") == b"numeric":
+        # Positional notation, as Postgres prints it (str() would give 1E+3)
+        values = [None if v is None else format(v, "f") for v in values]
+    elif pa.types.is_string(field.type):
+        values = [v if v is None or isinstance(v, str) else str(v) for v in values]
+    elif pa.types.is_list(field.type) and pa.types.is_string(field.type.value_type):
+        values = [None if v is None else [None if item is None else str(item) for item in v] for v in values]
+    return pa.array(values, type=field.type)
+
+async def stream_query_arrow(statement, params, batch_size=500, sessions=AsyncSessionLocal):
+    """
+    Execute a statement and yield an Arrow IPC stream, one record batch per
+    cursor partition.
+    
+    Row tuples are transposed straight into columns, so no per-row dicts are
+    built. The schema comes from the column types in the cursor description,
+    so it doesn't depend on which values the first batch happens to hold.
+    
+    Args:
+        statement: Compiled SQL statement
+        params (dict): Bind parameters
+        batch_size (int): Rows per cursor round trip and per record batch
+        sessions: Session factory of the engine to read from
+        
+    Yields:
+        bytes: Chunks of the Arrow IPC stream
+    """
+    import pyarrow as pa
+    
+    sink = io.BytesIO()
+    
+    def drain():
+        data = sink.getvalue()
+        sink.seek(0)
+        sink.truncate()
+        return data
+    
+    async with sessions() as session:
+        result = await session.stream(
+            statement.execution_options(yield_per=batch_size), params
+        )
+        # DB-API description: (name, type_code, ...); asyncpg's type_code is the OID
+        description = result._real_result.cursor.description
+        schema = pa.schema([_arrow_field(pa, column[0], column[1]) for column in description])
+        writer = pa.ipc.new_stream(sink, schema)
+        async for partition in result.partitions(batch_size):
+            columns = list(zip(*partition)) or [()] * len(schema)
+            arrays = [_arrow_column(pa, field, list(column)) for field, column in zip(schema, columns)]
+            writer.write_batch(pa.record_batch(arrays, schema=schema))
+            yield drain()
+    
+    writer.close()
+    yield drain()
@@ -0,0 +1,90 @@
+"""
+Payload size and decode time: JSON vs Arrow IPC responses from POST /query.
+
+Requests the same payload in both formats and reports bytes on the wire
+and client-side decode time (json.loads vs reading the Arrow stream into
+a table).
+
+Usage:
+    python benchmarks/arrow_vs_json.py --url http://localhost:8001/query --runs 5
+
+Requires httpx and pyarrow (pip install httpx pyarrow).
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+import httpx
+import pyarrow as pa
+
+ARROW_STREAM_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+DEFAULT_PAYLOAD = {
+    "select": ["o.order_id", "o.status", "o.items", "o.tags", "o.due_date",
+               "o.last_updated", "o.action_json", "c.customer_name"],
+    "stream": True,
+}
+
+def measure(client, url, payload, accept, decode, runs):
+    """
+    Fetch and decode a response several times.
+    
+    Returns:
+        dict: Response size and median fetch/decode times in milliseconds
+    """
+    sizes, fetch_ms, decode_ms, rows = [], [], [], 0
+    for _ in range(runs):
+        start = time.perf_counter()
+        response = client.post(url, json=payload, headers={"Accept": accept})
+        response.raise_for_status()
+        body = response.content
+        fetched = time.perf_counter()
+        rows = decode(body)
+        decoded = time.perf_counter()
+        sizes.append(len(body))
+        fetch_ms.append((fetched - start) * 1000)
+        decode_ms.append((decoded - fetched) * 1000)
+    return {
+        "rows": rows,
+        "bytes": sizes[-1],
+        "fetch_ms": round(statistics.median(fetch_ms), 2),
+        "decode_ms": round(statistics.median(decode_ms), 2),
+    }
+
+def decode_json(body):
+    return len(json.loads(body)["data"])
+
+def decode_arrow(body):
+    return pa.ipc.open_stream(body).read_all().num_rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON and Arrow /query responses")
+    parser.add_argument("--url", default="http://localhost:8000/query")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--payload", help="Path to a JSON QueryPayload file")
+    args = parser.parse_args()
+
+    payload = DEFAULT_PAYLOAD
+    if args.payload:
+        with open(args.payload, encoding="utf-8") as f:
+            payload = json.load(f)
+
+    with httpx.Client(timeout=300) as client:
+        results = {
+            "json": measure(client, args.url, payload, "application/json", decode_json, args.runs),
+            "arrow": measure(client, args.url, payload, ARROW_STREAM_MEDIA_TYPE, decode_arrow, args.runs),
+        }
+
+    for name, result in results.items():
+        print(f"{name:<6} rows={result['rows']:<8} bytes={result['bytes']:<12} "
+              f"fetch={result['fetch_ms']}ms decode={result['decode_ms']}ms")
+    json_result, arrow_result = results["json"], results["arrow"]
+    if arrow_result["bytes"] and arrow_result["decode_ms"]:
+        print(f"size ratio json/arrow: {json_result['bytes'] / arrow_result['bytes']:.2f}x, "
+              f"decode speedup: {json_result['decode_ms'] / arrow_result['decode_ms']:.2f}x")
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
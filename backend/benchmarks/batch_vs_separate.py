@@ -0,0 +1,110 @@
+"""
+Dashboard load: separate POST /query calls versus one POST /query/batch.
+
+The dashboard needs the order table, status counts and tag counts at once.
+This times, over --rounds rounds:
+- sequential: one /query call after another
+- concurrent: all /query calls at once (what a browser does)
+- batch: one /query/batch, queries run one after another on one connection
+- batch_parallel: one /query/batch with parallel=true
+- batch_snapshot / batch_parallel_snapshot: the same in one consistent
+  read-only snapshot
+
+Start the backend with RESULT_CACHE_ENABLED=false to time the database
+work rather than result cache hits (snapshot batches bypass the cache
+either way).
+
+Usage:
+    python benchmarks/batch_vs_separate.py --url http://localhost:8000 --rounds 50 --output batch.json
+
+Requires httpx (pip install httpx).
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+import httpx
+
+DASHBOARD_QUERIES = [
+    {
+        "select": ["o.order_id", "o.status", "c.customer_name", "o.due_date", "o.tags", "o.items"],
+        "order_by": ["o.last_updated DESC"],
+        "limit": 100,
+    },
+    {"select": ["o.status", "COUNT(*) as count"], "group_by": ["o.status"]},
+    {"select": ["unnest(o.tags) as tag", "COUNT(*) as count"], "group_by": ["unnest(o.tags)"], "limit": 1000},
+    {
+        "select": ["c.customer_name", "COUNT(*) as count"],
+        "where": ["o.status = 'Pending'"],
+        "group_by": ["c.customer_name"],
+    },
+]
+
+async def sequential(client, url):
+    for query in DASHBOARD_QUERIES:
+        (await client.post(f"{url}/query", json=query)).raise_for_status()
+
+async def concurrent(client, url):
+    responses = await asyncio.gather(*(client.post(f"{url}/query", json=query) for query in DASHBOARD_QUERIES))
+    for response in responses:
+        response.raise_for_status()
+
+def batch(**options):
+    async def run(client, url):
+        response = await client.post(f"{url}/query/batch", json={"queries": DASHBOARD_QUERIES, **options})
+        response.raise_for_status()
+        if not response.json()["success"]:
+            raise RuntimeError(response.json())
+    return run
+
+MODES = {
+    "sequential": sequential,
+    "concurrent": concurrent,
+    "batch": batch(),
+    "batch_parallel": batch(parallel=True),
+    "batch_snapshot": batch(snapshot=True),
+    "batch_parallel_snapshot": batch(parallel=True, snapshot=True),
+}
+
+def percentile(samples, pct):
+    """Nearest-rank percentile; 0.0 for an empty list."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default="http://localhost:8000", help="Backend base URL")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    report = {}
+    async with httpx.AsyncClient(timeout=60) as client:
+        for name, run in MODES.items():
+            await run(client, args.url)  # Warm up connections and statement caches
+            samples = []
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                await run(client, args.url)
+                samples.append((time.perf_counter() - start) * 1000)
+            report[name] = {
+                "mean_ms": round(statistics.mean(samples), 2),
+                "p50_ms": round(percentile(samples, 50), 2),
+                "p95_ms": round(percentile(samples, 95), 2),
+            }
+            print(f"{name:<24} mean {report[name]['mean_ms']:>8.2f} ms  "
+                  f"p50 {report[name]['p50_ms']:>8.2f} ms  p95 {report[name]['p95_ms']:>8.2f} ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump({"queries": DASHBOARD_QUERIES, "rounds": args.rounds, "results": report}, file, indent=2)
+        print(f"Report written to {args.output}")
+
+if __name__ == "__main__":
+    asyncio.run(main())
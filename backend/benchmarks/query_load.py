@@ -0,0 +1,144 @@
+"""
+Load benchmark for the POST /query endpoint.
+
+Fires a payload at the backend from N concurrent clients and reports
+requests per second and latency percentiles for each concurrency level.
+
+Each request adds a filter that matches every order but never repeats
+(``o.order_id <> 'bench-...'``), so no request is a result cache hit and
+the numbers measure the database path: same statement shape, new bind
+value. ``--same-payload`` sends the payload unchanged, which measures the
+result cache instead. Running the backend with RESULT_CACHE_ENABLED=false
+also keeps the cache out.
+
+Usage:
+    python benchmarks/query_load.py --url http://localhost:8001/query \
+        --concurrency 50,200,1000 --requests 5000
+
+Requires httpx (pip install httpx).
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+import httpx
+
+DEFAULT_PAYLOAD = {
+    "select": ["o.order_id", "o.status", "c.customer_name", "o.due_date"],
+    "where": ["o.status = 'Pending'"],
+    "order_by": ["o.last_updated DESC"],
+    "limit": 50,
+}
+
+def percentile(samples, pct):
+    """
+    Return the pct-th percentile of a list of samples (nearest rank).
+
+    Args:
+        samples (list): Numeric samples
+        pct (float): Percentile between 0 and 100
+
+    Returns:
+        float: The percentile value, or 0.0 for an empty list
+    """
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[rank]
+
+def distinct_payloads(payload):
+    """
+    Yield copies of a payload that differ in a filter matching every order.
+
+    The run's start time is part of the value, so reruns against the same
+    backend don't hit entries cached by earlier runs either.
+    """
+    run = int(time.time())
+    for n in itertools.count():
+        yield {**payload, "where": [*payload.get("where", []), f"o.order_id <> 'bench-{run}-{n}'"]}
+
+async def run_level(url, payloads, concurrency, total_requests):
+    """
+    Run one benchmark level with a fixed number of concurrent clients.
+    
+    Args:
+        url (str): /query endpoint
+        payloads (iterator): Payload for each request, in order
+        concurrency (int): Concurrent clients
+        total_requests (int): Requests to send
+
+    Returns:
+        dict: Throughput, latency percentiles and error count
+    """
+    latencies = []
+    errors = 0
+    remaining = total_requests
+    lock = asyncio.Lock()
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+
+        async def worker():
+            nonlocal remaining, errors
+            while True:
+                async with lock:
+                    if remaining <= 0:
+                        return
+                    remaining -= 1
+                    payload = next(payloads)
+                start = time.perf_counter()
+                try:
+                    response = await client.post(url, json=payload)
+                    response.raise_for_status()
+                    latencies.append(time.perf_counter() - start)
+                except httpx.HTTPError:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "concurrency": concurrency,
+        "requests": total_requests,
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+async def main():
+    parser = argparse.ArgumentParser(description="Benchmark POST /query throughput")
+    parser.add_argument("--url", default="http://localhost:8000/query")
+    parser.add_argument("--concurrency", default="50,200,1000",
+                        help="Comma-separated client counts")
+    parser.add_argument("--requests", type=int, default=5000,
+                        help="Requests per concurrency level")
+    parser.add_argument("--payload", help="Path to a JSON QueryPayload file")
+    parser.add_argument("--label", default="", help="Tag stored with the results")
+    parser.add_argument("--same-payload", action="store_true",
+                        help="Send the payload unchanged (measures result cache hits)")
+    args = parser.parse_args()
+
+    payload = DEFAULT_PAYLOAD
+    if args.payload:
+        with open(args.payload, encoding="utf-8") as f:
+            payload = json.load(f)
+
+    results = []
+    for level in (int(c) for c in args.concurrency.split(",")):
+        payloads = itertools.repeat(payload) if args.same_payload else distinct_payloads(payload)
+        result = await run_level(args.url, payloads, level, args.requests)
+        result["label"] = args.label
+        results.append(result)
+        print(f"{args.label or 'run'} c={level:<5} rps={result['rps']:<8} "
+              f"p50={result['p50_ms']}ms p99={result['p99_ms']}ms errors={result['errors']}")
+
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(main())
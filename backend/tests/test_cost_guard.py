@@ -0,0 +1,24 @@
+from app.cost_guard import CostGuard
+from app.query_builder import QueryBuilder
+
+
+def test_needs_default_limit_only_for_unbounded_row_listings():
+    guard = CostGuard(default_limit=1000)
+    assert guard.needs_default_limit(QueryBuilder().select(["o.order_id"]))
+    assert not guard.needs_default_limit(QueryBuilder().select(["o.order_id"]).limit(10))
+    assert not guard.needs_default_limit(QueryBuilder().select(["COUNT(*) AS n"]))
+    assert not CostGuard(default_limit=None).needs_default_limit(QueryBuilder().select(["o.order_id"]))
+
+
+def test_needs_default_limit_does_not_count():
+    guard = CostGuard(default_limit=1000)
+    query_builder = QueryBuilder().select(["o.order_id"])
+    guard.needs_default_limit(query_builder)
+    guard.needs_default_limit(query_builder)
+    assert guard.default_limited == 0
+
+
+def test_thresholds_disabled_by_default():
+    guard = CostGuard()
+    assert guard.reject_cost is None and guard.downgrade_cost is None
+    assert not guard.estimating
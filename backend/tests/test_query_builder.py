@@ -0,0 +1,131 @@
+import asyncio
+import os
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from app.query_builder import QueryBuilder
+
+
+def where_params(condition):
+    _, params = QueryBuilder().select(["o.order_id"]).where([condition]).build_parameterized()
+    return params
+
+
+@pytest.mark.parametrize("condition, expected", [
+    ("o.due_date >= '2024-01-01'", date(2024, 1, 1)),
+    ("o.due_date = '2024-01-01 12:00'", date(2024, 1, 1)),
+    ("o.created_at > '2024-01-01'", datetime(2024, 1, 1)),
+    ("o.last_updated <= '2024-01-01T10:30:00'", datetime(2024, 1, 1, 10, 30)),
+    ("'2024-01-01' < o.last_updated", datetime(2024, 1, 1)),
+    ("o.action_json->>'shipped' > '2024-01-01'", date(2024, 1, 1)),
+    ("action_event_date(o.action_json, 'shipped') = '2024-01-01'", date(2024, 1, 1)),
+    ("date_trunc('day', o.created_at) = '2024-01-01'", datetime(2024, 1, 1)),
+    ("o.due_date > '2024-01-01' AND o.status = 'x'", date(2024, 1, 1)),
+])
+def test_iso_strings_bound_as_dates_in_date_contexts(condition, expected):
+    assert where_params(condition)["p0"] == expected
+    assert type(where_params(condition)["p0"]) is type(expected)
+
+
+def test_between_and_in_lists_are_typed():
+    assert where_params("o.created_at BETWEEN '2024-01-01' AND '2024-02-01 10:30'") == {
+        "p0": datetime(2024, 1, 1), "p1": datetime(2024, 2, 1, 10, 30),
+    }
+    assert where_params("o.due_date IN ('2024-01-01', '2024-01-02')") == {
+        "p0": date(2024, 1, 1), "p1": date(2024, 1, 2),
+    }
+
+
+@pytest.mark.parametrize("condition", [
+    "o.action_json->>'x' = '2024-01-01'",
+    "to_char(o.due_date, 'YYYY-MM-DD') = '2024-01-01'",
+    "o.status = '2024-01-01'",
+    "c.customer_name IN ('2024-01-01')",
+    "o.due_date = 'tomorrow'",
+])
+def test_strings_stay_text_in_other_contexts(condition):
+    assert isinstance(where_params(condition)["p0"], str)
+
+
+@pytest.mark.parametrize("literal, expected", [
+    ("{a,b}", ["a", "b"]),
+    ('{a,"b c","d,e"}', ["a", "b c", "d,e"]),
+    ('{"x\\"y"}', ['x"y']),
+    ("{a,NULL}", ["a", None]),
+    ("{}", []),
+])
+def test_array_literals_bound_as_lists_for_tags(literal, expected):
+    assert where_params(f"o.tags @> '{literal}'") == {"p0": expected}
+
+
+def test_any_on_tags_binds_the_element():
+    assert where_params("'urgent' = ANY(o.tags)") == {"p0": "urgent"}
+
+
+def test_inline_build_keeps_literals():
+    sql = QueryBuilder().select(["o.order_id"]).where(["o.due_date >= '2024-01-01'"]).build()
+    assert sql.endswith("WHERE o.due_date >= '2024-01-01';")
+
+
+@pytest.mark.parametrize("condition, expected", [
+    ("o.items > '5'", {"p0": 5}),
+    ("o.customer_id = '3'", {"p0": 3}),
+    ("o.customer_id IN ('1', '2')", {"p0": 1, "p1": 2}),
+    ("o.items BETWEEN '1' AND '100'", {"p0": 1, "p1": 100}),
+    ("array_length(o.tags, 1) > '1'", {"p0": 1, "p1": 1}),
+    ("o.customer_id IN (SELECT customer_id FROM customers WHERE customer_id = '1')", {"p0": 1}),
+    ("EXISTS (SELECT 1 FROM order_items WHERE order_id = o.order_id AND price > '5.5')", {"p0": Decimal("5.5")}),
+    ("o.order_id = '1000'", {"p0": "1000"}),  # VARCHAR
+    ("o.items > 'many'", {"p0": "many"}),      # Left for Postgres to reject
+])
+def test_numeric_strings_bound_as_numbers_in_numeric_contexts(condition, expected):
+    assert where_params(condition) == expected
+
+
+@pytest.mark.parametrize("condition, sql, params", [
+    ("o.due_date > CURRENT_DATE + 7", "o.due_date > CURRENT_DATE + 7", {}),
+    ("o.due_date < CURRENT_DATE - 7", "o.due_date < CURRENT_DATE - 7", {}),
+    ("o.items * 2 > 10", "o.items * 2 > :p0", {"p0": 10}),
+    ("o.items > -5", "o.items > -5", {}),
+])
+def test_arithmetic_constants_stay_inline(condition, sql, params):
+    built, built_params = QueryBuilder().select(["o.order_id"]).where([condition]).build_parameterized()
+    assert built.endswith(f"WHERE {sql};")
+    assert built_params == params
+
+
+# Shapes whose placeholders Postgres types from their context; asyncpg then
+# rejects a bound value of the wrong Python type
+DATABASE_SHAPES = [
+    "o.items > '5'",
+    "o.customer_id = '3'",
+    "o.customer_id IN ('1', '2')",
+    "o.due_date > CURRENT_DATE + 7",
+    "o.due_date < CURRENT_DATE - 7",
+    "o.items > -5",
+    "o.due_date >= '2024-01-01'",
+    "o.created_at BETWEEN '2024-01-01' AND '2024-02-01 10:30'",
+    "o.action_json->>'x' = '2024-01-01'",
+    "o.tags && '{urgent,logo}'",
+    "EXISTS (SELECT 1 FROM order_items WHERE order_id = o.order_id AND quantity > '2')",
+]
+
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL not set")
+def test_parameterized_shapes_run_on_asyncpg():
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    async def run():
+        engine = create_async_engine(os.environ["TEST_DATABASE_URL"])
+        try:
+            async with engine.connect() as connection:
+                for condition in DATABASE_SHAPES:
+                    sql, params = QueryBuilder().select(["COUNT(*) AS n"]).where([condition]).build_parameterized()
+                    await connection.execute(text(sql), params)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
@@ -0,0 +1,48 @@
+import asyncio
+import json
+
+from app.replicas import ReadTarget, ReplicaRouter
+
+
+class _Pool:
+    def checkedout(self):
+        return 0
+
+
+class _Engine:
+    """Just enough of an AsyncEngine for routing and stats."""
+
+    def __init__(self):
+        self.pool = _Pool()
+        self.sync_engine = self
+
+
+def router_with_lag(lag):
+    router = ReplicaRouter(ReadTarget("primary", _Engine(), None), [ReadTarget("replica1", _Engine(), None)],
+                           max_lag=5.0)
+
+    async def read_lag(target):
+        return lag
+
+    router._read_lag = read_lag
+    asyncio.run(router.check_all())
+    return router
+
+
+def test_lagging_replica_is_skipped():
+    router = router_with_lag(12.5)
+    assert router.pick() is router.primary
+    assert router.stats()["targets"][1]["lag_seconds"] == 12.5
+
+
+def test_unknown_lag_is_reported_as_null():
+    router = router_with_lag(float("inf"))
+    assert router.pick() is router.primary
+    stats = router.stats()
+    assert stats["targets"][1]["lag_seconds"] is None
+    json.dumps(stats, allow_nan=False)  # As Starlette's JSONResponse renders it
+
+
+def test_caught_up_replica_takes_reads():
+    router = router_with_lag(0)
+    assert router.pick() is router.replicas[0]
@@ -0,0 +1,67 @@
+import asyncio
+
+from app.query_builder import QueryBuilder
+from app.result_cache import ResultCache, canonical_key, listen_for_table_changes
+
+
+def test_canonical_key_sorts_where_only():
+    a = canonical_key({"select": ["o.status", "o.items"], "where": ["b = 1", "a = 2"], "limit": None})
+    b = canonical_key({"select": ["o.status", "o.items"], "where": ["a = 2", "b = 1"]})
+    assert a == b
+    assert a != canonical_key({"select": ["o.items", "o.status"], "where": ["a = 2", "b = 1"]})
+
+
+def test_canonical_key_keeps_whitespace_inside_literals():
+    spaced = QueryBuilder().select(["*"]).where(["c.customer_name = 'A  B'"]).fragments()
+    single = QueryBuilder().select(["*"]).where(["c.customer_name   =  'A B'"]).fragments()
+    assert canonical_key(spaced) != canonical_key(single)
+    assert canonical_key(single) == canonical_key(
+        QueryBuilder().select(["*"]).where(["customer_name='A B'"]).fragments()
+    )
+
+
+def test_write_bumps_version_and_invalidates():
+    cache = ResultCache()
+    cache.put("k", {"rows": 1}, cache.snapshot())
+    assert cache.get("k")[0] == {"rows": 1}
+    cache.bump("orders")
+    assert cache.get("k") is None
+
+
+def test_put_with_stale_versions_is_ignored():
+    cache = ResultCache()
+    versions = cache.snapshot()
+    cache.bump("customers")
+    cache.put("k", {"rows": 1}, versions)
+    assert cache.get("k") is None
+
+
+def test_nothing_served_or_stored_while_not_listening():
+    cache = ResultCache()
+    cache.put("k", {"rows": 1}, cache.snapshot())
+    cache.listening = False
+    assert cache.get("k") is None
+    cache.put("other", {"rows": 2}, cache.snapshot())
+    cache.listening = True
+    assert cache.get("other") is None
+
+
+def test_listener_that_cannot_connect_stops_serving():
+    cache = ResultCache()
+    cache.put("k", {"rows": 1}, cache.snapshot())
+
+    async def run():
+        task = asyncio.create_task(
+            listen_for_table_changes(cache, "postgresql://nobody@/x?host=/nonexistent", retry_seconds=60)
+        )
+        await asyncio.sleep(0.2)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    assert not cache.listening
+    cache.listening = True
+    assert cache.get("k") is None  # Versions were bumped across the gap
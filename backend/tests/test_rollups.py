@@ -0,0 +1,117 @@
+import asyncio
+from datetime import date
+
+import pytest
+
+from app.rollups import RollupRouter, rollup_query
+
+STATUS_COUNTS = (["o.status", "COUNT(*) AS count"], ["o.status"])
+
+
+def route(select, group_by, where=None, order_by=None, limit=None):
+    return rollup_query(select, where, group_by, order_by, limit)
+
+
+def test_routes_grouped_count():
+    sql, params = route(*STATUS_COUNTS)
+    assert "FROM order_count_rollup r" in sql
+    assert "r.dimension = 'status'" in sql
+    assert params == {}
+
+
+@pytest.mark.parametrize("condition, expected", [
+    ("o.status = 'Pending'", "NULLIF(r.value, '') = :p0"),
+    ("status <> 'Pending'", "NULLIF(r.value, '') <> :p0"),
+    ("o.status IN ('Pending', 'Shipped')", "NULLIF(r.value, '') IN (:p0, :p1)"),
+    ("o.status NOT IN ('Pending')", "NULLIF(r.value, '') NOT IN (:p0)"),
+])
+def test_routes_filter_on_grouped_column(condition, expected):
+    sql, params = route(*STATUS_COUNTS, where=[condition])
+    assert f"r.dimension = 'status' AND {expected} GROUP BY" in sql
+    assert "Pending" in params.values()
+
+
+def test_routes_due_date_range_with_date_params():
+    sql, params = route(["o.due_date", "COUNT(*) AS n"], ["o.due_date"],
+                        where=["o.due_date >= '2024-01-01'", "o.due_date < '2024-02-01'"])
+    assert "NULLIF(r.value, '')::date >= :p0 AND NULLIF(r.value, '')::date < :p1" in sql
+    assert params == {"p0": date(2024, 1, 1), "p1": date(2024, 2, 1)}
+
+
+def test_routes_order_and_limit():
+    sql, params = route(["c.customer_name", "COUNT(*) AS n"], ["c.customer_name"],
+                        where=["c.customer_name = 'Etsy'"], order_by=["n DESC"], limit=5)
+    assert sql.endswith('ORDER BY "n" DESC LIMIT :limit;')
+    assert params == {"p0": "Etsy", "limit": 5}
+
+
+@pytest.mark.parametrize("condition", [
+    "o.status = 'Pending' AND o.items > 100",   # Compound: other column
+    "o.status = 'Pending' OR o.status = 'Shipped'",  # OR would drop the dimension filter
+    "NOT o.status = 'Pending'",
+    "o.items > 100",                           # Another column
+    "lower(o.status) = 'pending'",             # Function of the column
+    "'Pending' = o.status",                    # Column on the right
+    "o.status = 5",                            # Not a string constant
+    "o.status IS NULL",
+    "o.status LIKE 'P%'",                      # Operator not allowed
+    "o.status IN (SELECT status FROM orders WHERE items > 1)",
+    "o.status = 'Pending' -- comment",         # Invalid fragment
+])
+def test_falls_back_for_other_filters(condition):
+    assert route(*STATUS_COUNTS, where=[condition]) is None
+
+
+@pytest.mark.parametrize("condition", [
+    "o.due_date >= CURRENT_DATE",
+    "o.due_date = 'soon'",
+    "o.due_date > '2024-01-01' AND o.items > 1",
+])
+def test_falls_back_for_non_constant_dates(condition):
+    assert route(["o.due_date", "COUNT(*) AS n"], ["o.due_date"], where=[condition]) is None
+
+
+def test_falls_back_for_range_on_text_dimension():
+    assert route(*STATUS_COUNTS, where=["o.status > 'A'"]) is None
+
+
+@pytest.mark.parametrize("select, group_by", [
+    (["o.status", "SUM(o.items) AS n"], ["o.status"]),
+    (["o.status", "o.order_type", "COUNT(*) AS n"], ["o.status", "o.order_type"]),
+    (["o.items", "COUNT(*) AS n"], ["o.items"]),
+])
+def test_falls_back_for_other_shapes(select, group_by):
+    assert route(select, group_by) is None
+
+
+class _Payload:
+    select = STATUS_COUNTS[0]
+    group_by = STATUS_COUNTS[1]
+    where = None
+    order_by = None
+    limit = None
+
+
+def test_missing_table_is_rechecked_after_ttl(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr("app.rollups.time.monotonic", lambda: clock[0])
+    router = RollupRouter(recheck_seconds=60)
+    answers = [False, True]
+    checks = []
+
+    async def check_table(db):
+        checks.append(clock[0])
+        return answers[len(checks) - 1]
+
+    router._check_table = check_table
+    route = lambda: asyncio.run(router.route(None, _Payload()))
+
+    assert route() is None            # Migration not applied yet
+    clock[0] += 30
+    assert route() is None            # Within the TTL: not checked again
+    clock[0] += 31
+    assert route() is not None        # Applied meanwhile
+    clock[0] += 1000
+    assert route() is not None        # A found table is not checked again
+    assert checks == [100.0, 161.0]
+    assert router.table_ready
@@ -0,0 +1,110 @@
+import pytest
+
+from app.sql_fragments import (
+    Binary, Column, Func, In, Literal, Subquery, parse_condition, parse_order_item, parse_select_item,
+)
+
+
+def render(node):
+    """Parameterized SQL of a node and the values it binds."""
+    params = {}
+
+    def bind(value):
+        name = f"p{len(params)}"
+        params[name] = value
+        return f":{name}"
+
+    return node.sql(bind), params
+
+
+@pytest.mark.parametrize("fragment, canonical, sql, params", [
+    ("status='Pending'", "o.status = 'Pending'", "o.status = :p0", {"p0": "Pending"}),
+    ("o.status = 'it''s'", "o.status = 'it''s'", "o.status = :p0", {"p0": "it's"}),
+    ("o.items > 100", "o.items > 100", "o.items > :p0", {"p0": 100}),
+    ("o.items BETWEEN 1 AND 5", "o.items BETWEEN 1 AND 5", "o.items BETWEEN :p0 AND :p1", {"p0": 1, "p1": 5}),
+    ("o.tags IS NULL", "o.tags IS NULL", "o.tags IS NULL", {}),
+])
+def test_literals(fragment, canonical, sql, params):
+    node = parse_condition(fragment)
+    assert node.sql() == canonical
+    assert render(node) == (sql, params)
+
+
+def test_typed_literals_stay_inline():
+    node = parse_condition("o.due_date > CURRENT_DATE - INTERVAL '7 days'")
+    assert render(node) == ("o.due_date > CURRENT_DATE - INTERVAL '7 days'", {})
+
+
+def test_any():
+    node = parse_condition("'urgent' = ANY(o.tags)")
+    assert node == Binary("=", Literal("string", "urgent"), Func("any", (Column("o", "tags"),)))
+    assert render(node) == (":p0 = ANY(o.tags)", {"p0": "urgent"})
+
+
+def test_json_lookup_key_stays_inline():
+    node = parse_condition("o.action_json->>'shipped' > '2024-01-01'")
+    assert node.left == Binary("->>", Column("o", "action_json"), Literal("string", "shipped"))
+    assert render(node) == ("o.action_json->>'shipped' > :p0", {"p0": "2024-01-01"})
+
+
+def test_event_name_stays_inline():
+    node = parse_condition("action_event_date(o.action_json, 'shipped') >= '2024-01-01'")
+    assert render(node) == ("action_event_date(o.action_json, 'shipped') >= :p0", {"p0": "2024-01-01"})
+
+
+@pytest.mark.parametrize("fragment, sql", [
+    ("o.status IN ('A','B')", "o.status IN (:p0, :p1)"),
+    ("o.status not in ('A')", "o.status NOT IN (:p0)"),
+])
+def test_in_lists(fragment, sql):
+    node = parse_condition(fragment)
+    assert isinstance(node, In)
+    assert render(node)[0] == sql
+
+
+def test_nesting_keeps_precedence():
+    node = parse_condition("o.items > 100 AND (o.status = 'A' OR c.customer_name LIKE 'x%')")
+    assert node.op == "AND" and node.right.op == "OR"
+    assert render(node) == (
+        "o.items > :p0 AND (o.status = :p1 OR c.customer_name LIKE :p2)",
+        {"p0": 100, "p1": "A", "p2": "x%"},
+    )
+
+
+def test_subquery():
+    node = parse_condition(
+        "o.customer_id IN (SELECT customer_id FROM customers WHERE customer_name = 'Etsy')"
+    )
+    assert isinstance(node.items, Subquery)
+    assert render(node) == (
+        "o.customer_id IN (SELECT customer_id FROM customers WHERE customer_name = :p0)",
+        {"p0": "Etsy"},
+    )
+
+
+def test_unqualified_columns_resolve_to_their_table():
+    assert parse_condition("customer_name = 'Etsy'").left == Column("c", "customer_name")
+    assert parse_condition("customer_id = 1").left == Column("o", "customer_id")
+
+
+def test_select_and_order_items():
+    item = parse_select_item("count(*) as n")
+    assert item.sql() == "count(*) AS n"
+    assert parse_order_item("o.created_at desc").sql() == "o.created_at DESC"
+
+
+@pytest.mark.parametrize("fragment", [
+    "",
+    "status = 'x'; DROP TABLE orders",
+    "o.status = 'x' -- comment",
+    "o.status /* comment */ = 'x'",
+    "o.status = 'x",
+    "foo = 1",
+    "x.status = 1",
+    "pg_sleep(1) = 1",
+    "COUNT(*) > 1",
+    "o.status = 'a' UNION SELECT 1",
+])
+def test_rejected_input(fragment):
+    with pytest.raises(ValueError, match="Invalid WHERE item"):
+        parse_condition(fragment)
@@ -0,0 +1,56 @@
+import asyncio
+import os
+from decimal import Decimal
+
+import pytest
+
+pa = pytest.importorskip("pyarrow")
+
+from app.streaming import _arrow_column, _arrow_field, stream_query_arrow
+
+
+def test_field_types_come_from_the_column_type():
+    assert _arrow_field(pa, "due_date", 1082).type == pa.date32()
+    assert _arrow_field(pa, "items", 23).type == pa.int32()
+    assert _arrow_field(pa, "tags", 1009).type == pa.list_(pa.string())
+    assert _arrow_field(pa, "action_json", 3802).metadata == {b"content_type": b"application/json"}
+    assert _arrow_field(pa, "anything", 2950).type == pa.string()
+
+
+def test_numeric_sent_as_exact_decimal_text():
+    field = _arrow_field(pa, "avg", 1700)
+    values = [Decimal("3.5000000000000000"), Decimal("123456789012345678901234567890.12"), Decimal("1E+3"), None]
+    assert _arrow_column(pa, field, values).to_pylist() == [
+        "3.5000000000000000", "123456789012345678901234567890.12", "1000", None,
+    ]
+
+
+def test_all_null_column_keeps_its_type():
+    field = _arrow_field(pa, "due_date", 1082)
+    assert _arrow_column(pa, field, [None, None]).type == pa.date32()
+
+
+@pytest.mark.skipif(not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL not set")
+def test_schema_does_not_depend_on_the_first_batch():
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    statement = text(
+        "SELECT CASE WHEN n > 2 THEN DATE '2024-01-01' END AS shipped, n::numeric / 3 AS third "
+        "FROM generate_series(1, 4) AS n ORDER BY n"
+    )
+
+    async def run():
+        engine = create_async_engine(os.environ["TEST_DATABASE_URL"])
+        try:
+            chunks = [chunk async for chunk in stream_query_arrow(
+                statement, {}, batch_size=2, sessions=async_sessionmaker(engine),
+            )]
+        finally:
+            await engine.dispose()
+        return pa.ipc.open_stream(b"".join(chunks)).read_all()
+
+    table = asyncio.run(run())
+    assert table.schema.field("shipped").type == pa.date32()
+    assert table.column("shipped").to_pylist()[2].isoformat() == "2024-01-01"
+    assert table.column("third").to_pylist()[0] == "0.33333333333333333333"
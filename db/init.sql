@@ -157,4 +157,86 @@ $$ language 'plpgsql';
 CREATE TRIGGER update_orders_last_updated 
     BEFORE UPDATE ON orders 
     FOR EACH ROW 
-    EXECUTE FUNCTION update_last_updated_column();
\ No newline at end of file
+    EXECUTE FUNCTION update_last_updated_column();
+
+-- Row-level order deltas for the backend's live feed (/orders/live): the IDs
+-- of changed orders on channel orders_delta, at most 100 per notification to
+-- stay under the 8000-byte payload limit. Bulk statements touching more than
+-- 1000 orders, and TRUNCATE, send {"op": ..., "count": n} instead, which
+-- tells subscribers to reload.
+CREATE OR REPLACE FUNCTION notify_orders_delta()
+RETURNS TRIGGER AS $$
+DECLARE
+    ids TEXT[];
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        SELECT array_agg(order_id) INTO ids FROM new_rows;
+    ELSIF TG_OP = 'UPDATE' THEN
+        -- Old IDs too, in case an update changed the key
+        SELECT array_agg(DISTINCT order_id) INTO ids
+        FROM (SELECT order_id FROM new_rows UNION SELECT order_id FROM old_rows) changed;
+    ELSIF TG_OP = 'DELETE' THEN
+        SELECT array_agg(order_id) INTO ids FROM old_rows;
+    END IF;
+    IF TG_OP = 'TRUNCATE' OR cardinality(ids) > 1000 THEN
+        PERFORM pg_notify('orders_delta', json_build_object('op', TG_OP, 'count', cardinality(ids))::text);
+    ELSIF ids IS NOT NULL THEN
+        FOR i IN 1..cardinality(ids) BY 100 LOOP
+            PERFORM pg_notify('orders_delta', json_build_object('op', TG_OP, 'ids', ids[i:i + 99])::text);
+        END LOOP;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Transition tables allow one event per trigger
+CREATE TRIGGER notify_orders_inserted
+    AFTER INSERT ON orders
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_orders_delta();
+
+CREATE TRIGGER notify_orders_updated
+    AFTER UPDATE ON orders
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_orders_delta();
+
+CREATE TRIGGER notify_orders_deleted
+    AFTER DELETE ON orders
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_orders_delta();
+
+CREATE TRIGGER notify_orders_truncated
+    AFTER TRUNCATE ON orders
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_orders_delta();
+
+-- Date of an action_json event (e.g. 'shipped'), used by the backend's
+-- generated filters. IMMUTABLE so it can back expression indexes; see
+-- db/migrations/001_query_indexes.sql.
+CREATE OR REPLACE FUNCTION action_event_date(action jsonb, event text)
+RETURNS date AS $$
+    SELECT (action->>event)::date
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+-- Notify listeners (backend result cache) when a table is written to
+CREATE OR REPLACE FUNCTION notify_table_changed()
+RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('table_changed', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- One notification per statement, next to update_orders_last_updated
+CREATE TRIGGER notify_orders_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON orders
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_table_changed();
+
+CREATE TRIGGER notify_customers_changed
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON customers
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION notify_table_changed();
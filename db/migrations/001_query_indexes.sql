@@ -0,0 +1,37 @@
+-- Indexes for the query shapes the AI agent emits.
+--
+-- prompt_to_args steers the model towards filters on o.status, o.due_date,
+-- tag membership, action_json->>'shipped' / 'printed' date ranges and
+-- customer name subqueries, ordered by last_updated. Safe to re-run.
+
+-- Equality / range filters and the default dashboard ordering
+CREATE INDEX IF NOT EXISTS idx_orders_status ON orders (status);
+CREATE INDEX IF NOT EXISTS idx_orders_due_date ON orders (due_date);
+CREATE INDEX IF NOT EXISTS idx_orders_customer_id ON orders (customer_id);
+CREATE INDEX IF NOT EXISTS idx_orders_order_type ON orders (order_type);
+CREATE INDEX IF NOT EXISTS idx_orders_last_updated ON orders (last_updated DESC, order_id DESC);
+
+-- Customer name lookups: o.customer_id = (SELECT customer_id FROM customers WHERE customer_name = '...')
+CREATE INDEX IF NOT EXISTS idx_customers_customer_name ON customers (customer_name);
+
+-- Tag membership (o.tags @> ARRAY['urgent']) and action_json containment / key tests
+CREATE INDEX IF NOT EXISTS idx_orders_tags ON orders USING GIN (tags);
+CREATE INDEX IF NOT EXISTS idx_orders_action_json ON orders USING GIN (action_json);
+
+-- text -> date casts are only STABLE (they depend on DateStyle), so they
+-- can't be indexed directly. action_json stores ISO-8601 timestamps, which
+-- parse the same under every DateStyle, so this wrapper is safe to mark
+-- IMMUTABLE. Postgres won't inline it (the body's cast is only STABLE), so
+-- the indexes below only serve expressions written as
+-- action_event_date(action_json, ...), not raw (action_json->>'shipped')::date
+-- casts. QueryBuilder rewrites ->> date comparisons into that form.
+CREATE OR REPLACE FUNCTION action_event_date(action jsonb, event text)
+RETURNS date AS $$
+    SELECT (action->>event)::date
+$$ LANGUAGE sql IMMUTABLE PARALLEL SAFE;
+
+CREATE INDEX IF NOT EXISTS idx_orders_shipped_date ON orders (action_event_date(action_json, 'shipped'));
+CREATE INDEX IF NOT EXISTS idx_orders_printed_date ON orders (action_event_date(action_json, 'printed'));
+
+ANALYZE orders;
+ANALYZE customers;
@@ -0,0 +1,113 @@
+-- Incrementally maintained order counts for grouped COUNT (chart) queries.
+--
+-- order_count_rollup is a table kept current by statement-level triggers,
+-- so the backend can answer GROUP BY status / customer / order_type / tag /
+-- due date queries without scanning orders. Safe to re-run; re-running rebuilds the counts.
+--
+-- Earlier versions of 001 created order_count_rollup as a materialized view;
+-- drop it (and its refresh function) on databases that still have it.
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_matviews WHERE matviewname = 'order_count_rollup') THEN
+        DROP MATERIALIZED VIEW order_count_rollup;
+    END IF;
+END
+$$;
+DROP FUNCTION IF EXISTS refresh_order_count_rollup();
+
+-- value is '' for NULL so it can be part of the primary key
+CREATE TABLE IF NOT EXISTS order_count_rollup (
+    dimension VARCHAR(20) NOT NULL,
+    value TEXT NOT NULL,
+    count BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, value)
+);
+
+-- Rollup keys one order contributes to. Customers are keyed by id so
+-- renames don't invalidate counts; due dates by day so any coarser bucket
+-- can be summed from them.
+CREATE OR REPLACE FUNCTION order_rollup_keys(
+    status TEXT, customer_id INT, order_type TEXT, tags TEXT[], due_date DATE
+)
+RETURNS TABLE (dimension VARCHAR(20), value TEXT) AS $$
+    SELECT 'status'::VARCHAR(20), COALESCE(status, '')
+    UNION ALL SELECT 'customer_id', COALESCE(customer_id::TEXT, '')
+    UNION ALL SELECT 'order_type', COALESCE(order_type, '')
+    UNION ALL SELECT 'due_date', COALESCE(due_date::TEXT, '')
+    UNION ALL SELECT 'tag', COALESCE(tag, '') FROM unnest(tags) AS tag
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Apply one statement's worth of changes as +/- deltas
+CREATE OR REPLACE FUNCTION apply_order_rollup_delta()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO order_count_rollup AS r (dimension, value, count)
+        SELECT k.dimension, k.value, COUNT(*)
+        FROM new_rows n,
+             LATERAL order_rollup_keys(n.status, n.customer_id, n.order_type, n.tags, n.due_date) k
+        GROUP BY 1, 2
+        ON CONFLICT (dimension, value) DO UPDATE SET count = r.count + EXCLUDED.count;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        INSERT INTO order_count_rollup AS r (dimension, value, count)
+        SELECT k.dimension, k.value, -COUNT(*)
+        FROM old_rows o,
+             LATERAL order_rollup_keys(o.status, o.customer_id, o.order_type, o.tags, o.due_date) k
+        GROUP BY 1, 2
+        ON CONFLICT (dimension, value) DO UPDATE SET count = r.count + EXCLUDED.count;
+    END IF;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+-- Transition tables allow only one event per trigger
+DROP TRIGGER IF EXISTS order_rollup_insert ON orders;
+CREATE TRIGGER order_rollup_insert
+    AFTER INSERT ON orders
+    REFERENCING NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_order_rollup_delta();
+
+DROP TRIGGER IF EXISTS order_rollup_update ON orders;
+CREATE TRIGGER order_rollup_update
+    AFTER UPDATE ON orders
+    REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_order_rollup_delta();
+
+DROP TRIGGER IF EXISTS order_rollup_delete ON orders;
+CREATE TRIGGER order_rollup_delete
+    AFTER DELETE ON orders
+    REFERENCING OLD TABLE AS old_rows
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION apply_order_rollup_delta();
+
+-- TRUNCATE has no transition tables; just reset the counts
+CREATE OR REPLACE FUNCTION reset_order_rollup()
+RETURNS TRIGGER AS $$
+BEGIN
+    TRUNCATE order_count_rollup;
+    RETURN NULL;
+END;
+$$ language 'plpgsql';
+
+DROP TRIGGER IF EXISTS order_rollup_truncate ON orders;
+CREATE TRIGGER order_rollup_truncate
+    AFTER TRUNCATE ON orders
+    FOR EACH STATEMENT
+    EXECUTE FUNCTION reset_order_rollup();
+
+-- Backfill from the current data (under a lock so no write is missed)
+BEGIN;
+LOCK TABLE orders IN SHARE MODE;
+TRUNCATE order_count_rollup;
+INSERT INTO order_count_rollup (dimension, value, count)
+SELECT k.dimension, k.value, COUNT(*)
+FROM orders o,
+     LATERAL order_rollup_keys(o.status, o.customer_id, o.order_type, o.tags, o.due_date) k
+GROUP BY 1, 2;
+COMMIT;
+
+ANALYZE order_count_rollup;
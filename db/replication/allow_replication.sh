@@ -0,0 +1,4 @@
+#!/bin/bash
+# Let standbys on the compose network stream WAL from this server.
+# Runs once, from docker-entrypoint-initdb.d, when the primary is initialized.
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
@@ -1,10 +1,19 @@
 import React, { useState, useEffect } from 'react';
 import type { Order } from '../types';
 import { apiService } from '../services/api';
+import type { LiveOrderEvent } from '../services/api';
 import { transformBackendOrders } from '../utils';
 import './OrderPage.css';
 import OrderChart from './OrderChart';
 
+// Replace rows with the same id and put new ones first (they were just changed)
+const mergeById = <T,>(current: T[], changed: T[], id: (item: T) => string): T[] => {
+  const changedById = new Map(changed.map((item) => [id(item), item]));
+  const updated = current.map((item) => changedById.get(id(item)) ?? item);
+  const existing = new Set(current.map(id));
+  return [...changed.filter((item) => !existing.has(id(item))), ...updated];
+};
+
 interface OrderPageProps {
   queryResult?: any;
 }
@@ -29,6 +38,8 @@ const OrderPage: React.FC<OrderPageProps> = ({ queryResult }) => {
   const [displayMode, setDisplayMode] = useState<'table' | 'chart'>('table');
   const [xKey, setXKey] = useState<string>('');
   const [yKey, setYKey] = useState<string>('');
+  // True while the default order list is shown; it is then kept current by the live feed
+  const [live, setLive] = useState(false);
 
   const isSmallTalk = lastSQL.trim().toUpperCase() === 'SMALL_TALK';
 
@@ -44,6 +55,29 @@ const OrderPage: React.FC<OrderPageProps> = ({ queryResult }) => {
     loadInitialOrders();
   }, []);
 
+  // Apply live order changes instead of reloading the list
+  useEffect(() => {
+    if (!live) return;
+    let connected = false;
+    return apiService.subscribeToOrders(['*'], [], (event: LiveOrderEvent) => {
+      if (event.op === 'ready') {
+        // A reconnect may have missed changes
+        if (connected) loadInitialOrders();
+        connected = true;
+      } else if (event.op === 'resync') {
+        loadInitialOrders();
+      } else if (event.op === 'upsert' && event.rows) {
+        const rows = event.rows;
+        setRawBackendData((prev) => mergeById(prev, rows, (row: any) => String(row.order_id)));
+        setAllOrders((prev) => mergeById(prev, transformBackendOrders(rows), (order) => order.id));
+      } else if (event.op === 'delete' && event.ids) {
+        const removed = new Set(event.ids);
+        setRawBackendData((prev) => prev.filter((row: any) => !removed.has(String(row.order_id))));
+        setAllOrders((prev) => prev.filter((order) => !removed.has(order.id)));
+      }
+    });
+  }, [live]);
+
   // Handle query results from right sidebar
   useEffect(() => {
     if (queryResult === null) {
@@ -73,6 +107,7 @@ const OrderPage: React.FC<OrderPageProps> = ({ queryResult }) => {
         loadInitialOrders();
         setDynamicColumns([]); // Show all columns for small talk
       } else {
+        setLive(false);
         // For actual data queries, detect columns from the actual data returned
         let transformedOrders: Order[];
         let detectedColumns: string[] = [];
@@ -145,6 +180,7 @@ const OrderPage: React.FC<OrderPageProps> = ({ queryResult }) => {
       }
       
       setLastQuery(''); // Clear the last query
+      setLive(true);
     } catch (err) {
       setError(err instanceof Error ? err.message : 'Failed to load orders');
       console.error('Failed to load orders:', err);
@@ -149,6 +149,17 @@ const RightSidebar: React.FC<RightSidebarProps> = ({
   const [showSuggestions, setShowSuggestions] = useState(true);
  
   const [isListening, setIsListening] = useState(false);
+
+  // Render the rows as soon as they stream in, before the insights are ready
+  const queryAndShowRows = async (prompt: string, isTranscript: boolean = false) => {
+    let shown = false;
+    const response = await apiService.queryWithAI(prompt, isTranscript, (rows) => {
+      shown = true;
+      onQueryResult?.(rows);
+    });
+    if (!shown) onQueryResult?.(response);
+    return response;
+  };
  
   const handleVoiceInput = () => {
     const SpeechRecognition = (window as any).SpeechRecognition || (window as any).webkitSpeechRecognition;
@@ -180,7 +191,7 @@ const RightSidebar: React.FC<RightSidebarProps> = ({
       setIsLoading(true);
  
       try {
-        const response = await apiService.queryWithAI(transcript, true); // is_transcript = true
+        const response = await queryAndShowRows(transcript, true); // is_transcript = true
         const assistantLang = response.language || 'en-US';
         const assistantMessage: ChatMessage = {
           id: (Date.now() + 1).toString(),
@@ -191,7 +202,6 @@ const RightSidebar: React.FC<RightSidebarProps> = ({
         };
        
         setChatMessages((prev) => [...prev, assistantMessage]);
-        onQueryResult?.(response);
       } catch (err) {
         setChatMessages((prev) => [...prev, {
           id: Date.now().toString(),
@@ -274,7 +284,7 @@ const RightSidebar: React.FC<RightSidebarProps> = ({
     setIsLoading(true);
    
     try {
-      const response = await apiService.queryWithAI(suggestion.title);
+      const response = await queryAndShowRows(suggestion.title);
      
       const assistantLang = response.language || 'en-US';
       const assistantMessage: ChatMessage = {
@@ -286,7 +296,6 @@ const RightSidebar: React.FC<RightSidebarProps> = ({
       };
  
       setChatMessages(prev => [...prev, assistantMessage]);
-      onQueryResult?.(response);
     } catch (error) {
       const errorMessage: ChatMessage = {
         id: (Date.now() + 1).toString(),
@@ -318,7 +327,7 @@ const RightSidebar: React.FC<RightSidebarProps> = ({
       setIsLoading(true);
      
       try {
-        const response = await apiService.queryWithAI(queryText);
+        const response = await queryAndShowRows(queryText);
        
         const assistantLang = response.language || 'en-US';
         const assistantMessage: ChatMessage = {
@@ -330,7 +339,6 @@ const RightSidebar: React.FC<RightSidebarProps> = ({
         };
        
         setChatMessages(prev => [...prev, assistantMessage]);
-        onQueryResult?.(response);
       } catch (error) {
         const errorMessage: ChatMessage = {
           id: (Date.now() + 1).toString(),
@@ -354,14 +362,9 @@ const RightSidebar: React.FC<RightSidebarProps> = ({
     // Clear the query result to reset the table view
     onQueryResult?.(null);
    
-    // Clear the conversation memory on the backend by calling a new endpoint
+    // Clear this chat's conversation memory on the agent and start a new session
     try {
-      await fetch('http://localhost:8080/clear-memory', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-      });
+      await apiService.clearMemory();
     } catch (error) {
       console.error('Failed to clear conversation memory:', error);
     }
@@ -8,12 +8,24 @@ export interface APIResponse<T = any> {
   args?: any;
   insights?: string;
   language?: string;
+  display_mode?: string;
+  timings?: Record<string, number>;
+  cache_hit?: boolean;
+  cache_age?: number;
 }
 
 export interface QueryRequest {
   prompt: string;
 }
 
+// Change to orders pushed by the backend's live feed
+export interface LiveOrderEvent {
+  op: 'ready' | 'upsert' | 'delete' | 'resync';
+  rows?: any[];
+  ids?: string[];
+  reason?: string;
+}
+
 export interface QueryError {
   detail: string;
 }
@@ -22,13 +34,24 @@ const AI_AGENT_URL = 'http://localhost:8080';
 const BACKEND_URL = 'http://localhost:8001';
 
 class APIService {
-  // Query orders using natural language via AI agent
-  async queryWithAI(prompt: string, is_transcript: boolean = false): Promise<APIResponse> {
+  // Conversation memory on the agent is kept per session (X-Session-ID)
+  private sessionId: string = crypto.randomUUID();
+
+  // Query orders using natural language via AI agent.
+  // The agent streams NDJSON events; onRows receives the rows as soon as the
+  // backend returns them, and the promise resolves once insights are ready.
+  async queryWithAI(
+    prompt: string,
+    is_transcript: boolean = false,
+    onRows?: (result: APIResponse) => void
+  ): Promise<APIResponse> {
     try {
       const response = await fetch(`${AI_AGENT_URL}/query`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
+          'Accept': 'application/x-ndjson',
+          'X-Session-ID': this.sessionId,
         },
         body: JSON.stringify({ prompt, is_transcript }),
       });
@@ -38,7 +61,41 @@ class APIService {
         throw new Error(errorData.detail || `HTTP error! status: ${response.status}`);
       }
 
-      return await response.json();
+      // Agents without streaming answer with a single JSON object
+      if (!response.body || !response.headers.get('Content-Type')?.includes('application/x-ndjson')) {
+        return await response.json();
+      }
+
+      let result: APIResponse = { success: false, data: [], count: 0, sql: '' };
+      const handleEvent = (line: string) => {
+        if (!line.trim()) return;
+        const { event, ...fields } = JSON.parse(line);
+        if (event === 'rows') {
+          result = { ...result, ...fields };
+          onRows?.(result);
+        } else if (event === 'insight') {
+          result = { ...result, insights: (result.insights || '') + fields.delta };
+        } else if (event === 'done') {
+          result = { ...result, insights: fields.insights, timings: fields.timings };
+        } else if (event === 'error') {
+          throw new Error(fields.detail || `Agent error! status: ${fields.status}`);
+        }
+      };
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = '';
+      while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split('\n');
+        buffer = lines.pop() ?? '';
+        lines.forEach(handleEvent);
+      }
+      handleEvent(buffer + decoder.decode());
+
+      return result;
     } catch (error) {
       console.error('AI query failed:', error);
       throw error;
@@ -82,6 +139,34 @@ class APIService {
     return this.queryWithSQL(defaultArgs);
   }
 
+  // Subscribe to live changes of orders matching a filter (server-sent events).
+  // Returns a function that closes the subscription.
+  subscribeToOrders(
+    select: string[],
+    where: string[],
+    onEvent: (event: LiveOrderEvent) => void
+  ): () => void {
+    const params = new URLSearchParams();
+    select.forEach((field) => params.append('select', field));
+    where.forEach((condition) => params.append('where', condition));
+    const source = new EventSource(`${BACKEND_URL}/orders/live?${params}`);
+    source.onmessage = (message) => onEvent(JSON.parse(message.data));
+    return () => source.close();
+  }
+
+  // Forget this session's conversation memory and start a new session
+  async clearMemory(): Promise<void> {
+    const sessionId = this.sessionId;
+    this.sessionId = crypto.randomUUID();
+    await fetch(`${AI_AGENT_URL}/clear-memory`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+        'X-Session-ID': sessionId,
+      },
+    });
+  }
+
   // Health check for AI agent
   async checkAIHealth(): Promise<any> {
     try {